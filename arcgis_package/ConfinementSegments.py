@@ -1,9 +1,11 @@
 
 
 
+import os
+import numpy as np
 import arcpy
 import gis_tools
-#import
+from common_package import array_functions
 
 def custom_segments(fcInputNetwork,
                     fieldSegmentID,
@@ -22,79 +24,129 @@ def custom_segments(fcInputNetwork,
     :return: Output Network: str
     """
 
-    # Copy Network to Temp Workspace
-    fcNetwork = gis_tools.newGISDataset(tempWorkspace,"StreamNetwork")
-    arcpy.CopyFeatures_management(fcInputNetwork,fcNetwork)
-
-    # Calculate Segment Lengths
-    fieldSegLength = gis_tools.resetField(fcNetwork,"SegLen","DOUBLE")
-    arcpy.CalculateField_management(fcNetwork,fieldSegLength,"!shape.length!","PYTHON")
-
-    #Sum Segment Lengths
-    tblStatsConfinementLength = gis_tools.newGISDataset(tempWorkspace,"TableStatisticsConfinementLength")
-    tblStatsConstrictionLength = gis_tools.newGISDataset(tempWorkspace,"TableStatisticsConstrictionLength")
-    arcpy.Statistics_analysis(fcNetwork, tblStatsConfinementLength, [[fieldSegLength,"SUM"]], [fieldSegmentID,fieldConfinement])
-    arcpy.Statistics_analysis(fcNetwork, tblStatsConstrictionLength, [[fieldSegLength,"SUM"]], [fieldSegmentID,fieldConstriction])
-
-    # Pivot on Confinement/Constriction
-    tblPivotConfinement = gis_tools.newGISDataset(tempWorkspace,"PivotTableConfinement")
-    tblPivotConstriction = gis_tools.newGISDataset(tempWorkspace,"PivotTableConstriction")
-    arcpy.PivotTable_management(tblStatsConfinementLength,fieldSegmentID,fieldConfinement,"SUM_" + fieldSegLength,tblPivotConfinement)
-    arcpy.PivotTable_management(tblStatsConstrictionLength,fieldSegmentID,fieldConstriction,"SUM_" + fieldSegLength,tblPivotConstriction)
-
-    # Make Sure required fields exist for calculations:
-    if len(arcpy.ListFields(tblPivotConstriction,fieldConstriction + "1")) == 0 :
-        arcpy.AddField_management(tblPivotConstriction,fieldConstriction + "1","DOUBLE")
-    if len(arcpy.ListFields(tblPivotConstriction,fieldConstriction + "0")) == 0 :
-        arcpy.AddField_management(tblPivotConstriction,fieldConstriction + "0","DOUBLE")
-
-    if len(arcpy.ListFields(tblPivotConfinement,fieldConfinement + "1")) == 0 :
-        arcpy.AddField_management(tblPivotConfinement,fieldConfinement + "1","DOUBLE")
-    if len(arcpy.ListFields(tblPivotConfinement,fieldConfinement + "0")) == 0 :
-        arcpy.AddField_management(tblPivotConfinement,fieldConfinement + "0","DOUBLE")
-
-    # Calculate Confinement/Constriction
-    fieldConfinementValue = gis_tools.resetField(tblPivotConfinement,"CONF_Value","DOUBLE")
-    arcpy.CalculateField_management(tblPivotConfinement,
-                                    fieldConfinementValue,
-                                    "!" + fieldConfinement + "1!/(!" + fieldConfinement + "0! + !" + fieldConfinement + "1!)",
-                                    "PYTHON")
-
-    fieldConstrictionValue = gis_tools.resetField(tblPivotConstriction,"CNST_Value","DOUBLE")
-    arcpy.CalculateField_management(tblPivotConstriction,
-                                    fieldConstrictionValue,
-                                    "!" + fieldConstriction + "1!/(!" + fieldConstriction + "0! + !" + fieldConstriction + "1!)",
-                                    "PYTHON")
-
-    # Join Results to Network
-    arcpy.JoinField_management(fcNetwork,fieldSegmentID,tblPivotConfinement,fieldSegmentID,fieldConfinementValue)
-    arcpy.JoinField_management(fcNetwork,fieldSegmentID,tblPivotConstriction,fieldSegmentID,fieldConstrictionValue)
-
-    # Copy Final Output
+    # Copy Network to Output
     outNetwork = gis_tools.newGISDataset(outputWorkspace,"ConfinementSegments.shp")
-
-    arcpy.DeleteField_management(fcNetwork,["Con_LEFT", "Con_RIGHT", "Con_Type", fieldConfinement, fieldConstriction])
-    #arcpy.Dissolve_management(fcNetwork,outNetwork)
-
-    arcpy.CopyFeatures_management(fcNetwork,outNetwork)
+    arcpy.CopyFeatures_management(fcInputNetwork,outNetwork)
+    arcpy.DeleteField_management(outNetwork,["Con_LEFT", "Con_RIGHT", "Con_Type"])
+
+    # Read Segment ID, Length, Confinement and Constriction in one pass
+    listRows = []
+    with arcpy.da.SearchCursor(outNetwork,[fieldSegmentID,"SHAPE@LENGTH",fieldConfinement,fieldConstriction]) as scNetwork:
+        for row in scNetwork:
+            listRows.append(row)
+    arraySegmentID = np.array([row[0] for row in listRows])
+    arrayLength = np.array([row[1] for row in listRows],dtype=float)
+
+    # Length weighted Confinement/Constriction per Segment
+    arrayConfinementValue = array_functions.group_fractions(arraySegmentID,arrayLength,[row[2] for row in listRows])
+    arrayConstrictionValue = array_functions.group_fractions(arraySegmentID,arrayLength,[row[3] for row in listRows])
+
+    # Write Results to Network
+    fieldSegLength = gis_tools.resetField(outNetwork,"SegLen","DOUBLE")
+    fieldConfinementValue = gis_tools.resetField(outNetwork,"CONF_Value","DOUBLE")
+    fieldConstrictionValue = gis_tools.resetField(outNetwork,"CNST_Value","DOUBLE")
+    with arcpy.da.UpdateCursor(outNetwork,[fieldSegLength,fieldConfinementValue,fieldConstrictionValue]) as ucNetwork:
+        for i, row in enumerate(ucNetwork):
+            ucNetwork.updateRow([arrayLength[i],
+                                 array_functions.nan_to_none(arrayConfinementValue[i]),
+                                 array_functions.nan_to_none(arrayConstrictionValue[i])])
+
+    arcpy.DeleteField_management(outNetwork,[fieldConfinement, fieldConstriction])
 
     return outNetwork
 
 
-def fixed_segments():
-    """
+def fixed_segments(fcInputNetwork,
+                   fieldStreamRouteID,
+                   fieldConfinement,
+                   fieldConstriction,
+                   dblSegmentLength,
+                   outputWorkspace,
+                   tempWorkspace=arcpy.env.scratchWorkspace):
+    """Calculate confinement on fixed length segments of each route.
 
-    :return:
-    """
+    Each route is cut every dblSegmentLength from its start (the last segment holds the
+    remainder), and the confined and constricted fractions of each segment are calculated
+    from the measures of the raw confining state segments along the route.
 
+    :param fcInputNetwork: Stream network with confining state
+    :param fieldStreamRouteID:
+    :param fieldConfinement:
+    :param fieldConstriction:
+    :param dblSegmentLength:
+    :param outputWorkspace:
+    :param tempWorkspace:
+    :return: Output Network: str
+    """
 
-    return
-
+    dblSegmentLength = float(dblSegmentLength)
+
+    fcNetworkDissolved = gis_tools.newGISDataset(tempWorkspace,"FixedSegments_NetworkDissolved")
+    arcpy.Dissolve_management(fcInputNetwork,fcNetworkDissolved,fieldStreamRouteID,multi_part=False,unsplit_lines=True)
+
+    # Load Routes. A route ID may have more than one dissolved part if the route is discontinuous.
+    dictRoutes = {}
+    with arcpy.da.SearchCursor(fcNetworkDissolved,["OID@",fieldStreamRouteID,"SHAPE@"]) as scRoutes:
+        for oidRoute,valueRouteID,gRoute in scRoutes:
+            dictRoutes.setdefault(valueRouteID,[]).append([oidRoute,gRoute])
+
+    # Measure each network segment along its route
+    dictIntervals = {}
+    with arcpy.da.SearchCursor(fcInputNetwork,[fieldStreamRouteID,fieldConfinement,fieldConstriction,"SHAPE@"]) as scNetwork:
+        for valueRouteID,valueConfinement,valueConstriction,gSegment in scNetwork:
+            if gSegment is None or valueRouteID not in dictRoutes:
+                continue
+            listParts = dictRoutes[valueRouteID]
+            oidRoute,gRoute = listParts[0]
+            if len(listParts) > 1:
+                gMidPoint = gSegment.positionAlongLine(0.5,True)
+                oidRoute,gRoute = min(listParts,key=lambda part: part[1].distanceTo(gMidPoint))
+            dblStart = gRoute.measureOnLine(gSegment.firstPoint)
+            dblEnd = gRoute.measureOnLine(gSegment.lastPoint)
+            dictIntervals.setdefault(oidRoute,[]).append([dblStart,dblEnd,valueConfinement or 0,valueConstriction or 0])
+
+    # Prepare Output
+    outNetwork = gis_tools.newGISDataset(outputWorkspace,"ConfinementFixedSegments.shp")
+    arcpy.CreateFeatureclass_management(os.path.dirname(outNetwork),os.path.basename(outNetwork),"POLYLINE",spatial_reference=fcInputNetwork)
+    fieldRouteID = gis_tools.resetField(outNetwork,"RouteID","LONG")
+    fieldSegmentID = gis_tools.resetField(outNetwork,"SegID","LONG")
+    fieldSegLength = gis_tools.resetField(outNetwork,"SegLen","DOUBLE")
+    fieldConfinementValue = gis_tools.resetField(outNetwork,"CONF_Value","DOUBLE")
+    fieldConstrictionValue = gis_tools.resetField(outNetwork,"CNST_Value","DOUBLE")
+    spatialReference = arcpy.Describe(fcInputNetwork).spatialReference
+
+    # Cut each route and calculate the segment values in one pass
+    intSegmentID = 0
+    with arcpy.da.InsertCursor(outNetwork,["SHAPE@",fieldRouteID,fieldSegmentID,fieldSegLength,fieldConfinementValue,fieldConstrictionValue]) as icSegments:
+        for valueRouteID,listParts in dictRoutes.items():
+            for oidRoute,gRoute in listParts:
+                arrayXY = np.array([[point.X,point.Y] for point in gRoute.getPart(0)])
+                arrayFrom,arrayTo,listPieces = array_functions.cut_line(arrayXY,dblSegmentLength)
+
+                if oidRoute in dictIntervals:
+                    arrayIntervals = np.array(dictIntervals[oidRoute],dtype=float)
+                    arrayConfinementValue = array_functions.window_fractions(arrayIntervals[:,0],arrayIntervals[:,1],arrayIntervals[:,2],arrayFrom,arrayTo)
+                    arrayConstrictionValue = array_functions.window_fractions(arrayIntervals[:,0],arrayIntervals[:,1],arrayIntervals[:,3],arrayFrom,arrayTo)
+                else:
+                    arrayConfinementValue = arrayConstrictionValue = np.full(len(arrayFrom),np.nan)
+
+                for i,arrayPiece in enumerate(listPieces):
+                    gSegment = arcpy.Polyline(arcpy.Array([arcpy.Point(x,y) for x,y in arrayPiece]),spatialReference)
+                    icSegments.insertRow([gSegment,
+                                          valueRouteID,
+                                          intSegmentID,
+                                          arrayTo[i] - arrayFrom[i],
+                                          array_functions.nan_to_none(arrayConfinementValue[i]),
+                                          array_functions.nan_to_none(arrayConstrictionValue[i])])
+                    intSegmentID = intSegmentID + 1
 
+    return outNetwork
 
 
 if __name__ == "__main__":
 
-    # TODO Set up ArgParse Here
-
-    custom_segments()
\ No newline at end of file
+    # Run headless with the command line (python -m confinement segments --backend arcpy ...)
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import confinement
+    sys.exit(confinement.main(["segments", "--backend", "arcpy"] + sys.argv[1:]))
\ No newline at end of file
@@ -16,11 +16,18 @@
 #!/usr/bin/env python
 
 # # Import Modules # #
+import os
 import sys
+import numpy as np
 import arcpy
 import gis_tools
+from common_package import array_functions
+from common_package import profiling
 import DividePolygonBySegment
 
+dblTolerance = 0.01 # Meters, used to match coincident edges
+dblMarginSampleDistance = 10.0 # Meters, margins are transferred to the network in pieces of this length
+
 ## Updates
 # Shapefile support
 # Remove old calculation methods
@@ -36,257 +43,386 @@ def main(fcInputStreamLineNetwork,
          fcOutputRawConfiningState,
          fcOutputConfiningMargins,
          scratchWorkspace,
-         boolIntegratedWidthAttributes=False):
+         boolIntegratedWidthAttributes=False,
+         cacheWorkspace=None,
+         boolProfile=False):
 
     ##Prepare processing environments
     arcpy.AddMessage("Starting Confining Margins Tool")
-
-    # Create Confined Channel Polygon
-    fcConfinedChannel = gis_tools.newGISDataset(scratchWorkspace,"ChannelConfined")
-    arcpy.Clip_analysis(fcInputChannelPolygon,fcInputValleyBottomPolygon,fcConfinedChannel)
-
-    # Convert Confined Channel polygon to Edges polyline
-    fcChannelMargins = gis_tools.newGISDataset(scratchWorkspace,"ChannelMargins")
-    arcpy.PolygonToLine_management(fcConfinedChannel,fcChannelMargins)
-
-    # Create Confinement Edges
-    if fcOutputConfiningMargins:
-        gis_tools.resetData(fcOutputConfiningMargins)
-        fcConfiningMargins = fcOutputConfiningMargins
-    else:
-        fcConfiningMargins = gis_tools.newGISDataset(scratchWorkspace, "ConfiningMargins")
-
-    fcConfiningMarginsMultipart = gis_tools.newGISDataset(scratchWorkspace, "ConfiningMargins_Multipart")
-    arcpy.Intersect_analysis([fcConfinedChannel, fcInputValleyBottomPolygon], fcConfiningMarginsMultipart, output_type="LINE")
-    arcpy.MultipartToSinglepart_management(fcConfiningMarginsMultipart,fcConfiningMargins)
-
-    # Merge segments in Polyline Center to create Route Layer
-    arcpy.env.outputZFlag = "Disabled" # 'empty' z values can cause problem with dissolve
-    fcStreamNetworkDissolved = gis_tools.newGISDataset(scratchWorkspace, "StreamNetworkDissolved") # one feature per 'section between trib or branch junctions'
-    arcpy.Dissolve_management(fcInputStreamLineNetwork, fcStreamNetworkDissolved, multi_part="SINGLE_PART", unsplit_lines="UNSPLIT_LINES")
-
-    fcNetworkSegmentPoints = gis_tools.newGISDataset(scratchWorkspace, "StreamNetworkSegmentPoints")
-    arcpy.FeatureVerticesToPoints_management(fcInputStreamLineNetwork, fcNetworkSegmentPoints, "END")
-    fcStreamNetworkDangles = gis_tools.newGISDataset(scratchWorkspace, "StreamNetworkDangles")
-    arcpy.FeatureVerticesToPoints_management(fcInputStreamLineNetwork, fcStreamNetworkDangles, "DANGLE")
-
-    #SegmentPolgyons
-    arcpy.AddMessage("Preparing Segmented Polygons...")
-    
-    fcChannelSegmentPolygons = gis_tools.newGISDataset(scratchWorkspace, "SegmentPolygons")
-    fcChannelSegmentPolygonLines = gis_tools.newGISDataset(scratchWorkspace,"SegmentPolygonLines")
-
-    #DividePolygonBySegment.main(fcInputStreamLineNetwork, fcConfinedChannel, fcChannelSegmentPolygons, scratchWorkspace)
-    arcpy.CopyFeatures_management(fcConfinedChannel,fcChannelSegmentPolygons)
-    arcpy.PolygonToLine_management(fcChannelSegmentPolygons, fcChannelSegmentPolygonLines)
-
-    lyrStreamNetworkDangles = gis_tools.newGISDataset("LAYER", "lyrStreamNetworkDangles")
-    arcpy.MakeFeatureLayer_management(fcStreamNetworkDangles, lyrStreamNetworkDangles)
-    arcpy.SelectLayerByLocation_management(lyrStreamNetworkDangles, "INTERSECT", fcConfinedChannel)
-    arcpy.Near_analysis(lyrStreamNetworkDangles, fcChannelSegmentPolygonLines, location="LOCATION")
+    manager = gis_tools.WorkspaceManager(scratchWorkspace)
+    profiler = profiling.Profiler("Confining Margins",manager.diskFolder,boolProfile,gis_tools.feature_count)
+
+    # Intermediates are removed when the run completes or fails
+    with manager:
+
+        # Create Confined Channel Polygon
+        with profiler.stage("Confined Channel",[fcInputChannelPolygon,fcInputValleyBottomPolygon]) as stage:
+            fcConfinedChannel = manager.tempDataset("ChannelConfined",[fcInputChannelPolygon])
+            arcpy.Clip_analysis(fcInputChannelPolygon,fcInputValleyBottomPolygon,fcConfinedChannel)
+
+            # Convert Confined Channel polygon to Edges polyline
+            fcChannelMargins = manager.tempDataset("ChannelMargins",[fcConfinedChannel])
+            arcpy.PolygonToLine_management(fcConfinedChannel,fcChannelMargins)
+            stage.out(fcChannelMargins)
+
+        # Create Confinement Edges
+        if fcOutputConfiningMargins:
+            gis_tools.resetData(fcOutputConfiningMargins)
+            fcConfiningMargins = fcOutputConfiningMargins
+        else:
+            fcConfiningMargins = manager.tempDataset("ConfiningMargins",[fcConfinedChannel])
+
+        with profiler.stage("Confining Margins",[fcConfinedChannel]) as stage:
+            fcConfiningMarginsMultipart = manager.tempDataset("ConfiningMargins_Multipart",[fcConfinedChannel])
+            arcpy.Intersect_analysis([fcConfinedChannel, fcInputValleyBottomPolygon], fcConfiningMarginsMultipart, output_type="LINE")
+            arcpy.MultipartToSinglepart_management(fcConfiningMarginsMultipart,fcConfiningMargins)
+            stage.out(fcConfiningMargins)
+
+        # Merge segments in Polyline Center to create Route Layer
+        arcpy.env.outputZFlag = "Disabled" # 'empty' z values can cause problem with dissolve
+        fcStreamNetworkDissolved = manager.tempDataset("StreamNetworkDissolved",[fcInputStreamLineNetwork]) # one feature per 'section between trib or branch junctions'
+        fcNetworkSegmentPoints = manager.tempDataset("StreamNetworkSegmentPoints",[fcInputStreamLineNetwork])
+        fcStreamNetworkDangles = manager.tempDataset("StreamNetworkDangles",[fcInputStreamLineNetwork])
+
+        def network_products():
+            arcpy.Dissolve_management(fcInputStreamLineNetwork, fcStreamNetworkDissolved, multi_part="SINGLE_PART", unsplit_lines="UNSPLIT_LINES")
+            arcpy.FeatureVerticesToPoints_management(fcInputStreamLineNetwork, fcNetworkSegmentPoints, "END")
+            arcpy.FeatureVerticesToPoints_management(fcInputStreamLineNetwork, fcStreamNetworkDangles, "DANGLE")
+
+        # Network only products are reused across runs on the same network
+        with profiler.stage("Dissolve",[fcInputStreamLineNetwork]) as stage:
+            gis_tools.cached_datasets(cacheWorkspace,
+                                      "NetworkProducts",
+                                      [fcInputStreamLineNetwork],
+                                      ["SINGLE_PART", "UNSPLIT_LINES"],
+                                      [fcStreamNetworkDissolved, fcNetworkSegmentPoints, fcStreamNetworkDangles],
+                                      network_products)
+            stage.out(fcStreamNetworkDissolved)
+
+        #SegmentPolgyons
+        arcpy.AddMessage("Preparing Segmented Polygons...")
     
-    arcpy.AddXY_management(lyrStreamNetworkDangles)
-
-    fcChannelBankNearLines = gis_tools.newGISDataset(scratchWorkspace, "Bank_NearLines")
-    arcpy.XYToLine_management(lyrStreamNetworkDangles,
-                                fcChannelBankNearLines,
-                                "POINT_X",
-                                "POINT_Y",
-                                "NEAR_X",
-                                "NEAR_Y")
-
-    fcChannelBankLines = gis_tools.newGISDataset(scratchWorkspace, "Bank_Lines")
-    arcpy.Merge_management([fcInputStreamLineNetwork,fcChannelBankNearLines, fcChannelSegmentPolygonLines], fcChannelBankLines)
-    fcChannelBankPolygons = gis_tools.newGISDataset(scratchWorkspace, "Bank_Polygons")
-    arcpy.FeatureToPolygon_management(fcChannelBankLines, fcChannelBankPolygons)
+        with profiler.stage("Bank Polygons",[fcConfinedChannel]) as stage:
+            fcChannelSegmentPolygons = manager.tempDataset("SegmentPolygons",[fcConfinedChannel])
+            fcChannelSegmentPolygonLines = manager.tempDataset("SegmentPolygonLines",[fcConfinedChannel])
+
+            # Split the channel by segment so that each bank polygon is on one side of one segment
+            extentPrevious = arcpy.env.extent # DividePolygonBySegment sets the extent to the channel
+            DividePolygonBySegment.main(fcInputStreamLineNetwork, fcConfinedChannel, fcChannelSegmentPolygons, "in_memory")
+            arcpy.env.extent = extentPrevious
+            arcpy.PolygonToLine_management(fcChannelSegmentPolygons, fcChannelSegmentPolygonLines)
+
+            lyrStreamNetworkDangles = manager.tempLayer("lyrStreamNetworkDangles")
+            arcpy.MakeFeatureLayer_management(fcStreamNetworkDangles, lyrStreamNetworkDangles)
+            arcpy.SelectLayerByLocation_management(lyrStreamNetworkDangles, "INTERSECT", fcConfinedChannel)
+            arcpy.Near_analysis(lyrStreamNetworkDangles, fcChannelMargins, location="LOCATION")
+
+            arcpy.AddXY_management(lyrStreamNetworkDangles)
+
+            fcChannelBankNearLines = manager.tempDataset("Bank_NearLines",[fcStreamNetworkDangles])
+            arcpy.XYToLine_management(lyrStreamNetworkDangles,
+                                        fcChannelBankNearLines,
+                                        "POINT_X",
+                                        "POINT_Y",
+                                        "NEAR_X",
+                                        "NEAR_Y")
+
+            fcChannelBankLines = manager.tempDataset("Bank_Lines",[fcInputStreamLineNetwork,fcChannelSegmentPolygonLines])
+            arcpy.Merge_management([fcInputStreamLineNetwork,fcChannelBankNearLines, fcChannelSegmentPolygonLines], fcChannelBankLines)
+            fcChannelBankPolygons = manager.tempDataset("Bank_Polygons",[fcInputStreamLineNetwork,fcChannelSegmentPolygonLines])
+            arcpy.FeatureToPolygon_management(fcChannelBankLines, fcChannelBankPolygons)
+            stage.out(fcChannelBankPolygons)
         
-    # # Intersect and Split Channel polygon Channel Edges and Polyline Confinement using cross section lines
-    arcpy.AddMessage("Intersect and Split Channel Polygons...")
-    fcIntersectPoints_ChannelMargins = gis_tools.newGISDataset(scratchWorkspace, "IntersectPoints_ChannelMargins")
-    fcIntersectPoints_ConfinementMargins = gis_tools.newGISDataset(scratchWorkspace, "IntersectPoints_ConfinementMargins")
-    arcpy.Intersect_analysis([fcConfiningMargins,fcChannelSegmentPolygonLines], fcIntersectPoints_ConfinementMargins, output_type="POINT")
-    arcpy.Intersect_analysis([fcChannelMargins,fcChannelSegmentPolygonLines], fcIntersectPoints_ChannelMargins, output_type="POINT")
-    fcConfinementMargin_Segments = gis_tools.newGISDataset(scratchWorkspace, "ConfinementMargin_Segments")
-    fcChannelMargin_Segments = gis_tools.newGISDataset(scratchWorkspace, "ChannelMargin_Segements")
-    arcpy.SplitLineAtPoint_management(fcConfiningMargins, fcIntersectPoints_ConfinementMargins, fcConfinementMargin_Segments, search_radius="10 Meters")
-    arcpy.SplitLineAtPoint_management(fcChannelMargins, fcIntersectPoints_ChannelMargins, fcChannelMargin_Segments, search_radius="10 Meters")
-
-    # Create River Side buffer to select right or left banks
-    arcpy.AddMessage("Determining Relative Sides of Bank...")
-    determine_banks(fcInputStreamLineNetwork, fcChannelBankPolygons, scratchWorkspace)
-
-    # Prepare Layers for Segment Selection
-    lyrSegmentPolygons = gis_tools.newGISDataset("Layer","lyrSegmentPolygons")
-    lyrConfinementEdgeSegments = gis_tools.newGISDataset("Layer", "lyrConfinementEdgeSegments")
-    lyrChannelEdgeSegments = gis_tools.newGISDataset("Layer", "lyrChannelEdgeSegments")
-    arcpy.MakeFeatureLayer_management(fcChannelSegmentPolygons, lyrSegmentPolygons)
-    arcpy.MakeFeatureLayer_management(fcConfinementMargin_Segments, lyrConfinementEdgeSegments)
-    arcpy.MakeFeatureLayer_management(fcChannelMargin_Segments, lyrChannelEdgeSegments)
-
-    ## Prepare Filtered Margins
-    fcFilterSplitPoints = gis_tools.newGISDataset(scratchWorkspace, "FilterSplitPoints")
-    arcpy.FeatureVerticesToPoints_management(fcConfinementMargin_Segments, fcFilterSplitPoints, "BOTH_ENDS")
-
-    # Transfer Confining Margins to Stream Network ##
-    arcpy.AddMessage("Transferring Confining Margins to Stream Network...")
-    fcConfinementMarginSegmentsBankSide = gis_tools.newGISDataset(scratchWorkspace, "ConfinementMarginSegmentsBank")
-    lyrConfinementMarginSegmentsBankside = gis_tools.newGISDataset("Layer", "lyrConfinementMarginSegmentsBankside")
-
-    field_map = """BankSide "BankSide" true true false 255 Text 0 0 ,First,#,""" + fcChannelBankPolygons + """,BankSide,-1,-1"""
-    arcpy.SpatialJoin_analysis(fcConfinementMargin_Segments,
-                               fcChannelBankPolygons,
-                               fcConfinementMarginSegmentsBankSide,
-                               "JOIN_ONE_TO_ONE",
-                               "KEEP_ALL",
-                               field_map)
-
-    arcpy.MakeFeatureLayer_management(fcConfinementMarginSegmentsBankSide, lyrConfinementMarginSegmentsBankside)
-    arcpy.SelectLayerByAttribute_management(lyrConfinementMarginSegmentsBankside, "NEW_SELECTION", """ "BankSide" = 'LEFT'""")
-    
-    fcStreamNetworkConfinementLeft = transfer_line(lyrConfinementMarginSegmentsBankside, fcStreamNetworkDissolved, "LEFT")
-    arcpy.SelectLayerByAttribute_management(lyrConfinementMarginSegmentsBankside, "NEW_SELECTION", """ "BankSide" = 'RIGHT'""")
-    fcStreamNetworkConfinementRight = transfer_line(lyrConfinementMarginSegmentsBankside, fcStreamNetworkDissolved, "RIGHT")
-
-    fcConfinementStreamNetworkIntersected = gis_tools.newGISDataset(scratchWorkspace,"ConfinementStreamNetworkIntersected")
-    arcpy.Intersect_analysis([fcStreamNetworkConfinementLeft,fcStreamNetworkConfinementRight],
-                             fcConfinementStreamNetworkIntersected, "NO_FID") # TODO no fid?
-
-    #Re-split centerline by segments
-    arcpy.AddMessage("Determining Confinement State on Stream Network...")
-    fcRawConfiningNetworkSplit = gis_tools.newGISDataset(scratchWorkspace,"RawConfiningNetworkSplit")
-    arcpy.SplitLineAtPoint_management(fcConfinementStreamNetworkIntersected,
-                                      fcNetworkSegmentPoints,
-                                      fcRawConfiningNetworkSplit,
-                                      "0.01 Meters")
-
-    #Table and Attributes
-    arcpy.AddField_management(fcRawConfiningNetworkSplit, "Con_Type", "TEXT", field_length="6")
-    arcpy.AddField_management(fcRawConfiningNetworkSplit, "IsConfined", "SHORT")
-    gis_tools.resetField(fcRawConfiningNetworkSplit, "IsConstric", "SHORT")
-
-    lyrRawConfiningNetwork = gis_tools.newGISDataset("Layer", "lyrStreamNetworkCenterline1")
-    arcpy.MakeFeatureLayer_management(fcRawConfiningNetworkSplit,lyrRawConfiningNetwork)
-
-    arcpy.SelectLayerByAttribute_management(lyrRawConfiningNetwork,"NEW_SELECTION", """ "Con_LEFT" = 1""")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork,"Con_Type", "'LEFT'", "PYTHON")
-    arcpy.SelectLayerByAttribute_management(lyrRawConfiningNetwork, "NEW_SELECTION", """ "Con_RIGHT" = 1""")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork,"Con_Type", "'RIGHT'", "PYTHON")
-    arcpy.SelectLayerByAttribute_management(lyrRawConfiningNetwork, "NEW_SELECTION", """ "Con_LEFT" = 1 AND "Con_RIGHT" = 1""")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork,"Con_Type", "'BOTH'", "PYTHON")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork,"IsConstric", "1", "PYTHON")
-    arcpy.SelectLayerByAttribute_management(lyrRawConfiningNetwork, "SWITCH_SELECTION")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork, "IsConstric", "0", "PYTHON")
-    arcpy.SelectLayerByAttribute_management(lyrRawConfiningNetwork, "NEW_SELECTION", """ "Con_LEFT" = 1 OR "Con_RIGHT" = 1""")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork, "IsConfined", "1", "PYTHON")
-    arcpy.SelectLayerByAttribute_management(lyrRawConfiningNetwork, "SWITCH_SELECTION")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork, "IsConfined", "0", "PYTHON")
-    arcpy.CalculateField_management(lyrRawConfiningNetwork, "Con_Type", "'NONE'", "PYTHON")
-
-    # Integrated Width
-
-    fcIntersectLineNetwork = fcInputStreamLineNetwork
-    if boolIntegratedWidthAttributes:
-        fcIntegratedChannelWidth = gis_tools.newGISDataset(scratchWorkspace,"IW_Channel")
-        fieldIWChannel = integrated_width(fcInputStreamLineNetwork, fcChannelSegmentPolygons, fcIntegratedChannelWidth, "Channel" , False)
-
-        fcIntegratedWidth = gis_tools.newGISDataset(scratchWorkspace,"IW_ChannelAndValley")
-        fieldIWValley = integrated_width(fcIntegratedChannelWidth,fcInputValleyBottomPolygon,fcIntegratedWidth,"Valley",True)
-
-        fieldIWRatio = gis_tools.resetField(fcIntegratedWidth, "IW_Ratio", "DOUBLE")
-        exp = "!" + fieldIWValley + r"! / !" + fieldIWChannel + "!"
-        arcpy.CalculateField_management(fcIntegratedWidth, fieldIWRatio, exp, "PYTHON_9.3")
-        fcIntersectLineNetwork = fcIntegratedWidth
-
-    # Final Output
-    arcpy.AddMessage("Preparing Final Output...")
-    if arcpy.Exists(fcOutputRawConfiningState):
-        arcpy.Delete_management(fcOutputRawConfiningState)
-    arcpy.Intersect_analysis([fcRawConfiningNetworkSplit,fcIntersectLineNetwork], fcOutputRawConfiningState, "NO_FID")
+        # # Intersect and Split Channel polygon Channel Edges and Polyline Confinement using cross section lines
+        arcpy.AddMessage("Intersect and Split Channel Polygons...")
+        with profiler.stage("Split Margins",[fcConfiningMargins,fcChannelMargins]) as stage:
+            fcIntersectPoints_ChannelMargins = manager.tempDataset("IntersectPoints_ChannelMargins",[fcChannelMargins])
+            fcIntersectPoints_ConfinementMargins = manager.tempDataset("IntersectPoints_ConfinementMargins",[fcConfiningMargins])
+            arcpy.Intersect_analysis([fcConfiningMargins,fcChannelSegmentPolygonLines], fcIntersectPoints_ConfinementMargins, output_type="POINT")
+            arcpy.Intersect_analysis([fcChannelMargins,fcChannelSegmentPolygonLines], fcIntersectPoints_ChannelMargins, output_type="POINT")
+            fcConfinementMargin_Segments = manager.tempDataset("ConfinementMargin_Segments",[fcConfiningMargins])
+            fcChannelMargin_Segments = manager.tempDataset("ChannelMargin_Segements",[fcChannelMargins])
+            arcpy.SplitLineAtPoint_management(fcConfiningMargins, fcIntersectPoints_ConfinementMargins, fcConfinementMargin_Segments, search_radius="10 Meters")
+            arcpy.SplitLineAtPoint_management(fcChannelMargins, fcIntersectPoints_ChannelMargins, fcChannelMargin_Segments, search_radius="10 Meters")
+            stage.out([fcConfinementMargin_Segments,fcChannelMargin_Segments])
+
+        # Create River Side buffer to select right or left banks
+        arcpy.AddMessage("Determining Relative Sides of Bank...")
+        with profiler.stage("Bank Sides",[fcChannelBankPolygons]) as stage:
+            determine_banks(fcInputStreamLineNetwork, fcChannelBankPolygons, manager)
+            stage.out(fcChannelBankPolygons)
+
+        # Prepare Layers for Segment Selection
+        lyrSegmentPolygons = manager.tempLayer("lyrSegmentPolygons")
+        lyrConfinementEdgeSegments = manager.tempLayer("lyrConfinementEdgeSegments")
+        lyrChannelEdgeSegments = manager.tempLayer("lyrChannelEdgeSegments")
+        arcpy.MakeFeatureLayer_management(fcChannelSegmentPolygons, lyrSegmentPolygons)
+        arcpy.MakeFeatureLayer_management(fcConfinementMargin_Segments, lyrConfinementEdgeSegments)
+        arcpy.MakeFeatureLayer_management(fcChannelMargin_Segments, lyrChannelEdgeSegments)
+
+        ## Prepare Filtered Margins
+        fcFilterSplitPoints = manager.tempDataset("FilterSplitPoints",[fcConfinementMargin_Segments])
+        arcpy.FeatureVerticesToPoints_management(fcConfinementMargin_Segments, fcFilterSplitPoints, "BOTH_ENDS")
+
+        # Transfer Confining Margins to Stream Network ##
+        arcpy.AddMessage("Transferring Confining Margins to Stream Network...")
+        fcConfinementMarginSegmentsBankSide = manager.tempDataset("ConfinementMarginSegmentsBank",[fcConfinementMargin_Segments])
+        lyrConfinementMarginSegmentsBankside = manager.tempLayer("lyrConfinementMarginSegmentsBankside")
+
+        field_map = """BankSide "BankSide" true true false 255 Text 0 0 ,First,#,""" + fcChannelBankPolygons + """,BankSide,-1,-1"""
+        arcpy.SpatialJoin_analysis(fcConfinementMargin_Segments,
+                                   fcChannelBankPolygons,
+                                   fcConfinementMarginSegmentsBankSide,
+                                   "JOIN_ONE_TO_ONE",
+                                   "KEEP_ALL",
+                                   field_map)
+
+        arcpy.MakeFeatureLayer_management(fcConfinementMarginSegmentsBankSide, lyrConfinementMarginSegmentsBankside)
+        with profiler.stage("Transfer Line LEFT",[lyrConfinementMarginSegmentsBankside]) as stage:
+            arcpy.SelectLayerByAttribute_management(lyrConfinementMarginSegmentsBankside, "NEW_SELECTION", """ "BankSide" = 'LEFT'""")
+
+            dictConfinementLeft = transfer_line(lyrConfinementMarginSegmentsBankside, fcStreamNetworkDissolved, "LEFT", manager)
+            stage.out(dictConfinementLeft)
+        with profiler.stage("Transfer Line RIGHT",[lyrConfinementMarginSegmentsBankside]) as stage:
+            arcpy.SelectLayerByAttribute_management(lyrConfinementMarginSegmentsBankside, "NEW_SELECTION", """ "BankSide" = 'RIGHT'""")
+            dictConfinementRight = transfer_line(lyrConfinementMarginSegmentsBankside, fcStreamNetworkDissolved, "RIGHT", manager)
+            stage.out(dictConfinementRight)
+
+        with profiler.stage("Classification",[fcStreamNetworkDissolved]) as stage:
+            fcConfinementStreamNetworkIntersected = manager.tempDataset("ConfinementStreamNetworkIntersected",[fcStreamNetworkDissolved])
+            split_routes(fcStreamNetworkDissolved, dictConfinementLeft, dictConfinementRight, fcConfinementStreamNetworkIntersected)
+            stage.out(fcConfinementStreamNetworkIntersected)
+
+        #Re-split centerline by segments
+        arcpy.AddMessage("Determining Confinement State on Stream Network...")
+        with profiler.stage("Split",[fcConfinementStreamNetworkIntersected]) as stage:
+            fcRawConfiningNetworkSplit = manager.tempDataset("RawConfiningNetworkSplit",[fcStreamNetworkDissolved])
+            arcpy.SplitLineAtPoint_management(fcConfinementStreamNetworkIntersected,
+                                              fcNetworkSegmentPoints,
+                                              fcRawConfiningNetworkSplit,
+                                              "0.01 Meters")
+            stage.out(fcRawConfiningNetworkSplit)
+
+        # Integrated Width
+
+        fcIntersectLineNetwork = fcInputStreamLineNetwork
+        if boolIntegratedWidthAttributes:
+            arcpy.AddMessage("Calculating Integrated Width...")
+            with profiler.stage("Integrated Width",[fcInputStreamLineNetwork]) as stage:
+                fcIntegratedWidth = manager.tempDataset("IW_ChannelAndValley",[fcInputStreamLineNetwork])
+                integrated_width(fcInputStreamLineNetwork, fcConfinedChannel, fcInputValleyBottomPolygon, fcIntegratedWidth, manager, cacheWorkspace)
+                fcIntersectLineNetwork = stage.out(fcIntegratedWidth)
+
+        # Final Output
+        arcpy.AddMessage("Preparing Final Output...")
+        with profiler.stage("Final Intersect",[fcRawConfiningNetworkSplit,fcIntersectLineNetwork]) as stage:
+            if arcpy.Exists(fcOutputRawConfiningState):
+                arcpy.Delete_management(fcOutputRawConfiningState)
+            arcpy.Intersect_analysis([fcRawConfiningNetworkSplit,fcIntersectLineNetwork], fcOutputRawConfiningState, "NO_FID")
+            stage.out(fcOutputRawConfiningState)
+
+        profiler.write(fcOutputRawConfiningState,{"StreamNetwork":fcInputStreamLineNetwork,
+                                                  "ValleyBottom":fcInputValleyBottomPolygon,
+                                                  "ChannelPolygon":fcInputChannelPolygon,
+                                                  "IntegratedWidth":boolIntegratedWidthAttributes})
+
+        manager.report()
 
     return
 
 
-def determine_banks(fcInputStreamLineNetwork,fcChannelBankPolygons,scratchWorkspace):
+def determine_banks(fcInputStreamLineNetwork,fcChannelBankPolygons,manager):
+
+    # Inside point of each bank polygon and the nearest stream line
+    fcChannelBankSidePoints = manager.tempDataset("BankSidePoints",[fcChannelBankPolygons])
+    arcpy.FeatureToPoint_management(fcChannelBankPolygons,fcChannelBankSidePoints,"INSIDE")
+    tblNearBankSidePoints = manager.tempDataset("NearBankSidePoints",[fcChannelBankPolygons])
+    arcpy.GenerateNearTable_analysis(fcChannelBankSidePoints,fcInputStreamLineNetwork,tblNearBankSidePoints,closest="CLOSEST")
+
+    dictNearLine = {}
+    with arcpy.da.SearchCursor(tblNearBankSidePoints,["IN_FID","NEAR_FID"]) as scNear:
+        for inFID, nearFID in scNear:
+            dictNearLine[inFID] = nearFID
+    setNearLines = set(dictNearLine.values())
+    dictLines = {}
+    with arcpy.da.SearchCursor(fcInputStreamLineNetwork,["OID@","SHAPE@"]) as scLines:
+        for oid, gLine in scLines:
+            if oid in setNearLines:
+                dictLines[oid] = gLine
+
+    # Side of the point relative to the direction of the nearest line
+    dictBankSide = {}
+    with arcpy.da.SearchCursor(fcChannelBankSidePoints,["OID@","ORIG_FID","SHAPE@"]) as scPoints:
+        for oid, origFID, gPoint in scPoints:
+            if oid in dictNearLine:
+                boolRightSide = dictLines[dictNearLine[oid]].queryPointAndDistance(gPoint)[3]
+                dictBankSide[origFID] = "RIGHT" if boolRightSide else "LEFT"
 
-    fcChannelBankSideBuffer = gis_tools.newGISDataset(scratchWorkspace,"BankSide_Buffer")
-    fcChannelBankSidePoints = gis_tools.newGISDataset(scratchWorkspace,"BankSidePoints")
-    arcpy.Buffer_analysis(fcInputStreamLineNetwork,fcChannelBankSideBuffer,"1 Meter","LEFT","FLAT","NONE")
-    arcpy.FeatureToPoint_management(fcChannelBankSideBuffer,fcChannelBankSidePoints,"INSIDE")
     arcpy.AddField_management(fcChannelBankPolygons,"BankSide","TEXT","10")
-    lyrChannelBanks = gis_tools.newGISDataset("Layer","lyrChannelBanks")
-    arcpy.MakeFeatureLayer_management(fcChannelBankPolygons,lyrChannelBanks)
-    arcpy.SelectLayerByLocation_management(lyrChannelBanks,"INTERSECT",fcChannelBankSidePoints,selection_type="NEW_SELECTION")
-    arcpy.CalculateField_management(lyrChannelBanks,"BankSide","'LEFT'","PYTHON")
-    arcpy.SelectLayerByAttribute_management(lyrChannelBanks,"SWITCH_SELECTION")
-    arcpy.CalculateField_management(lyrChannelBanks,"BankSide","'RIGHT'","PYTHON")
-    
-    return 
-
-
-def transfer_line(fcInLine,fcToLine,strStreamSide):
-    outputWorkspace = arcpy.Describe(fcInLine).path
-    fcOutput = gis_tools.newGISDataset(outputWorkspace,"LineNetworkConfinement" + strStreamSide)
-    
-    # Split Line Network by Line Ends 
-    fcSplitPoints = gis_tools.newGISDataset(outputWorkspace,"SplitPoints_Confinement" + strStreamSide)
-    arcpy.FeatureVerticesToPoints_management(fcInLine,fcSplitPoints,"BOTH_ENDS")
-    tblNearPointsConfinement = gis_tools.newGISDataset(outputWorkspace,"NearPointsConfinement" + strStreamSide)
-    arcpy.GenerateNearTable_analysis(fcSplitPoints,fcToLine,tblNearPointsConfinement,location="LOCATION",angle="ANGLE")
-    lyrNearPointsConfinement = gis_tools.newGISDataset("Layer","lyrNearPointsConfinement"+ strStreamSide)
-    arcpy.MakeXYEventLayer_management(tblNearPointsConfinement,"NEAR_X","NEAR_Y",lyrNearPointsConfinement,fcToLine)
-    arcpy.SplitLineAtPoint_management(fcToLine,lyrNearPointsConfinement,fcOutput,search_radius="0.01 Meters")
-    
-    # Prepare Fields
-    strConfinementField = "Con_" + strStreamSide
-    arcpy.AddField_management(fcOutput,strConfinementField,"LONG")
-
-    # Transfer Attributes by Centroids
-    fcCentroidPoints = gis_tools.newGISDataset(outputWorkspace,"CentroidPoints_Confinement" + strStreamSide)
-    arcpy.FeatureVerticesToPoints_management(fcInLine,fcCentroidPoints,"MID")
-    tblNearPointsCentroid = gis_tools.newGISDataset(outputWorkspace,"NearPointsCentroid" + strStreamSide)
-    arcpy.GenerateNearTable_analysis(fcCentroidPoints,fcToLine,tblNearPointsCentroid,location="LOCATION",angle="ANGLE")
-    lyrNearPointsCentroid = gis_tools.newGISDataset("Layer","lyrNearPointsCentroid" + strStreamSide)
-    arcpy.MakeXYEventLayer_management(tblNearPointsCentroid,"NEAR_X","NEAR_Y",lyrNearPointsCentroid,fcToLine)
-    lyrToLineSegments = gis_tools.newGISDataset("Layer","lyrToLineSegments")
-    arcpy.MakeFeatureLayer_management(fcOutput,lyrToLineSegments)
-    
-    arcpy.SelectLayerByLocation_management(lyrToLineSegments,"INTERSECT",lyrNearPointsCentroid,selection_type="NEW_SELECTION")#"0.01 Meter","NEW_SELECTION")
-    arcpy.CalculateField_management(lyrToLineSegments,strConfinementField,1,"PYTHON")
-    
-    return fcOutput
+    with arcpy.da.UpdateCursor(fcChannelBankPolygons,["OID@","BankSide"]) as ucBanks:
+        for row in ucBanks:
+            row[1] = dictBankSide.get(row[0],"RIGHT")
+            ucBanks.updateRow(row)
 
+    return 
 
-def integrated_width(fcInLines, fcInPolygons, fcOutLines, strMetricName="", boolSegmentPolygon=False, temp_workspace="in_memory"):
-
-    fcMemLines = gis_tools.newGISDataset(temp_workspace,"lineNetwork")
-    arcpy.CopyFeatures_management(fcInLines,fcMemLines)
-    fieldLength = gis_tools.resetField(fcMemLines,"IW_Length","DOUBLE")
-    arcpy.CalculateField_management(fcMemLines,fieldLength,"!Shape!.length","PYTHON")
-
-    fcMemPolygons = gis_tools.newGISDataset(temp_workspace,'Polygons')
-    if boolSegmentPolygon:
-        DividePolygonBySegment.main(fcMemLines, fcInPolygons, fcMemPolygons, temp_workspace, dblPointDensity=5.0)
-    else:
-        arcpy.CopyFeatures_management(fcInPolygons,fcMemPolygons)
-
-    fieldPolygonArea = gis_tools.resetField(fcMemPolygons, strMetricName[0:6] + "Area","DOUBLE")
-    arcpy.CalculateField_management(fcMemPolygons, fieldPolygonArea, "!Shape!.area", "PYTHON")
 
-    f_mappings = arcpy.FieldMappings()
-    f_mappings.addTable(fcMemLines)
-    fmap_area = arcpy.FieldMap()
-    fmap_area.addInputField(fcMemPolygons, fieldPolygonArea)
+def transfer_line(fcInLine,fcToLine,strStreamSide,manager=None):
+    """Transfer the margin segments to the routes in fcToLine as confined intervals.
+
+    The margins are densified and each two vertex piece is assigned to the routes nearest
+    its ends. The piece ends are measured on the route and merged into confined intervals.
+    Returns a dictionary of route OID: (arrayBreaks, arrayConfined) where the route is
+    split at each break (measure) and arrayConfined flags the pieces between consecutive
+    breaks that are confined on strStreamSide.
+    """
+
+    boolOwnManager = manager is None
+    if boolOwnManager:
+        manager = gis_tools.WorkspaceManager("in_memory")
+
+    # Densified margin vertices and the route nearest each vertex
+    fcMarginsDensified = manager.tempDataset("MarginsDensified" + strStreamSide,[fcInLine])
+    arcpy.CopyFeatures_management(fcInLine,fcMarginsDensified)
+    arcpy.Densify_edit(fcMarginsDensified,"DISTANCE",str(dblMarginSampleDistance) + " Meters")
+    fcMarginVertices = manager.tempDataset("MarginVertices" + strStreamSide,[fcInLine])
+    arcpy.FeatureVerticesToPoints_management(fcMarginsDensified,fcMarginVertices,"ALL")
+    tblNearVertices = manager.tempDataset("NearMarginVertices" + strStreamSide,[fcInLine])
+    arcpy.GenerateNearTable_analysis(fcMarginVertices,fcToLine,tblNearVertices,closest="CLOSEST")
+
+    dictNearRoute = {}
+    with arcpy.da.SearchCursor(tblNearVertices,["IN_FID","NEAR_FID"]) as scNear:
+        for inFID, nearFID in scNear:
+            dictNearRoute[inFID] = nearFID
+    dictRoutes = {}
+    with arcpy.da.SearchCursor(fcToLine,["OID@","SHAPE@"]) as scRoutes:
+        for oid, gRoute in scRoutes:
+            dictRoutes[oid] = gRoute
+
+    # Measure each piece on the routes nearest its ends
+    dictIntervals = {}
+    previousMargin = None
+    previousVertex = None
+    with arcpy.da.SearchCursor(fcMarginVertices,["OID@","ORIG_FID","SHAPE@"]) as scVertices:
+        for oid, origFID, gVertex in scVertices:
+            vertex = (gVertex, dictNearRoute.get(oid))
+            if origFID == previousMargin:
+                for routeOID in set([previousVertex[1], vertex[1]]) - set([None]):
+                    gRoute = dictRoutes[routeOID]
+                    dictIntervals.setdefault(routeOID, []).append((gRoute.measureOnLine(previousVertex[0]),
+                                                                   gRoute.measureOnLine(vertex[0])))
+            previousMargin = origFID
+            previousVertex = vertex
+
+    dictConfinement = {}
+    for routeOID, listIntervals in dictIntervals.items():
+        arrayIntervals = np.array(listIntervals)
+        dictConfinement[routeOID] = array_functions.interval_breaks(arrayIntervals[:, 0],
+                                                                    arrayIntervals[:, 1],
+                                                                    dictRoutes[routeOID].length)
+
+    if boolOwnManager:
+        manager.clearTempWorkspace()
+
+    return dictConfinement
+
+
+def split_routes(fcRoutes, dictConfinementLeft, dictConfinementRight, fcOutput):
+    """Write the routes split at the confinement breaks of both sides.
+
+    Con_LEFT and Con_RIGHT, and the Con_Type, IsConfined and IsConstric derived from them, are
+    written with each piece.
+    """
+
+    arcpy.CreateFeatureclass_management(os.path.dirname(fcOutput),os.path.basename(fcOutput),"POLYLINE",spatial_reference=fcRoutes)
+    arcpy.AddField_management(fcOutput,"Con_LEFT","LONG")
+    arcpy.AddField_management(fcOutput,"Con_RIGHT","LONG")
+    arcpy.AddField_management(fcOutput,"Con_Type","TEXT",field_length="6")
+    arcpy.AddField_management(fcOutput,"IsConfined","SHORT")
+    arcpy.AddField_management(fcOutput,"IsConstric","SHORT")
+
+    with arcpy.da.SearchCursor(fcRoutes,["OID@","SHAPE@"]) as scRoutes, \
+            arcpy.da.InsertCursor(fcOutput,["SHAPE@","Con_LEFT","Con_RIGHT","Con_Type","IsConfined","IsConstric"]) as icOutput:
+        for oid, gRoute in scRoutes:
+            breaksNone = (np.array([0.0, gRoute.length]), np.zeros(1, dtype=np.int32))
+            breaksLeft, confinedLeft = dictConfinementLeft.get(oid, breaksNone)
+            breaksRight, confinedRight = dictConfinementRight.get(oid, breaksNone)
+
+            arrayBreaks = np.unique(np.concatenate([breaksLeft, breaksRight]))
+            arrayMid = (arrayBreaks[:-1] + arrayBreaks[1:]) / 2.0
+            arrayLeft = array_functions.interval_flags(breaksLeft, confinedLeft, arrayMid)
+            arrayRight = array_functions.interval_flags(breaksRight, confinedRight, arrayMid)
+            arrayConType, arrayIsConfined, arrayIsConstric = array_functions.confinement_type(arrayLeft, arrayRight)
+            for i in range(len(arrayMid)):
+                if arrayBreaks[i + 1] - arrayBreaks[i] <= dblTolerance:
+                    continue
+                icOutput.insertRow([gRoute.segmentAlongLine(arrayBreaks[i], arrayBreaks[i + 1]),
+                                    int(arrayLeft[i]),
+                                    int(arrayRight[i]),
+                                    str(arrayConType[i]),
+                                    int(arrayIsConfined[i]),
+                                    int(arrayIsConstric[i])])
 
-    f_mappings.addFieldMap(fmap_area)
+    return fcOutput
 
-    arcpy.SpatialJoin_analysis(fcMemLines, fcMemPolygons, fcOutLines, "JOIN_ONE_TO_ONE", "KEEP_ALL",
-                               field_mapping=f_mappings, match_option="WITHIN")
-    fieldIntegratedWidth = gis_tools.resetField(fcOutLines, "IW" + strMetricName[0:8], "DOUBLE")
-    exp = "!" + fieldPolygonArea + r"! / !" + fieldLength + "!"
-    print exp
-    arcpy.CalculateField_management(fcOutLines, fieldIntegratedWidth, exp, "PYTHON_9.3")
 
-    return fieldIntegratedWidth
+def integrated_width(fcInLines, fcChannelPolygons, fcValleyPolygons, fcOutLines, manager=None, cacheWorkspace=None):
+    """Copy the lines with the integrated channel and valley widths and their ratio.
+
+    The valley bottom is divided once into the region nearest each line, and the channel area
+    of a line is the part of its region inside the channel. Both areas are keyed by the line
+    ID, so no spatial join is needed.
+    """
+
+    boolOwnManager = manager is None
+    if boolOwnManager:
+        manager = gis_tools.WorkspaceManager("in_memory")
+
+    arcpy.CopyFeatures_management(fcInLines,fcOutLines)
+    fieldSegmentID = gis_tools.resetField(fcOutLines,"IW_SegID","LONG")
+    listSegmentID = []
+    listLength = []
+    with arcpy.da.UpdateCursor(fcOutLines,["OID@","SHAPE@LENGTH",fieldSegmentID]) as ucLines:
+        for row in ucLines:
+            listSegmentID.append(row[0])
+            listLength.append(row[1])
+            ucLines.updateRow([row[0],row[1],row[0]])
+
+    fcValleySegments = manager.tempDataset("IW_ValleySegments",[fcValleyPolygons])
+    gis_tools.cached_datasets(cacheWorkspace,
+                              "ValleySegments",
+                              [fcOutLines, fcValleyPolygons],
+                              [5.0],
+                              [fcValleySegments],
+                              lambda: DividePolygonBySegment.main(fcOutLines, fcValleyPolygons, fcValleySegments, "in_memory",
+                                                                  dblPointDensity=5.0, fieldSegmentID=fieldSegmentID))
+    fcChannelSegments = manager.tempDataset("IW_ChannelSegments",[fcValleyPolygons])
+    arcpy.Intersect_analysis([fcValleySegments,fcChannelPolygons],fcChannelSegments,"ALL")
+
+    dictValleyArea = {}
+    with arcpy.da.SearchCursor(fcValleySegments,["JOIN_FID","SHAPE@AREA"]) as scPolygons:
+        for joinFID,dblArea in scPolygons:
+            dictValleyArea[joinFID] = dictValleyArea.get(joinFID,0.0) + dblArea
+    dictChannelArea = {}
+    with arcpy.da.SearchCursor(fcChannelSegments,["JOIN_FID","SHAPE@AREA"]) as scPolygons:
+        for joinFID,dblArea in scPolygons:
+            dictChannelArea[joinFID] = dictChannelArea.get(joinFID,0.0) + dblArea
+
+    arrayValleyArea = np.array([dictValleyArea.get(segmentID,0.0) for segmentID in listSegmentID])
+    arrayChannelArea = np.array([dictChannelArea.get(segmentID,0.0) for segmentID in listSegmentID])
+    arrayIWChannel,arrayIWValley,arrayIWRatio = array_functions.integrated_widths(listLength,arrayChannelArea,arrayValleyArea)
+
+    listFields = [gis_tools.resetField(fcOutLines,FieldName,"DOUBLE") for FieldName in
+                  ["IW_Length","ChanneArea","IWChannel","ValleyArea","IWValley","IW_Ratio"]]
+    with arcpy.da.UpdateCursor(fcOutLines,listFields) as ucLines:
+        for i,row in enumerate(ucLines):
+            ucLines.updateRow([array_functions.nan_to_none(value) for value in
+                               [listLength[i],arrayChannelArea[i],arrayIWChannel[i],arrayValleyArea[i],arrayIWValley[i],arrayIWRatio[i]]])
+    arcpy.DeleteField_management(fcOutLines,fieldSegmentID)
+    if boolOwnManager:
+        manager.clearTempWorkspace()
+
+    return fcOutLines
 
 
 if __name__ == "__main__":
@@ -296,5 +432,8 @@ if __name__ == "__main__":
          sys.argv[3],
          sys.argv[4],
          sys.argv[5],
-         sys.argv[6])
+         sys.argv[6],
+         sys.argv[7].lower() == "true" if len(sys.argv) > 7 else False,
+         sys.argv[8] if len(sys.argv) > 8 else None,
+         sys.argv[9].lower() == "true" if len(sys.argv) > 9 else False)
 
@@ -19,7 +19,6 @@
 import sys
 import arcpy
 import gis_tools
-import geometry_functions
 
 # # Main Function # #
 def main(fcInputCenterline,
@@ -27,8 +26,19 @@ def main(fcInputCenterline,
          fcSegmentedPolygons,
          workspaceTemp,
          dblPointDensity=10.0,
-         dblJunctionBuffer=120.00):
-    
+         dblJunctionBuffer=120.00,
+         fieldSegmentID=None):
+    """Divide a polygon into the Thiessen regions of the centerline segments.
+
+    Each densified centerline vertex keeps the ID of its segment (ORIG_FID), so the Thiessen
+    polygons are dissolved by segment and clipped to the polygon once, without rebuilding the
+    junction polygons and joining them back to the centerline. dblJunctionBuffer is kept for
+    compatibility. JOIN_FID is the ORIG_FID, or the value of fieldSegmentID if given.
+    """
+
+    if not fieldSegmentID:
+        fieldSegmentID = "ORIG_FID"
+
     arcpy.AddMessage("GNAT Divide Polygon By Segment Tool")
     arcpy.AddMessage("GNAT DPS: Saving Polygon Results to: " + fcSegmentedPolygons)
     arcpy.AddMessage("GNAT DPS: Saving Temporary Files to: " + workspaceTemp)
@@ -42,95 +52,28 @@ def main(fcInputCenterline,
     fcCenterline = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_Centerline")
     arcpy.CopyFeatures_management(fcInputCenterline,fcCenterline)
 
-    ## Build Thiessan Polygons
+    ## Build Thiessan Polygons from the Centerline Vertices, tagged with their Segment (ORIG_FID)
     arcpy.AddMessage("GNAT DPS: Building Thiessan Polygons")
     arcpy.env.extent = fcInputPolygon ## Set full extent to build Thiessan polygons over entire line network.
     arcpy.Densify_edit(fcCenterline,"DISTANCE",str(dblPointDensity) + " METERS")
 
-    fcTribJunctionPoints = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_TribJunctionPoints") # All Segment Junctions??
-    #gis_tools.findSegmentJunctions(fcCenterline,fcTribJunctionPoints,"ALL")
-    arcpy.Intersect_analysis(fcCenterline,fcTribJunctionPoints,output_type="POINT")
-
     fcThiessanPoints = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_ThiessanPoints")
     arcpy.FeatureVerticesToPoints_management(fcCenterline,fcThiessanPoints,"ALL")
 
-    lyrThiessanPoints = gis_tools.newGISDataset("Layer","lyrThiessanPoints")
-    arcpy.MakeFeatureLayer_management(fcThiessanPoints,lyrThiessanPoints)
-    arcpy.SelectLayerByLocation_management(lyrThiessanPoints,"INTERSECT",fcTribJunctionPoints,str(dblJunctionBuffer)+ " METERS","NEW_SELECTION")
-
     fcThiessanPoly = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_ThiessanPoly")
-    arcpy.CreateThiessenPolygons_analysis(lyrThiessanPoints,fcThiessanPoly,"ONLY_FID")
-
-    fcThiessanPolyClip = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_TheissanPolyClip")
-    arcpy.Clip_analysis(fcThiessanPoly,fcInputPolygon,fcThiessanPolyClip)
-
-    ### Code to Split the Junction Thiessan Polys ###
-    arcpy.AddMessage("GNAT DPS: Split Junction Thiessan Polygons")
-    lyrTribThiessanPolys = gis_tools.newGISDataset("Layer","lyrTribThiessanPolys")
-    arcpy.MakeFeatureLayer_management(fcThiessanPolyClip,lyrTribThiessanPolys)
-    arcpy.SelectLayerByLocation_management(lyrTribThiessanPolys,"INTERSECT",fcTribJunctionPoints,selection_type="NEW_SELECTION")
-
-    fcSplitPoints = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_SplitPoints")
-    arcpy.Intersect_analysis([lyrTribThiessanPolys,fcCenterline],fcSplitPoints,output_type="POINT")
-
-    arcpy.AddMessage("GNAT DPS: Moving Starting Vertices of Junction Polygons")
-    geometry_functions.changeStartingVertex(fcTribJunctionPoints,lyrTribThiessanPolys)
-
-    arcpy.AddMessage("GNAT DPS: Vertices Moved.")
-    fcThiessanTribPolyEdges = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_ThiessanTribPolyEdges")
-    arcpy.FeatureToLine_management(lyrTribThiessanPolys,fcThiessanTribPolyEdges)
-
-    fcSplitLines = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_SplitLines")
-    arcpy.SplitLineAtPoint_management(fcThiessanTribPolyEdges,fcSplitPoints,fcSplitLines,"0.1 METERS")
-
-    fcMidPoints = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_MidPoints")
-    arcpy.FeatureVerticesToPoints_management(fcSplitLines,fcMidPoints,"MID")
-    arcpy.Near_analysis(fcMidPoints,fcTribJunctionPoints,location="LOCATION")
-    arcpy.AddXY_management(fcMidPoints)
-
-    fcTribToMidLines = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_TribToMidLines")
-    arcpy.XYToLine_management(fcMidPoints,
-                              fcTribToMidLines,
-                              "POINT_X",
-                              "POINT_Y",
-                              "NEAR_X",
-                              "NEAR_Y")
-
-    ### Select Polys by Centerline ###
-    arcpy.AddMessage("GNAT DPS: Select Polygons By Centerline")
-    fcThiessanEdges = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_ThiessanEdges")
-    arcpy.FeatureToLine_management(fcThiessanPolyClip,fcThiessanEdges)
-
-    fcAllEdges = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_AllEdges")
-    arcpy.Merge_management([fcTribToMidLines,fcThiessanEdges,fcCenterline],fcAllEdges)# include fcCenterline if needed
-
-    fcAllEdgesPolygons = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_AllEdgesPolygons")
-    arcpy.FeatureToPolygon_management(fcAllEdges,fcAllEdgesPolygons)
-
-    fcAllEdgesPolygonsClip = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_AllEdgesPolygonsClip")
-    arcpy.Clip_analysis(fcAllEdgesPolygons,fcInputPolygon,fcAllEdgesPolygonsClip)
-
-    fcPolygonsJoinCenterline = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_PolygonsJoinCenterline")
-    arcpy.SpatialJoin_analysis(fcAllEdgesPolygonsClip,
-                               fcCenterline,
-                               fcPolygonsJoinCenterline,
-                               "JOIN_ONE_TO_MANY",
-                               "KEEP_ALL",
-                               match_option="SHARE_A_LINE_SEGMENT_WITH")
+    arcpy.CreateThiessenPolygons_analysis(fcThiessanPoints,fcThiessanPoly,"ALL")
 
+    ## Dissolve by Segment and Clip Once
+    arcpy.AddMessage("GNAT DPS: Dissolve Thiessan Polygons By Segment")
     fcPolygonsDissolved = gis_tools.newGISDataset(workspaceTemp,"GNAT_DPS_PolygonsDissolved")
-    arcpy.Dissolve_management(fcPolygonsJoinCenterline,
-                              fcPolygonsDissolved,
-                              "JOIN_FID",
-                              multi_part="SINGLE_PART")
-
-    #fcSegmentedPolygons = gis_tools.newGISDataset(workspaceOutput,"SegmentedPolygons")
-    lyrPolygonsDissolved = gis_tools.newGISDataset("Layer","lyrPolygonsDissolved")
-    arcpy.MakeFeatureLayer_management(fcPolygonsDissolved,lyrPolygonsDissolved)
-    arcpy.SelectLayerByAttribute_management(lyrPolygonsDissolved,"NEW_SELECTION",""" "JOIN_FID" = -1 """)
+    arcpy.Dissolve_management(fcThiessanPoly,fcPolygonsDissolved,fieldSegmentID,multi_part="MULTI_PART")
 
-    arcpy.Eliminate_management(lyrPolygonsDissolved,fcSegmentedPolygons,"LENGTH")
+    arcpy.Clip_analysis(fcPolygonsDissolved,fcInputPolygon,fcSegmentedPolygons)
 
+    fieldJoinFID = gis_tools.resetField(fcSegmentedPolygons,"JOIN_FID","LONG")
+    with arcpy.da.UpdateCursor(fcSegmentedPolygons,[fieldSegmentID,fieldJoinFID]) as ucPolygons:
+        for row in ucPolygons:
+            ucPolygons.updateRow([row[0],row[0]])
 
     arcpy.AddMessage("GNAT DPS: Tool Complete.")
     return
@@ -19,8 +19,11 @@
 # # Import Modules # #
 import os
 import sys
+import numpy as np
 import arcpy
 import gis_tools
+from common_package import array_functions
+from common_package import profiling
 
 # # Main Function # # 
 def main(
@@ -31,147 +34,128 @@ def main(
     strSeedDistance,
     inputliststrWindowSize,
     outputWorkspace,
-    tempWorkspace=arcpy.env.scratchWorkspace):
-    """Perform a Moving Window Analysis on a Line Network."""
+    tempWorkspace=arcpy.env.scratchWorkspace,
+    boolProfile=False):
+    """Perform a Moving Window Analysis on a Line Network.
 
-    liststrWindowSize = inputliststrWindowSize.split(";")
+    Each route is converted once into arrays of (start, end) measures of the
+    line network segments it contains. The confined and constricted fraction of
+    every window is then evaluated from the cumulative coverage of those
+    intervals, so no geoprocessing call is made per seed point or window.
+    """
 
-    fcLineNetworkDissolved = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_LineNetworkDissolved")
-    arcpy.Dissolve_management(fcLineNetwork,fcLineNetworkDissolved,fieldStreamRouteID,multi_part=False,unsplit_lines=True)
-
-    listLineGeometries = arcpy.CopyFeatures_management(fcLineNetworkDissolved,arcpy.Geometry())
-    
-    listWindows = []
-    listSeeds = []
-    listWindowEvents = []
-    listgWindows = []
-    intSeedID = 0
-    
-    iRoutes = int(arcpy.GetCount_management(fcLineNetworkDissolved).getOutput(0))
-    arcpy.SetProgressor("step","Processing Each Route",0,iRoutes,1)
-    iRoute = 0
-    with arcpy.da.SearchCursor(fcLineNetworkDissolved,["SHAPE@",fieldStreamRouteID,"SHAPE@LENGTH"]) as scLines:
-        for fLine in scLines: #Loop Through Routes
-            arcpy.SetProgressorLabel("Route: " + str(iRoute) + " Seed Point: " + str(intSeedID))
-            arcpy.SetProgressorPosition(iRoute)
-            gLine = fLine[0]
-            dblSeedPointPosition = float(max(liststrWindowSize))/2 #Start Seeds at position of largest window
-            while dblSeedPointPosition + float(max(liststrWindowSize))/2 < fLine[2]:
+    profiler = profiling.Profiler("Moving Window",tempWorkspace,boolProfile,gis_tools.feature_count)
+    liststrWindowSize = inputliststrWindowSize.split(";")
+    listdblWindowSize = [float(strWindowSize) for strWindowSize in liststrWindowSize]
+    dblMaxWindowSize = max(listdblWindowSize)
+
+    with profiler.stage("Dissolve",[fcLineNetwork]) as stage:
+        fcLineNetworkDissolved = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_LineNetworkDissolved")
+        arcpy.Dissolve_management(fcLineNetwork,fcLineNetworkDissolved,fieldStreamRouteID,multi_part=False,unsplit_lines=True)
+
+        # Load Routes. A route ID may have more than one dissolved part if the route is discontinuous.
+        dictRoutes = {}
+        with arcpy.da.SearchCursor(fcLineNetworkDissolved,["OID@",fieldStreamRouteID,"SHAPE@"]) as scRoutes:
+            for oidRoute,valueRouteID,gRoute in scRoutes:
+                dictRoutes.setdefault(valueRouteID,[]).append([oidRoute,gRoute])
+        stage.out(fcLineNetworkDissolved)
+
+    # Measure each network segment along its route
+    with profiler.stage("Measure",[fcLineNetwork]) as stage:
+        dictIntervals = {}
+        with arcpy.da.SearchCursor(fcLineNetwork,[fieldStreamRouteID,fieldConfinement,fieldConstriction,"SHAPE@"]) as scNetwork:
+            for valueRouteID,valueConfinement,valueConstriction,gSegment in scNetwork:
+                if gSegment is None or valueRouteID not in dictRoutes:
+                    continue
+                listParts = dictRoutes[valueRouteID]
+                oidRoute,gRoute = listParts[0]
+                if len(listParts) > 1:
+                    gMidPoint = gSegment.positionAlongLine(0.5,True)
+                    oidRoute,gRoute = min(listParts,key=lambda part: part[1].distanceTo(gMidPoint))
+                dblStart = gRoute.measureOnLine(gSegment.firstPoint)
+                dblEnd = gRoute.measureOnLine(gSegment.lastPoint)
+                dictIntervals.setdefault(oidRoute,[]).append([dblStart,dblEnd,valueConfinement or 0,valueConstriction or 0])
+        stage.out(list(dictIntervals.values()))
+
+    # Evaluate all windows on each route
+    with profiler.stage("Windows",[fcLineNetworkDissolved]) as stage:
+        listSeeds = []
+        listgWindows = []
+        intSeedID = 0
+
+        iRoutes = int(arcpy.GetCount_management(fcLineNetworkDissolved).getOutput(0))
+        arcpy.SetProgressor("step","Processing Each Route",0,iRoutes,1)
+        iRoute = 0
+        for valueRouteID,listParts in dictRoutes.items():
+            for oidRoute,gRoute in listParts:
                 arcpy.SetProgressorLabel("Route: " + str(iRoute) + " Seed Point: " + str(intSeedID))
-                gSeedPointPosition = gLine.positionAlongLine(dblSeedPointPosition)
-                listSeeds.append([scLines[1],intSeedID,gSeedPointPosition])#gSeedPointPosition.X,gSeedPointPosition.Y])
-                for strWindowSize in liststrWindowSize:
-                    dblWindowSize = float(strWindowSize)
-                    dblLengthStart = dblSeedPointPosition - dblWindowSize/2
-                    dblLengthEnd = dblSeedPointPosition + dblWindowSize/2
-                    
-                    gPointStartLocation = gLine.positionAlongLine(dblLengthStart)
-                    gPointEndLocation = gLine.positionAlongLine(dblLengthEnd)
-                    gTemp = arcpy.Geometry()
-                    listgWindowTemp = arcpy.SplitLineAtPoint_management(gLine,[gPointStartLocation,gPointEndLocation],gTemp,"1 METER")
-                    #TODO: Need a better method to select the line here!!
-                    for gWindowTemp in listgWindowTemp:
-                        if abs(gWindowTemp.length - dblWindowSize) < 10 :
-                            listgWindows.append([scLines[1],intSeedID,dblWindowSize,gWindowTemp])
-                    # End TODO
-                    listWindows.append([scLines[1],intSeedID,dblWindowSize,gPointStartLocation])
-                    listWindows.append([scLines[1],intSeedID,dblWindowSize,gPointEndLocation])
-                    listWindowEvents.append([scLines[1],intSeedID,dblWindowSize,dblLengthStart,dblLengthEnd])
-                dblSeedPointPosition = dblSeedPointPosition + float(strSeedDistance)
-                intSeedID = intSeedID + 1
-            iRoute = iRoute + 1
-
-    fcSeedPoints = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_SeedPoints")
-    fcWindowEndPoints = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_WindowEndPoints")
-    fcWindowLines = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_WindowLines")
-      
-    arcpy.CreateFeatureclass_management(tempWorkspace,"GNAT_MWA_SeedPoints","POINT",spatial_reference=fcLineNetwork)
-    arcpy.CreateFeatureclass_management(tempWorkspace,"GNAT_MWA_WindowEndPoints","POINT",spatial_reference=fcLineNetwork)
-    arcpy.CreateFeatureclass_management(tempWorkspace,"GNAT_MWA_WindowLines","POLYLINE",spatial_reference=fcLineNetwork)
-
-    gis_tools.resetField(fcSeedPoints,"RouteID","LONG")
-    gis_tools.resetField(fcSeedPoints,"SeedID","LONG")
-    
-    gis_tools.resetField(fcWindowEndPoints,"RouteID","LONG")
-    gis_tools.resetField(fcWindowEndPoints,"SeedID","LONG")
-    gis_tools.resetField(fcWindowEndPoints,"Seg","DOUBLE")
-
-    gis_tools.resetField(fcWindowLines,"RouteID","LONG")
-    gis_tools.resetField(fcWindowLines,"SeedID","LONG")
-    gis_tools.resetField(fcWindowLines,"Seg","DOUBLE")
-
-    with arcpy.da.InsertCursor(fcSeedPoints,["RouteID","SeedID","SHAPE@XY"]) as icSeedPoints:
-        for row in listSeeds:
-            icSeedPoints.insertRow(row)
-
-    with arcpy.da.InsertCursor(fcWindowEndPoints,["RouteID","SeedID","Seg","SHAPE@XY"]) as icWindowEndPoints:
-        for row in listWindows:
-            icWindowEndPoints.insertRow(row)
-
-    with arcpy.da.InsertCursor(fcWindowLines,["RouteID","SeedID","Seg","SHAPE@"]) as icWindowLines:
-        for row in listgWindows:
-            icWindowLines.insertRow(row)
-
-    fcIntersected = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_IntersectWindowAttributes")
-    arcpy.Intersect_analysis([fcWindowLines,fcLineNetwork],fcIntersected,"ALL",output_type="LINE")
-
-    # Confinement
-    tblSummaryStatisticsConfinement = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_SummaryStatsTableConfinement")
-    arcpy.Statistics_analysis(fcIntersected, tblSummaryStatisticsConfinement,"Shape_Length SUM", fieldStreamRouteID + ";SeedID;Seg;" + fieldConfinement)
-
-    tblSummaryStatisticsPivot = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_SummaryStatisticsPivotTable")
-    arcpy.PivotTable_management(tblSummaryStatisticsConfinement,"Route;SeedID;Seg", fieldConfinement, "SUM_Shape_Length", tblSummaryStatisticsPivot)
-
-    fieldConfinementValue = gis_tools.resetField(tblSummaryStatisticsPivot,"CONF_Value","DOUBLE")
-
-    if len(arcpy.ListFields(tblSummaryStatisticsPivot,fieldConfinement + "1")) == 0 :
-        arcpy.AddField_management(tblSummaryStatisticsPivot,fieldConfinement + "1","DOUBLE")
-    if len(arcpy.ListFields(tblSummaryStatisticsPivot,fieldConfinement + "0")) == 0 :
-        arcpy.AddField_management(tblSummaryStatisticsPivot,fieldConfinement + "0","DOUBLE")
-
-    arcpy.CalculateField_management(tblSummaryStatisticsPivot,fieldConfinementValue,"!" + fieldConfinement + "1!/(!" + fieldConfinement + "0! + !" + fieldConfinement + "1!)", "PYTHON")
-
-    #Pivot Confinement on Segment Size
-    tblSummaryStatisticsWindowPivot = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_SummaryStatisticsWindowPivotTable")
-    arcpy.PivotTable_management(tblSummaryStatisticsPivot,fieldStreamRouteID + ";SeedID","Seg",fieldConfinementValue,tblSummaryStatisticsWindowPivot)
-
-    # Constriction
-
-    tblSummaryStatisticsConstriction = gis_tools.newGISDataset(tempWorkspace, "GNAT_MWA_SummaryStatsTableConstriction")
-    arcpy.Statistics_analysis(fcIntersected, tblSummaryStatisticsConstriction, "Shape_Length SUM",
-                              fieldStreamRouteID + ";SeedID;Seg;" + fieldConstriction)
-
-    tblSummaryStatisticsPivotConstriction = gis_tools.newGISDataset(tempWorkspace, "GNAT_MWA_SummaryStatisticsPivotTableConsriction")
-    arcpy.PivotTable_management(tblSummaryStatisticsConstriction, "Route;SeedID;Seg", fieldConstriction,
-                                "SUM_Shape_Length", tblSummaryStatisticsPivotConstriction)
-
-    fieldConstrictionValue = gis_tools.resetField(tblSummaryStatisticsPivotConstriction, "CNST_Value", "DOUBLE")
-    if len(arcpy.ListFields(tblSummaryStatisticsConstriction,fieldConstriction + "1")) == 0 :
-        arcpy.AddField_management(tblSummaryStatisticsConstriction,fieldConstriction + "1","DOUBLE")
-    if len(arcpy.ListFields(tblSummaryStatisticsConstriction,fieldConstriction + "0")) == 0 :
-        arcpy.AddField_management(tblSummaryStatisticsConstriction,fieldConstriction + "0","DOUBLE")
-
-    arcpy.CalculateField_management(tblSummaryStatisticsPivotConstriction, fieldConstrictionValue,
-                                    "!" + fieldConstriction + "1!/(!" + fieldConstriction + "0! + !" + fieldConstriction + "1!)",
-                                    "PYTHON")
-    tblSummaryStatisticsWindowPivotConstriction = gis_tools.newGISDataset(tempWorkspace,"GNAT_MWA_SummaryStatisticsWindowPivotTableConstriction")
-    arcpy.PivotTable_management(tblSummaryStatisticsPivotConstriction,fieldStreamRouteID + ";SeedID","Seg",fieldConstrictionValue,tblSummaryStatisticsWindowPivotConstriction)
-
-    strWindowSizeFields = ""
-    for WindowSize in liststrWindowSize:
-        strWindowSizeFields = strWindowSizeFields + ";Seg" + WindowSize
-    strWindowSizeFields = strWindowSizeFields.lstrip(";")
-
-    #Join Above table to seed points
-    arcpy.JoinField_management(fcSeedPoints,"SeedID",tblSummaryStatisticsWindowPivot,"SeedID",strWindowSizeFields)
-    arcpy.JoinField_management(fcSeedPoints,"SeedID",tblSummaryStatisticsWindowPivotConstriction,"SeedID",strWindowSizeFields)
+                arcpy.SetProgressorPosition(iRoute)
+                iRoute = iRoute + 1
+
+                arraySeedPositions = array_functions.seed_positions(gRoute.length,float(strSeedDistance),dblMaxWindowSize)
+                if len(arraySeedPositions) == 0 or oidRoute not in dictIntervals:
+                    continue
+
+                arrayIntervals = np.array(dictIntervals[oidRoute],dtype=float)
+                dictConfinement = {}
+                dictConstriction = {}
+                for dblWindowSize in listdblWindowSize:
+                    arrayWindowStart = arraySeedPositions - dblWindowSize/2
+                    arrayWindowEnd = arraySeedPositions + dblWindowSize/2
+                    dictConfinement[dblWindowSize] = array_functions.window_fractions(arrayIntervals[:,0],
+                                                                                      arrayIntervals[:,1],
+                                                                                      arrayIntervals[:,2],
+                                                                                      arrayWindowStart,
+                                                                                      arrayWindowEnd)
+                    dictConstriction[dblWindowSize] = array_functions.window_fractions(arrayIntervals[:,0],
+                                                                                       arrayIntervals[:,1],
+                                                                                       arrayIntervals[:,3],
+                                                                                       arrayWindowStart,
+                                                                                       arrayWindowEnd)
+
+                for iSeed,dblSeedPointPosition in enumerate(arraySeedPositions):
+                    gSeedPoint = gRoute.positionAlongLine(float(dblSeedPointPosition))
+                    listSeedValues = [array_functions.nan_to_none(dictConfinement[dblWindowSize][iSeed]) for dblWindowSize in listdblWindowSize] + \
+                                     [array_functions.nan_to_none(dictConstriction[dblWindowSize][iSeed]) for dblWindowSize in listdblWindowSize]
+                    listSeeds.append([valueRouteID,intSeedID,gSeedPoint] + listSeedValues)
+                    for dblWindowSize in listdblWindowSize:
+                        gWindow = gRoute.segmentAlongLine(float(dblSeedPointPosition) - dblWindowSize/2,
+                                                          float(dblSeedPointPosition) + dblWindowSize/2)
+                        listgWindows.append([valueRouteID,intSeedID,dblWindowSize,gWindow])
+                    intSeedID = intSeedID + 1
+        stage.out([listSeeds,listgWindows])
 
     # Manage Outputs
-    fcOutputSeedPoints = gis_tools.newGISDataset(outputWorkspace,"MovingWindowSeedPoints")
-    arcpy.CopyFeatures_management(fcSeedPoints,fcOutputSeedPoints)
+    with profiler.stage("Final Output",[listSeeds,listgWindows]) as stage:
+        fcOutputSeedPoints = gis_tools.newGISDataset(outputWorkspace,"MovingWindowSeedPoints")
+        fcOutputWindows = gis_tools.newGISDataset(outputWorkspace,"MovingWindowSegments")
+        arcpy.CreateFeatureclass_management(outputWorkspace,os.path.basename(fcOutputSeedPoints),"POINT",spatial_reference=fcLineNetwork)
+        arcpy.CreateFeatureclass_management(outputWorkspace,os.path.basename(fcOutputWindows),"POLYLINE",spatial_reference=fcLineNetwork)
+
+        gis_tools.resetField(fcOutputSeedPoints,"RouteID","LONG")
+        gis_tools.resetField(fcOutputSeedPoints,"SeedID","LONG")
+
+        # Confinement values are written to Seg<size>, and constriction values to Seg<size>_1, the names the
+        # previous JoinField method produced when joining the second pivot table.
+        listConfinementFields = [gis_tools.resetField(fcOutputSeedPoints,"Seg" + strWindowSize,"DOUBLE") for strWindowSize in liststrWindowSize]
+        listConstrictionFields = [gis_tools.resetField(fcOutputSeedPoints,"Seg" + strWindowSize + "_1","DOUBLE") for strWindowSize in liststrWindowSize]
+
+        gis_tools.resetField(fcOutputWindows,"RouteID","LONG")
+        gis_tools.resetField(fcOutputWindows,"SeedID","LONG")
+        gis_tools.resetField(fcOutputWindows,"Seg","DOUBLE")
+
+        with arcpy.da.InsertCursor(fcOutputSeedPoints,["RouteID","SeedID","SHAPE@"] + listConfinementFields + listConstrictionFields) as icSeedPoints:
+            for row in listSeeds:
+                icSeedPoints.insertRow(row)
+
+        with arcpy.da.InsertCursor(fcOutputWindows,["RouteID","SeedID","Seg","SHAPE@"]) as icWindowLines:
+            for row in listgWindows:
+                icWindowLines.insertRow(row)
+        stage.out([fcOutputSeedPoints,fcOutputWindows])
 
-    fcOutputWindows = gis_tools.newGISDataset(outputWorkspace,"MovingWindowSegments")
-    arcpy.CopyFeatures_management(fcWindowLines,fcOutputWindows)
+    profiler.write(outputWorkspace,{"LineNetwork":fcLineNetwork,
+                                    "SeedDistance":strSeedDistance,
+                                    "WindowSizes":inputliststrWindowSize})
 
     return
 
@@ -185,4 +169,5 @@ if __name__ == "__main__":
         sys.argv[5],
         sys.argv[6],
         sys.argv[7],
-        sys.argv[8])
\ No newline at end of file
+        sys.argv[8],
+        sys.argv[9].lower() == "true" if len(sys.argv) > 9 else False)
\ No newline at end of file
@@ -16,24 +16,26 @@
 #!/usr/bin/env python
 
 # # Import Modules # #
+import os
 import math
+import numpy as np
 import arcpy
 import gis_tools
+from common_package import array_functions
 
 def rotateFeatures(inFeatureClass,outFeatureClass,angle=0,units="DEGREES",anchor="CENTROID"):
 
+    spatialReference = arcpy.Describe(inFeatureClass).spatialReference
     with arcpy.da.SearchCursor(inFeatureClass,["SHAPE@","SHAPE@XY","CandidateID"]) as scRotateFC:
         with arcpy.da.InsertCursor(outFeatureClass,["SHAPE@","CandidateID","Angle"]) as icRotatedFC:
             for feature in scRotateFC:
                 newShapeArray = arcpy.Array()
                 for part in feature[0]:
-                    newPartArray = arcpy.Array()
-                    for point in part:
-                        newx,newy = rotatePoint(point.X,point.Y,feature[1][0],feature[1][1],angle)
-                        newPartArray.add(arcpy.Point(newx,newy))
-                    newShapeArray.add(newPartArray)
-                icRotatedFC.insertRow([arcpy.Polyline(newShapeArray),scRotateFC[2],angle])
-    
+                    arrayXY = np.array([[point.X,point.Y] for point in part if point])
+                    arrayRotated = array_functions.rotate_coordinates(arrayXY,feature[1][0],feature[1][1],angle,units)
+                    newShapeArray.add(arcpy.Array([arcpy.Point(x,y) for x,y in arrayRotated]))
+                icRotatedFC.insertRow([arcpy.Polyline(newShapeArray,spatialReference),feature[2],angle])
+
     return
 
 def rotatePoint(x,y,xc=0,yc=0,angle=0,units="DEGREES"):
@@ -149,85 +151,48 @@ def pointsAlongLine(fcInputLineNetwork,
     inDistanceOrNumberofPoints -- the distance or number of points to use.
     """
 
-    resetData(fcOutputPoints)
-
-    arrayNewPoints = []
-    arrayAttributes = []
-    with arcpy.da.SearchCursor(fcInputLineNetwork,["OID@","SHAPE@","SHAPE@LENGTH"]) as scLineNetwork:
-        for line in scLineNetwork:
-            lineFeat = line[1]
-            lengthCurrent = 0
-            pointPosition = 0
-            while lengthCurrent < line[2]:
-                arrayNewPoints.append(lineFeat.positionAlongLine(lengthCurrent))
-                arrayAttributes.append([line[0],pointPosition])
-                lengthCurrent = lengthCurrent + dblDistance
-                pointPosition = pointPosition + 1
-
-            arrayNewPoints.append(arcpy.PointGeometry(lineFeat.lastPoint))
-            arrayAttributes.append([line[0],pointPosition])
-
-    arcpy.CopyFeatures_management(arrayNewPoints,fcOutputPoints)
-
+    gis_tools.resetData(fcOutputPoints)
+    arcpy.CreateFeatureclass_management(os.path.dirname(fcOutputPoints),os.path.basename(fcOutputPoints),"POINT",spatial_reference=fcInputLineNetwork)
     arcpy.AddField_management(fcOutputPoints,"LineID","LONG")
     arcpy.AddField_management(fcOutputPoints,"Position","LONG")
 
-    with arcpy.da.UpdateCursor(fcOutputPoints,["LineID","Position"]) as ucOutputPoints:
-        i = 0
-        for row in ucOutputPoints:
-            row[0] = arrayAttributes[i][0]
-            row[1] = arrayAttributes[i][1]
-            ucOutputPoints.updateRow(row)
-            i=i+1
+    arrayAttributes = []
+    with arcpy.da.SearchCursor(fcInputLineNetwork,["OID@","SHAPE@"]) as scLineNetwork:
+        with arcpy.da.InsertCursor(fcOutputPoints,["SHAPE@XY","LineID","Position"]) as icOutputPoints:
+            for line in scLineNetwork:
+                listParts = [[[point.X,point.Y] for point in part if point] for part in line[1]]
+                arrayStations,arrayPosition = array_functions.line_stations(listParts,dblDistance)
+                for (x,y),pointPosition in zip(arrayStations,arrayPosition):
+                    icOutputPoints.insertRow([(x,y),line[0],int(pointPosition)])
+                    arrayAttributes.append([line[0],int(pointPosition)])
 
     return arrayAttributes
 
 def changeStartingVertex(fcInputPoints,
-                         fcInputPolygons):
-    
-    ## Create Geometry Object for Processing input points.
-    g = arcpy.Geometry()
-    geomPoints = arcpy.CopyFeatures_management(fcInputPoints,g)
+                         fcInputPolygons,
+                         dblTolerance=0.001):
+    """Move the starting vertex of each polygon to the vertex that matches an input point."""
 
-    listPointCoords = []
-    for point in geomPoints:
-        listPointCoords.append([point.centroid.X,point.centroid.Y])
-        #arcpy.AddMessage(str(point.centroid.X) + ","+ str(point.centroid.Y))
+    ## Index the input point coordinates
+    setPointKeys = set()
+    with arcpy.da.SearchCursor(fcInputPoints,["SHAPE@XY"]) as scPoints:
+        for row in scPoints:
+            setPointKeys.update(array_functions.vertex_keys(row[0],dblTolerance))
 
     with arcpy.da.UpdateCursor(fcInputPolygons,["OID@", "SHAPE@"]) as ucPolygons:
         for featPolygon in ucPolygons:
-            vertexList = []
-            #arcpy.AddMessage("Feature: " + str(featPolygon[0]))
-            i = 0
-            iStart = 0
-            for polygonVertex in featPolygon[1].getPart(0): # shape,firstpart
-                if polygonVertex:
-                    #arcpy.AddMessage(' Vertex:' + str(i))
-                    vertexList.append([polygonVertex.X,polygonVertex.Y])
-                    if [polygonVertex.X,polygonVertex.Y] in listPointCoords:
-                        #arcpy.AddMessage("  Point-Vertex Match!")
-                        iStart = i
-                    else:
-                        pass
-                        #arcpy.AddMessage("  No Match")
-                i = i + 1
-            if iStart == 0:
-                newVertexList = vertexList
-                #arcpy.AddMessage("No Change for: " + str(featPolygon[0]))
-            else:
-                #arcpy.AddMessage("Changing Vertex List for: " + str(featPolygon[0]))
-                newVertexList = vertexList[iStart:i]+vertexList[0:iStart]
-                for v in newVertexList:
-                    arcpy.AddMessage(str(v[0]) + "," +str(v[1]))
-                #listVertexPointObjects = []
-                newShapeArray = arcpy.Array()
-                for newVertex in newVertexList:
-                    #arcpy.AddMessage("Changing Vertex: " + str(newVertex[0]) + ',' + str(newVertex[1]))
-                    newShapeArray.add(arcpy.Point(newVertex[0],newVertex[1]))
-                    #listVertexPointObjects.append(arcpy.Point(newVertex[0],newVertex[1]))
-                #newShapeArray = arcpy.Array(listVertexPointObjects)
-                newPolygonArray = arcpy.Polygon(newShapeArray)
+            # Exterior ring of the first part, without the closing vertex
+            listRing = []
+            for polygonVertex in featPolygon[1].getPart(0):
+                if not polygonVertex:
+                    break
+                listRing.append([polygonVertex.X,polygonVertex.Y])
+            arrayRing = np.array(listRing[:-1])
+
+            iStart = array_functions.ring_start(arrayRing,setPointKeys,dblTolerance)
+            if iStart != 0:
+                arrayRing = np.roll(arrayRing,-iStart,axis=0)
+                newPolygon = arcpy.Polygon(arcpy.Array([arcpy.Point(x,y) for x,y in arrayRing]),featPolygon[1].spatialReference)
+                ucPolygons.updateRow([featPolygon[0],newPolygon])
 
-                ucPolygons.updateRow([featPolygon[0],newPolygonArray])
-
-    return
\ No newline at end of file
+    return
@@ -16,11 +16,24 @@
 #!/usr/bin/env python
 
 # # Import Modules # #
+import os
 import math
+import uuid
+import hashlib
 import arcpy
+from common_package import cache
 
 scratchWorkspace = arcpy.env.scratchWorkspace
 
+# Extension of new datasets in a folder workspace. Use a file geodatabase or GeoPackage workspace
+# to avoid the shapefile field name truncation.
+outputExtension = ".shp"
+
+# Without a scratch workspace, temp datasets of a WorkspaceManager are staged in_memory below this
+# many input features.
+intScratchMemoryFeatures = 200000
+boolKeepScratch = False
+
 # # Functions # #
 def resetData(inputDataset):
     if arcpy.Exists(inputDataset):
@@ -28,25 +41,32 @@ def resetData(inputDataset):
 
     return
 
-def newGISDataset(workspace, inputDatasetName):
-    """ workspace = "LAYER", "in_memory", folder or gdb"""
-    if arcpy.Exists(workspace):
-        if arcpy.Describe(workspace).workspaceType == "LocalDatabase" or workspace == "in_memory":
-            ext = ""
-        else:
-            ext = ".shp"
+def newGISDataset(workspace, inputDatasetName, strExtension=None):
+    """ workspace = "LAYER", "in_memory", folder, gdb or gpkg
+
+    In a folder, a name without an extension is given strExtension (default outputExtension).
+    """
 
     if workspace == "LAYER" or workspace == "layer" or workspace == "Layer":
         inputDataset = inputDatasetName
-        if arcpy.Exists(inputDataset):
-            arcpy.Delete_management(inputDataset)
     else:
-        inputDataset = workspace + "\\" + inputDatasetName + ext
-        if arcpy.Exists(inputDataset):
-            arcpy.Delete_management(inputDataset)
+        strName,ext = os.path.splitext(inputDatasetName)
+        if is_database(workspace):
+            inputDataset = workspace + "\\" + strName
+        else:
+            inputDataset = workspace + "\\" + strName + (ext or strExtension or outputExtension)
+    if arcpy.Exists(inputDataset):
+        arcpy.Delete_management(inputDataset)
 
     return inputDataset
 
+def is_database(workspace):
+    """True for in_memory, file geodatabase and GeoPackage workspaces (datasets have no extension)."""
+
+    if workspace in ("in_memory", "memory") or os.path.splitext(workspace)[1].lower() in (".gdb", ".gpkg", ".sqlite"):
+        return True
+    return arcpy.Exists(workspace) and arcpy.Describe(workspace).workspaceType == "LocalDatabase"
+
 def getGISDataset(workspace,inputDatasetName):
     if workspace == "Layer":
         inputDataset = inputDatasetName
@@ -67,10 +87,10 @@ def resetField(inTable,FieldName,FieldType,TextLength=0):
         FieldName = FieldName[:10]
 
     if len(arcpy.ListFields(inTable,FieldName))==1:
-        if FieldType == "TEXT":
-            arcpy.CalculateField_management(inTable,FieldName,"''","PYTHON")
-        else:
-            arcpy.CalculateField_management(inTable,FieldName,"0","PYTHON")
+        valueReset = "" if FieldType == "TEXT" else 0
+        with arcpy.da.UpdateCursor(inTable,[FieldName]) as ucTable:
+            for row in ucTable:
+                ucTable.updateRow([valueReset])
         #arcpy.DeleteField_management(inTable,FieldName) #lots of 999999 errors 
     
     else: #Create Field if it does not exist
@@ -104,45 +124,163 @@ def unique_values(table, field):
     with arcpy.da.SearchCursor(table, [field]) as cursor:
         return sorted({row[0] for row in cursor})
 
-### Experimental ###
+def feature_count(inputDataset):
+    """Return the number of rows in a dataset or layer (or the length of a python collection)."""
+
+    if isinstance(inputDataset, (list, tuple, dict)):
+        return len(inputDataset)
+    return int(arcpy.GetCount_management(inputDataset).getOutput(0))
+
+def dataset_hash(inputDataset):
+    """Return a hash of the geometry, attributes and spatial reference of a dataset, for cache keys."""
+
+    listFields = [field.name for field in arcpy.ListFields(inputDataset) if field.type not in ["OID","Geometry"]]
+    hashDataset = hashlib.sha1(arcpy.Describe(inputDataset).spatialReference.exportToString().encode("utf-8"))
+    hashDataset.update(repr(listFields).encode("utf-8"))
+    with arcpy.da.SearchCursor(inputDataset,["SHAPE@WKB"] + listFields) as scDataset:
+        for row in scDataset:
+            hashDataset.update(bytes(row[0] or b""))
+            hashDataset.update(repr(row[1:]).encode("utf-8"))
+    return hashDataset.hexdigest()
+
+def cached_datasets(cacheWorkspace, strStep, listDatasets, listParameters, listOutputs, funcBuild):
+    """Create listOutputs with funcBuild, or copy them from the cache when the inputs are unchanged.
+
+    The cache key is the hash of listDatasets and listParameters. Without a cache workspace
+    funcBuild is always run.
+    """
+
+    if not cacheWorkspace:
+        funcBuild()
+        return listOutputs
+
+    cacheProducts = cache.Cache(cacheWorkspace)
+    # Entries name the outputs by position, as scratch dataset names differ between runs
+    listNames = [strStep + "_" + str(i) + ".shp" for i in range(len(listOutputs))]
+    strKey = cacheProducts.key(strStep,*([dataset_hash(inputDataset) for inputDataset in listDatasets] + list(listParameters) + listNames))
+
+    strEntry = cacheProducts.get(strKey)
+    if strEntry:
+        arcpy.AddMessage("Using cached " + strStep)
+        for strName,outputDataset in zip(listNames,listOutputs):
+            arcpy.CopyFeatures_management(os.path.join(strEntry,strName),outputDataset)
+        return listOutputs
+
+    funcBuild()
+    strPending = cacheProducts.create(strKey)
+    for strName,outputDataset in zip(listNames,listOutputs):
+        arcpy.CopyFeatures_management(outputDataset,os.path.join(strPending,strName))
+    cacheProducts.commit(strKey)
+    return listOutputs
+
 class WorkspaceManager(object):
-    """ object to manage files while geoprocessing """
+    """Scratch datasets of one tool run.
+
+    Each run has its own namespace: in_memory names are prefixed with the run id, and datasets on disk go
+    to a Run_<id>.gdb next to (or in) the scratch workspace, so concurrent runs do not collide. The run
+    geodatabase is created when the first dataset on disk is requested. When a folder or geodatabase is
+    given as the scratch workspace, all temp datasets are written there. Otherwise (in_memory or none), a
+    temp dataset is staged in_memory when its inputs have fewer than intMemoryFeatures features, and spills
+    to a run geodatabase in the arcpy scratch folder. Use as "with WorkspaceManager(...) as manager:" to
+    delete the intermediates when the run completes or fails (unless boolKeep).
+    """
+
+    def __init__(self,temporaryWorkspace,outputWorkspace=None,intMemoryFeatures=None,boolKeep=None):
 
-    def __init__(self,temporaryWorkspace,outputWorkspace):
-        
+        self.runID = run_id()
         self.outputWorkspace = outputWorkspace
         self.tempWorkspace = temporaryWorkspace
+        self.memoryFeatures = intMemoryFeatures if intMemoryFeatures is not None else intScratchMemoryFeatures
+        self.keep = boolKeepScratch if boolKeep is None else boolKeep
         self.listTempFiles = []
         self.listOutputFiles = []
+        self.listLayers = []
+        self.peakDiskBytes = 0
+
+        self.stageInMemory = is_memory_workspace(temporaryWorkspace) or not temporaryWorkspace
+        if self.stageInMemory:
+            self.diskFolder = arcpy.env.scratchFolder
+            self.keep = False
+        elif os.path.splitext(temporaryWorkspace)[1].lower() in (".gdb",".gpkg",".sqlite"):
+            self.diskFolder = os.path.dirname(temporaryWorkspace)
+        else:
+            self.diskFolder = temporaryWorkspace
+        self.diskWorkspace = os.path.join(self.diskFolder,"Run_" + self.runID + ".gdb")
         return
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exc_type,exc_value,traceback):
+        self.clearTempWorkspace()
+        return False
+
     def tempLayer(self,layerName):
+        layerName = layerName + "_" + self.runID
         if arcpy.Exists(layerName):
             arcpy.Delete_management(layerName)
-        return layerName 
+        self.listLayers.append(layerName)
+        return layerName
 
     def outputDataset(self,filename):
-        
+
         outputFileName = newGISDataset(self.outputWorkspace,filename)
         self.listOutputFiles.append(outputFileName)
-        
+
         return outputFileName
 
-    def tempDataset(self,filename):        
-        
-        tempFileName = newGISDataset(self.tempWorkspace,filename)
+    def tempDataset(self,filename,listInputs=None):
+        """Return the path of a new temp dataset, on disk when a scratch workspace is given or its inputs are large."""
+
+        if not self.stageInMemory or (listInputs and sum(feature_count(inputDataset) for inputDataset in listInputs) > self.memoryFeatures):
+            if not arcpy.Exists(self.diskWorkspace):
+                arcpy.CreateFileGDB_management(self.diskFolder,os.path.basename(self.diskWorkspace))
+            tempFileName = newGISDataset(self.diskWorkspace,filename)
+        else:
+            tempFileName = newGISDataset("in_memory","R" + self.runID + "_" + filename)
         self.listTempFiles.append(tempFileName)
 
         return tempFileName
-    
+
+    def usage(self):
+        """Return the number of temp datasets in memory and on disk and the disk bytes of the run."""
+
+        intDiskBytes = cache.folder_size(self.diskWorkspace) if os.path.isdir(self.diskWorkspace) else 0
+        self.peakDiskBytes = max(self.peakDiskBytes,intDiskBytes)
+        intMemory = len([tempFile for tempFile in self.listTempFiles if is_memory_workspace(tempFile)])
+        return {"MemoryDatasets":intMemory,
+                "DiskDatasets":len(self.listTempFiles) - intMemory,
+                "DiskBytes":intDiskBytes,
+                "PeakDiskBytes":self.peakDiskBytes}
+
+    def report(self):
+        dictUsage = self.usage()
+        arcpy.AddMessage("Scratch: " + str(dictUsage["MemoryDatasets"]) + " datasets in memory, " +
+                         str(dictUsage["DiskDatasets"]) + " on disk (" + str(round(dictUsage["DiskBytes"] / 1048576.0,1)) + " MB)")
+        return dictUsage
+
     def clearTempWorkspace(self):
+        """Delete the temp datasets and layers of the run (the run geodatabase is kept with boolKeep)."""
+
+        self.usage()
+        for tempFile in self.listTempFiles + self.listLayers:
+            if (self.keep and not is_memory_workspace(tempFile)) or not arcpy.Exists(tempFile):
+                continue
+            arcpy.Delete_management(tempFile)
+        self.listTempFiles = [tempFile for tempFile in self.listTempFiles if self.keep and not is_memory_workspace(tempFile)]
+        self.listLayers = []
+        if not self.keep and arcpy.Exists(self.diskWorkspace):
+            arcpy.Delete_management(self.diskWorkspace)
+
+        return
+
+def run_id():
+    """Return a short id unique to a run (process id and a random part)."""
+
+    return str(os.getpid()) + "_" + uuid.uuid4().hex[:6]
 
-        for file in self.listTempFiles:
-            if arcpy.Exists(file):
-                arcpy.Delete_management(file)
-            self.listTempFiles = self.listTempFiles.remove(file)
-        
-        return 
+def is_memory_workspace(inputDataset):
+    return str(inputDataset).replace("/","\\").split("\\")[0].lower() in ("in_memory","memory")
 
 if __name__ == "__main__":
     print("gis_tools.py is not an executable python script.")
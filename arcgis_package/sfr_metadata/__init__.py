@@ -1 +0,0 @@
-from Metadata import MetadataWriter
\ No newline at end of file
@@ -0,0 +1,121 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Bank Side Benchmark                                            #
+# Purpose:     Compare the nearest segment bank side classifier with the      #
+#              left side buffer and select method.                            #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import argparse
+import timeit
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from geos_package import ConfiningMargins, gis_tools
+from benchmarks import synthetic
+
+
+def buffer_bank_sides(arrayNetwork, arrayBankPolygons, arrayMargins):
+    """Reference method: bank polygons touched by a 1 m left side buffer are LEFT, margins take the nearest polygon."""
+
+    arrayBankSidePoints = shapely.point_on_surface(shapely.buffer(arrayNetwork, 1.0, cap_style="flat", single_sided=True))
+    treeBanks = STRtree(arrayBankPolygons)
+    setLeftBanks = set(treeBanks.query(arrayBankSidePoints, predicate="intersects")[1].tolist())
+    arrayNearestBank = treeBanks.nearest(shapely.line_interpolate_point(arrayMargins, 0.5, normalized=True))
+    return ["LEFT" if iBank in setLeftBanks else "RIGHT" for iBank in arrayNearestBank]
+
+
+def reach_buffer_bank_sides(arrayNetwork, arrayMargins, dblDistance):
+    """Reference labels per margin: LEFT if the margin is within the left side buffer of its nearest reach.
+
+    A bank polygon in the wedge of a tributary junction is left of one stream and right of the other, so
+    the bank polygon labels are ambiguous there; this applies the same left buffer test to each margin.
+    """
+
+    arrayMidPoints = shapely.line_interpolate_point(arrayMargins, 0.5, normalized=True)
+    arrayNearestReach = STRtree(arrayNetwork).nearest(arrayMidPoints)
+    arrayLeftBuffers = shapely.buffer(arrayNetwork[arrayNearestReach], dblDistance, cap_style="flat", single_sided=True)
+    return ["LEFT" if boolLeft else "RIGHT" for boolLeft in shapely.intersects(arrayLeftBuffers, arrayMidPoints)]
+
+
+def segment_bank_sides(arrayNetwork, arrayMargins):
+    return ConfiningMargins.bank_sides(arrayNetwork, shapely.line_interpolate_point(arrayMargins, 0.5, normalized=True))
+
+
+def main(intStreams, intRepeat):
+
+    fcNetwork = synthetic.network(intStreams)
+    dblChannelWidth = 20.0
+    fcChannel, fcValleyBottom = synthetic.channel_and_valley(fcNetwork, dblChannelWidth)
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+    gValleyBottom = fcValleyBottom.geometries[0]
+    gConfinedChannel = shapely.intersection(fcChannel.geometries[0], gValleyBottom)
+    arrayMargins = ConfiningMargins.confining_margins(gConfinedChannel, gValleyBottom)
+
+    def run_buffer():
+        # Bank polygons split by the network and the dangle near lines only, as the buffer method used them
+        arrayDangles = ConfiningMargins.dangle_points(arrayNetwork)
+        arrayDangles = arrayDangles[shapely.intersects(arrayDangles, gConfinedChannel)]
+        arrayBankLines = np.concatenate([arrayNetwork, ConfiningMargins.near_lines(arrayDangles, gConfinedChannel.boundary)])
+        arrayBankPolygons = ConfiningMargins.channel_bank_polygons(arrayNetwork, gConfinedChannel, arrayBankLines)
+        return buffer_bank_sides(arrayNetwork, arrayBankPolygons, arrayMargins)
+
+    def run_segment():
+        return segment_bank_sides(arrayNetwork, arrayMargins)
+
+    arraySegment = np.array(run_segment())
+    arrayBuffer = np.array(run_buffer())
+    arrayReach = np.array(reach_buffer_bank_sides(arrayNetwork, arrayMargins, dblChannelWidth))
+
+    # The tool splits the margins at the bank polygons of each segment and labels the pieces from the polygons
+    arrayChannelBankLines = ConfiningMargins.channel_bank_lines(arrayNetwork, gConfinedChannel)
+    fcChannelBankPolygons = gis_tools.FeatureClass("Polygon")
+    fcChannelBankPolygons.geometries = list(ConfiningMargins.channel_bank_polygons(arrayNetwork, gConfinedChannel, arrayChannelBankLines))
+    ConfiningMargins.determine_banks(fcNetwork, fcChannelBankPolygons, "in_memory")
+    fcPieces = ConfiningMargins.margin_bank_sides(arrayMargins, fcChannelBankPolygons, arrayChannelBankLines)
+    arrayPieces = gis_tools.geometry_array(fcPieces)
+    arrayPieceReach = np.array(reach_buffer_bank_sides(arrayNetwork, arrayPieces, dblChannelWidth))
+    arrayPieceLength = shapely.length(arrayPieces)
+    dblPieceAgreement = arrayPieceLength[np.array(fcPieces.getValues("BankSide")) == arrayPieceReach].sum() / max(arrayPieceLength.sum(), 1e-9)
+
+    dblBuffer = min(timeit.repeat(run_buffer, number=1, repeat=intRepeat))
+    dblSegment = min(timeit.repeat(run_segment, number=1, repeat=intRepeat))
+
+    print("Network segments:   " + str(len(arrayNetwork)))
+    print("Confining margins:  " + str(len(arrayMargins)))
+    print("Buffer and select:  {0:.4f} s".format(dblBuffer))
+    print("Nearest segment:    {0:.4f} s".format(dblSegment))
+    print("Speedup:            {0:.1f}x".format(dblBuffer / dblSegment))
+    print("Label agreement:    {0:.1%} with the reach left buffer labels".format(agreement(arraySegment, arrayReach)))
+    print("                    {0:.1%} with the bank polygon labels".format(agreement(arraySegment, arrayBuffer)))
+    print("Split margin labels: {0:.1%} of the margin length agrees with the reach left buffer labels".format(dblPieceAgreement))
+
+    return dblBuffer, dblSegment, agreement(arraySegment, arrayReach)
+
+
+def agreement(arrayLabels, arrayReference):
+    if len(arrayLabels) == 0:
+        return 1.0
+    return np.mean(arrayLabels == arrayReference)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the bank side classifier.")
+    parser.add_argument("--streams", type=int, default=50, help="Number of streams in the synthetic network")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timing repeats")
+    args = parser.parse_args()
+
+    main(args.streams, args.repeat)
@@ -0,0 +1,319 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Benchmark Suite                                                #
+# Purpose:     Time the Confinement Toolbox tools end to end and per stage on #
+#              synthetic river networks, and compare result files to catch    #
+#              regressions between releases.                                  #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+from collections import OrderedDict
+
+import confinement
+from geos_package import gis_tools
+from benchmarks import synthetic
+
+intSuiteVersion = 1
+listCases = ["margins", "moving-window", "segments", "divide", "bankfull"]
+
+
+# # Cases # #
+# Each case runs one tool of a backend on the inputs of a scale and returns the path of its profile JSON (or None).
+# The tool modules are loaded as by the command line, so the arcpy backend runs the arcgis_package tools and
+# Bankfull_Channel.pyt.
+def case_margins(dictInputs, workspace, strBackend="geos"):
+    ConfiningMargins = confinement.load_module(strBackend, "ConfiningMargins")
+    ConfiningMargins.main(dictInputs["network"], dictInputs["valley_bottom"], dictInputs["channel"],
+                          os.path.join(workspace, "RawConfiningState.shp"), os.path.join(workspace, "ConfiningMargins.shp"),
+                          "in_memory", False, None, True)
+    return os.path.join(workspace, "RawConfiningState_Profile.json")
+
+
+def case_moving_window(dictInputs, workspace, strBackend="geos"):
+    MovingWindow = confinement.load_module(strBackend, "MovingWindow")
+    MovingWindow.main(dictInputs["raw"], "RouteID", "IsConfined", "IsConstric", "50", "100;200;500", workspace,
+                      "in_memory", True)
+    return os.path.join(workspace, "MovingWindow_Profile.json")
+
+
+def case_segments(dictInputs, workspace, strBackend="geos"):
+    ConfinementSegments = confinement.load_module(strBackend, "ConfinementSegments")
+    ConfinementSegments.custom_segments(dictInputs["raw"], "SegID", "IsConfined", "IsConstric", workspace)
+    return None
+
+
+def case_divide(dictInputs, workspace, strBackend="geos"):
+    DividePolygonBySegment = confinement.load_module(strBackend, "DividePolygonBySegment")
+    DividePolygonBySegment.main(dictInputs["network"], dictInputs["valley_bottom"],
+                                os.path.join(workspace, "SegmentPolygons.shp"), "in_memory")
+    return None
+
+
+def case_bankfull(dictInputs, workspace, strBackend="geos"):
+    BankfullChannel = confinement.load_module(strBackend, "BankfullChannel")
+    if strBackend == "geos":
+        BankfullChannel.main(dictInputs["network"], dictInputs["drainage_area"], dictInputs["precipitation"],
+                             dictInputs["valley_bottom"], workspace, 3.0, 100.0, "Beechie_Imaki", "in_memory", True)
+        return os.path.join(workspace, "final_bankfull_channel_Profile.json")
+    BankfullChannel.main(dictInputs["network"], dictInputs["drainage_area"], dictInputs["precipitation"],
+                         dictInputs["valley_bottom"], workspace, 3.0, 100.0, os.path.join(workspace, "temp"), "True")
+    return None
+
+
+dictCases = OrderedDict([("margins", case_margins),
+                         ("moving-window", case_moving_window),
+                         ("segments", case_segments),
+                         ("divide", case_divide),
+                         ("bankfull", case_bankfull)])
+
+# Modules a case or backend needs, it is skipped (not failed) if one cannot be imported
+dictCaseRequirements = {"bankfull": ["rasterio"]}
+dictBackendRequirements = {"geos": [], "arcpy": ["arcpy"]}
+
+
+# # Main Function # #
+def main(listReaches,
+         listSinuosity,
+         listConfinement,
+         listCaseNames,
+         workspace,
+         strResults,
+         intRepeat=3,
+         seed=0,
+         strBackend="geos"):
+    """Run each case on the synthetic network of each scale and append the results to strResults.
+
+    Inputs are generated once per scale in workspace/inputs and reused by later runs. Each result is
+    one JSON line with the best wall time of intRepeat runs, the per stage profile of the best run
+    (for the tools that record one) and the environment (commit, python and platform). The cases run the
+    tools of strBackend (geos or arcpy), and are skipped with the reason recorded if it cannot be imported.
+    """
+
+    dictEnvironment = environment()
+    listResults = []
+    for intReaches in listReaches:
+        for dblSinuosity in listSinuosity:
+            for dblConfinement in listConfinement:
+                dictScale = OrderedDict([("reaches", intReaches),
+                                         ("sinuosity", dblSinuosity),
+                                         ("confinement", dblConfinement),
+                                         ("seed", seed)])
+                dictInputs = inputs(workspace, dictScale, "bankfull" in listCaseNames)
+                for strCase in listCaseNames:
+                    dictResult = OrderedDict([("suite_version", intSuiteVersion), ("case", strCase), ("backend", strBackend)])
+                    dictResult.update(dictScale)
+                    dictResult.update(run_case(strCase, dictInputs, workspace, intRepeat, strBackend))
+                    dictResult.update(dictEnvironment)
+                    listResults.append(dictResult)
+                    print(result_line(dictResult))
+
+    with open(strResults, "a") as fileResults:
+        for dictResult in listResults:
+            fileResults.write(json.dumps(dictResult) + "\n")
+
+    return listResults
+
+
+def inputs(workspace, dictScale, boolRasters=False):
+    """Return the input paths of a scale, generating the synthetic network, polygons and rasters if needed."""
+
+    strScale = "_".join(str(value) for value in dictScale.values())
+    inputWorkspace = os.path.join(workspace, "inputs", strScale)
+    dictInputs = OrderedDict([("network", os.path.join(inputWorkspace, "Network.shp")),
+                              ("valley_bottom", os.path.join(inputWorkspace, "ValleyBottom.shp")),
+                              ("channel", os.path.join(inputWorkspace, "Channel.shp")),
+                              ("raw", os.path.join(inputWorkspace, "RawConfiningState.shp")),
+                              ("drainage_area", os.path.join(inputWorkspace, "DrainageArea.tif")),
+                              ("precipitation", os.path.join(inputWorkspace, "Precipitation.tif"))])
+
+    if not os.path.exists(dictInputs["network"]):
+        if not os.path.isdir(inputWorkspace):
+            os.makedirs(inputWorkspace)
+        fcNetwork = synthetic.basins(dictScale["reaches"], dictScale["sinuosity"], dictScale["seed"])
+        fcChannel, fcValleyBottom = synthetic.channel_and_valley(fcNetwork, seed=dictScale["seed"],
+                                                                 dblConfinement=dictScale["confinement"])
+        gis_tools.write_dataset(fcNetwork, dictInputs["network"])
+        gis_tools.write_dataset(fcChannel, dictInputs["channel"])
+        gis_tools.write_dataset(fcValleyBottom, dictInputs["valley_bottom"])
+
+        # Moving window and segment cases run on the confining state of the network
+        from geos_package import ConfiningMargins
+        ConfiningMargins.main(dictInputs["network"], dictInputs["valley_bottom"], dictInputs["channel"],
+                              dictInputs["raw"], None, "in_memory")
+
+    if boolRasters and not os.path.exists(dictInputs["drainage_area"]) and available(["rasterio"]):
+        synthetic.rasters(gis_tools.read_dataset(dictInputs["network"]), inputWorkspace)
+
+    return dictInputs
+
+
+def run_case(strCase, dictInputs, workspace, intRepeat, strBackend="geos"):
+    """Time a case intRepeat times, each in a new output workspace, and keep the best run."""
+
+    listMissing = [strModule for strModule in dictBackendRequirements[strBackend] + dictCaseRequirements.get(strCase, [])
+                   if not available([strModule])]
+    if listMissing:
+        return OrderedDict([("status", "skipped"), ("error", "requires " + ", ".join(listMissing))])
+
+    dictBest = None
+    for intRun in range(intRepeat):
+        caseWorkspace = os.path.join(workspace, "runs", strBackend, strCase)
+        if os.path.isdir(caseWorkspace):
+            shutil.rmtree(caseWorkspace)
+        os.makedirs(caseWorkspace)
+        gis_tools.dictMemoryWorkspace.clear()
+
+        dblStart = time.time()
+        try:
+            strProfile = dictCases[strCase](dictInputs, caseWorkspace, strBackend)
+        except Exception as e:
+            return OrderedDict([("status", "failed"), ("error", repr(e))])
+        dblSeconds = time.time() - dblStart
+
+        if dictBest is None or dblSeconds < dictBest["wall_seconds"]:
+            listStages = None
+            if strProfile and os.path.exists(strProfile):
+                with open(strProfile) as fileProfile:
+                    listStages = json.load(fileProfile, object_pairs_hook=OrderedDict)["stages"]
+            dictBest = OrderedDict([("status", "succeeded"),
+                                    ("wall_seconds", round(dblSeconds, 4)),
+                                    ("repeat", intRepeat),
+                                    ("stages", listStages)])
+
+    return dictBest
+
+
+def available(listModules):
+    for strModule in listModules:
+        try:
+            __import__(strModule)
+        except ImportError:
+            return False
+    return True
+
+
+def environment():
+    """Return the commit, python version and platform of the run, so results of different runs can be compared."""
+
+    strRepository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        strCommit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=strRepository,
+                                            stderr=subprocess.STDOUT).decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        strCommit = None
+
+    return OrderedDict([("commit", strCommit),
+                        ("timestamp", time.strftime("%Y-%m-%dT%H:%M:%S")),
+                        ("python", platform.python_version()),
+                        ("platform", platform.platform()),
+                        ("processor", platform.processor() or platform.machine())])
+
+
+def result_line(dictResult):
+    strScale = "{0:>7} reaches  sinuosity {1}  confinement {2}".format(dictResult["reaches"], dictResult["sinuosity"],
+                                                                       dictResult["confinement"])
+    strCase = "{0:<14}{1:<6}".format(dictResult["case"], dictResult.get("backend", "geos"))
+    if dictResult["status"] != "succeeded":
+        return "{0}{1}  {2}: {3}".format(strCase, strScale, dictResult["status"], dictResult["error"])
+    return "{0}{1}  {2:>10.4f} s".format(strCase, strScale, dictResult["wall_seconds"])
+
+
+# # Compare # #
+def read_results(strResults):
+    """Return the latest succeeded result of each (case, backend, reaches, sinuosity, confinement, seed) in a results file."""
+
+    dictResults = OrderedDict()
+    with open(strResults) as fileResults:
+        for strLine in fileResults:
+            if not strLine.strip():
+                continue
+            dictResult = json.loads(strLine, object_pairs_hook=OrderedDict)
+            if dictResult["status"] == "succeeded":
+                dictResults[result_key(dictResult)] = dictResult
+    return dictResults
+
+
+def result_key(dictResult):
+    return (dictResult["case"], dictResult.get("backend", "geos"), dictResult["reaches"], dictResult["sinuosity"],
+            dictResult["confinement"], dictResult["seed"])
+
+
+def compare(strBaseline, strCandidate, dblThreshold=0.10):
+    """Print the wall time ratio (candidate / baseline) of each case and stage in both files.
+
+    Returns the keys of the cases more than dblThreshold slower than the baseline.
+    """
+
+    dictBaseline = read_results(strBaseline)
+    dictCandidate = read_results(strCandidate)
+
+    listRegressions = []
+    for tupleKey, dictResult in dictCandidate.items():
+        if tupleKey not in dictBaseline:
+            continue
+        dictBase = dictBaseline[tupleKey]
+        dblRatio = dictResult["wall_seconds"] / max(dictBase["wall_seconds"], 1e-9)
+        strFlag = ""
+        if dblRatio > 1.0 + dblThreshold:
+            listRegressions.append(tupleKey)
+            strFlag = "  REGRESSION"
+        print("{0:<14}{1:<6}{2:>7} reaches  {3:>10.4f} s -> {4:>10.4f} s  {5:>6.2f}x{6}".format(
+            tupleKey[0], tupleKey[1], tupleKey[2], dictBase["wall_seconds"], dictResult["wall_seconds"], dblRatio, strFlag))
+
+        dictBaseStages = OrderedDict((dictStage["Stage"], dictStage) for dictStage in dictBase.get("stages") or [])
+        for dictStage in dictResult.get("stages") or []:
+            if dictStage["Stage"] in dictBaseStages:
+                dblBaseStage = dictBaseStages[dictStage["Stage"]]["WallSeconds"]
+                print("    {0:<24}{1:>10.4f} s -> {2:>10.4f} s".format(dictStage["Stage"], dblBaseStage, dictStage["WallSeconds"]))
+
+    return listRegressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark the Confinement Toolbox on synthetic river networks.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    parserRun = subparsers.add_parser("run", help="Run the benchmark cases")
+    parserRun.add_argument("--reaches", type=int, nargs="+", default=[10, 1000], help="Network sizes (number of reaches)")
+    parserRun.add_argument("--sinuosity", type=float, nargs="+", default=[0.6], help="Heading oscillation amplitudes (radians)")
+    parserRun.add_argument("--confinement", type=float, nargs="+", default=[0.3], help="Fractions of confined reaches")
+    parserRun.add_argument("--cases", nargs="+", choices=listCases, default=listCases)
+    parserRun.add_argument("--backend", choices=confinement.listBackends, default="geos", help="Geoprocessing backend of the tools")
+    parserRun.add_argument("--workspace", default="benchmark_workspace", help="Folder for inputs and outputs")
+    parserRun.add_argument("--results", default="benchmark_results.jsonl", help="Results file (JSON lines, appended)")
+    parserRun.add_argument("--repeat", type=int, default=3)
+    parserRun.add_argument("--seed", type=int, default=0)
+
+    parserCompare = subparsers.add_parser("compare", help="Compare a results file to a baseline")
+    parserCompare.add_argument("baseline")
+    parserCompare.add_argument("candidate")
+    parserCompare.add_argument("--threshold", type=float, default=0.10, help="Slowdown ratio reported as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        listResults = main(args.reaches, args.sinuosity, args.confinement, args.cases, args.workspace, args.results,
+                           args.repeat, args.seed, args.backend)
+        sys.exit(1 if any(dictResult["status"] == "failed" for dictResult in listResults) else 0)
+    elif args.command == "compare":
+        sys.exit(1 if compare(args.baseline, args.candidate, args.threshold) else 0)
+    else:
+        parser.print_help()
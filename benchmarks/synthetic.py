@@ -0,0 +1,173 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Synthetic Networks                                             #
+# Purpose:     Generate synthetic stream networks, channel and valley bottom  #
+#              polygons for benchmarking the Confinement Toolbox.             #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+
+import numpy as np
+import shapely
+
+from geos_package import gis_tools
+
+strCRS = "EPSG:26910"
+
+
+def sinuous_line(x0, y0, dblLength, dblAngle, dblSegmentLength, random, dblSinuosity=0.6):
+    """Return the vertices of a meandering line of dblLength starting at (x0, y0) heading dblAngle (radians).
+
+    dblSinuosity is the amplitude (radians) of the heading oscillation, 0 for a straight line.
+    """
+
+    intVertices = max(int(dblLength / dblSegmentLength), 2)
+    arrayHeading = dblAngle + dblSinuosity * np.sin(np.linspace(0, dblLength / 150.0, intVertices)) + \
+                   random.normal(0, 0.05, intVertices)
+    arrayXY = np.cumsum(np.column_stack([np.cos(arrayHeading), np.sin(arrayHeading)]) * dblSegmentLength, axis=0)
+    return np.vstack([[x0, y0], arrayXY + [x0, y0]])
+
+
+def network(intStreams=10, dblStreamLength=5000.0, dblSegmentLength=20.0, dblReachLength=500.0, seed=0, dblSinuosity=0.6):
+    """Build a synthetic tributary network as a FeatureClass of reaches.
+
+    A main stem is generated first and each following stream joins an earlier one at a random vertex,
+    without crossing the streams already placed (so fewer than intStreams may be returned).
+    Streams are digitized downstream and split into reaches of about dblReachLength. Fields are
+    RouteID (stream), SegID (reach) and Tile (a partition key, every 4 streams).
+    """
+
+    random = np.random.RandomState(seed)
+    fcNetwork = gis_tools.FeatureClass("LineString", strCRS)
+    fcNetwork.addField("RouteID", "LONG")
+    fcNetwork.addField("SegID", "LONG")
+    fcNetwork.addField("Tile", "LONG")
+
+    listStreams = [sinuous_line(0.0, 0.0, dblStreamLength, 0.0, dblSegmentLength, random, dblSinuosity)]
+    gStreams = shapely.linestrings(listStreams[0])
+    intAttempts = 0
+    while len(listStreams) < intStreams and intAttempts < intStreams * 50:
+        intAttempts += 1
+        arrayParent = listStreams[random.randint(len(listStreams))]
+        xJunction, yJunction = arrayParent[random.randint(1, len(arrayParent) - 1)]
+        dblAngle = np.arctan2(*(arrayParent[-1] - arrayParent[0])[::-1]) + random.choice([1.0, -1.0]) * random.uniform(0.6, 1.2)
+        arrayXY = sinuous_line(xJunction, yJunction, dblStreamLength / 2.0, dblAngle, dblSegmentLength, random, dblSinuosity)[::-1]
+
+        # Tributaries must stay clear of the other streams except at their junction
+        gTributary = shapely.linestrings(arrayXY[:-5])
+        if shapely.distance(gTributary, gStreams) < dblSegmentLength:
+            continue
+        listStreams.append(arrayXY)
+        gStreams = shapely.union(gStreams, shapely.linestrings(arrayXY))
+
+    for iStream, arrayXY in enumerate(listStreams):
+        if iStream == 0:
+            arrayXY = arrayXY[::-1]
+        intStep = max(int(dblReachLength / dblSegmentLength), 1)
+        for iStart in range(0, len(arrayXY) - 1, intStep):
+            fcNetwork.addRow(shapely.linestrings(arrayXY[iStart:iStart + intStep + 1]),
+                             {"RouteID": iStream + 1, "SegID": len(fcNetwork), "Tile": iStream // 4})
+
+    return fcNetwork
+
+
+def basins(intReaches, dblSinuosity=0.6, seed=0, intStreams=20, dblBasinSpacing=12000.0):
+    """Build a network of about intReaches reaches from independent synthetic basins on a grid.
+
+    Each basin is a network() of intStreams streams with its own seed, so large networks are built
+    in linear time. RouteID and SegID are unique across basins, and Tile is the basin number.
+    """
+
+    fcNetwork = None
+    intBasins = 0
+    intColumns = None
+    while fcNetwork is None or len(fcNetwork) < intReaches:
+        fcBasin = network(intStreams, seed=seed + intBasins, dblSinuosity=dblSinuosity)
+        if fcNetwork is None:
+            fcNetwork = fcBasin.copySchema()
+            intColumns = max(int(np.ceil(np.sqrt(float(intReaches) / len(fcBasin)))), 1)
+        arrayOffset = np.array([intBasins % intColumns, intBasins // intColumns]) * dblBasinSpacing
+        intRouteOffset = max(fcNetwork.getValues("RouteID") or [0])
+        intReachesLeft = intReaches - len(fcNetwork)
+        for gReach, dictValues in zip(fcBasin.geometries[:intReachesLeft],
+                                      (fcBasin.getRow(i) for i in range(intReachesLeft))):
+            dictValues["RouteID"] = dictValues["RouteID"] + intRouteOffset
+            dictValues["SegID"] = len(fcNetwork)
+            dictValues["Tile"] = intBasins
+            fcNetwork.addRow(shapely.transform(gReach, lambda arrayXY: arrayXY + arrayOffset), dictValues)
+        intBasins = intBasins + 1
+
+    return fcNetwork
+
+
+def channel_and_valley(fcNetwork, dblChannelWidth=20.0, dblValleyWidth=120.0, seed=0, dblConfinement=None):
+    """Return (channel, valley bottom) polygon FeatureClasses around a synthetic network.
+
+    The valley bottom is a buffer of the network whose width varies by reach, so the channel
+    touches the valley margin on some reaches and not on others. With dblConfinement (0 to 1),
+    about that fraction of reaches have a valley narrower than 1.5 channel widths and the
+    others a valley of 2 to 6 channel widths.
+    """
+
+    random = np.random.RandomState(seed)
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+
+    if dblConfinement is None:
+        arrayValleyWidth = random.uniform(dblChannelWidth * 0.8, dblValleyWidth, len(arrayNetwork))
+    else:
+        arrayValleyWidth = np.where(random.uniform(0, 1, len(arrayNetwork)) < dblConfinement,
+                                    random.uniform(dblChannelWidth * 0.8, dblChannelWidth * 1.5, len(arrayNetwork)),
+                                    random.uniform(dblChannelWidth * 2.0, dblChannelWidth * 6.0, len(arrayNetwork)))
+    arrayOffset = random.uniform(-0.5, 0.5, len(arrayNetwork)) * arrayValleyWidth
+    arrayValleyReaches = shapely.buffer(shapely.offset_curve(arrayNetwork, arrayOffset), arrayValleyWidth / 2.0)
+
+    fcChannel = gis_tools.FeatureClass("Polygon", strCRS)
+    fcChannel.addRow(shapely.union_all(shapely.buffer(arrayNetwork, dblChannelWidth / 2.0)))
+    fcValleyBottom = gis_tools.FeatureClass("Polygon", strCRS)
+    fcValleyBottom.addRow(shapely.union_all(np.concatenate([arrayValleyReaches,
+                                                            shapely.buffer(arrayNetwork, dblChannelWidth * 0.3)])))
+
+    return fcChannel, fcValleyBottom
+
+
+def rasters(fcNetwork, outputFolder, dblCellSize=30.0, dblPadding=500.0):
+    """Write drainage area (km2) and precipitation (mm) GeoTIFFs covering a synthetic network.
+
+    Drainage area increases towards the basin outlets (low x) and precipitation varies smoothly
+    across the extent, so each reach gets a different bankfull width. Returns the two paths.
+    """
+
+    import rasterio
+    from affine import Affine
+
+    xMin, yMin, xMax, yMax = shapely.total_bounds(gis_tools.geometry_array(fcNetwork))
+    xMin, yMin, xMax, yMax = xMin - dblPadding, yMin - dblPadding, xMax + dblPadding, yMax + dblPadding
+    intColumns = int(np.ceil((xMax - xMin) / dblCellSize))
+    intRows = int(np.ceil((yMax - yMin) / dblCellSize))
+    arrayX = xMin + (np.arange(intColumns) + 0.5) * dblCellSize
+    arrayY = yMax - (np.arange(intRows) + 0.5) * dblCellSize
+
+    dictArrays = {"DrainageArea": (1.0 + 250.0 * (1.0 - (arrayX - xMin) / (xMax - xMin)))[np.newaxis, :].repeat(intRows, 0),
+                  "Precipitation": 600.0 + 400.0 * np.sin(arrayY / 5000.0)[:, np.newaxis] * np.cos(arrayX / 7000.0)[np.newaxis, :]}
+
+    listPaths = []
+    for strName in ("DrainageArea", "Precipitation"):
+        strPath = os.path.join(outputFolder, strName + ".tif")
+        with rasterio.open(strPath, "w", driver="GTiff", width=intColumns, height=intRows, count=1, dtype="float32",
+                           crs=strCRS, transform=Affine(dblCellSize, 0.0, xMin, 0.0, -dblCellSize, yMax),
+                           tiled=True, blockxsize=256, blockysize=256) as raster:
+            raster.write(dictArrays[strName].astype("float32"), 1)
+        listPaths.append(strPath)
+
+    return listPaths
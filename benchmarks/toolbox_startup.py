@@ -0,0 +1,146 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Toolbox Startup Benchmark                                      #
+# Purpose:     Time loading Confinement_Toolbox.pyt, building the tool        #
+#              parameters and validating them as the tool dialogs do.         #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+"""Run with the python of ArcGIS (the toolbox needs arcpy), from the repository folder:
+
+    python benchmarks/toolbox_startup.py --project Confinement.xml --results startup.jsonl
+"""
+
+# # Import Modules # #
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from collections import OrderedDict
+
+strRepository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+strToolbox = os.path.join(strRepository, "Confinement_Toolbox.pyt")
+
+# Modules the toolbox should only import when a tool runs
+listToolModules = ["arcgis_package.ConfiningMargins", "arcgis_package.MovingWindow", "arcgis_package.ConfinementSegments"]
+
+
+def load_toolbox():
+    """Load the toolbox as ArcGIS does when it is opened, returning the module."""
+
+    import imp
+
+    for strModule in ["Confinement_Toolbox"] + listToolModules:
+        sys.modules.pop(strModule, None)
+    return imp.load_source("Confinement_Toolbox", strToolbox)
+
+
+def best_time(function, intRepeat):
+    """Return the best wall time (seconds) of intRepeat calls of function, and its last result."""
+
+    dblBest = None
+    for i in range(intRepeat):
+        dblStart = time.time()
+        result = function()
+        dblSeconds = time.time() - dblStart
+        dblBest = dblSeconds if dblBest is None else min(dblBest, dblSeconds)
+    return dblBest, result
+
+
+def validate(tool, listParameters):
+    """Validate the parameters as the tool dialog does after a parameter changes."""
+
+    tool.updateParameters(listParameters)
+    tool.updateMessages(listParameters)
+
+
+# # Main Function # #
+def main(strProjectXML, intRepeat, intValidations, strResults=None):
+    """Time the toolbox load, each tool's getParameterInfo and its validation, and print the results.
+
+    With strProjectXML the project parameter of each tool is set, so the first validation parses the
+    project XML and the next intValidations reuse the parsed project. Returns the results, or None
+    if arcpy is not available.
+    """
+
+    dictResult = OrderedDict([("benchmark", "toolbox_startup"),
+                              ("timestamp", time.strftime("%Y-%m-%dT%H:%M:%S")),
+                              ("python", platform.python_version()),
+                              ("project", strProjectXML)])
+
+    dblStart = time.time()
+    try:
+        import arcpy
+    except ImportError:
+        print("arcpy is not available, the toolbox startup benchmark was skipped")
+        return None
+    dictResult["arcpy_import_seconds"] = round(time.time() - dblStart, 4)
+
+    if strRepository not in sys.path:
+        sys.path.insert(0, strRepository)
+    dblLoad, Confinement_Toolbox = best_time(load_toolbox, intRepeat)
+    dictResult["load_seconds"] = round(dblLoad, 4)
+    dictResult["tool_modules_loaded"] = [strModule for strModule in listToolModules if strModule in sys.modules]
+
+    listTools = []
+    for ToolClass in Confinement_Toolbox.Toolbox().tools:
+        dictTool = OrderedDict([("tool", ToolClass.__name__)])
+        dblParameters, listParameters = best_time(lambda: ToolClass().getParameterInfo(), intRepeat)
+        dictTool["parameter_info_seconds"] = round(dblParameters, 4)
+
+        tool = ToolClass()
+        if strProjectXML and listParameters and listParameters[0].name == "projectXML":
+            listParameters[0].value = strProjectXML
+        dblStart = time.time()
+        validate(tool, listParameters)
+        dictTool["first_validation_seconds"] = round(time.time() - dblStart, 4)
+        dblStart = time.time()
+        for i in range(intValidations):
+            validate(tool, listParameters)
+        dictTool["validation_seconds"] = round((time.time() - dblStart) / max(intValidations, 1), 4)
+        listTools.append(dictTool)
+    dictResult["tools"] = listTools
+
+    if strProjectXML:
+        from Riverscapes import Riverscapes
+        dictResult["project_parse_seconds"] = round(best_time(lambda: Riverscapes.Project(strProjectXML), intRepeat)[0], 4)
+        dictResult["project_cached_seconds"] = round(best_time(lambda: Confinement_Toolbox.load_project(strProjectXML), intRepeat)[0], 6)
+
+    print("Toolbox load           {0:>10.4f} s  (arcpy import {1:.4f} s)".format(dictResult["load_seconds"], dictResult["arcpy_import_seconds"]))
+    print("Tool modules loaded    {0}".format(", ".join(dictResult["tool_modules_loaded"]) or "none"))
+    if strProjectXML:
+        print("Project XML parse      {0:>10.4f} s  (cached {1:.6f} s)".format(dictResult["project_parse_seconds"], dictResult["project_cached_seconds"]))
+    print("{0:<36}{1:>12}{2:>12}{3:>12}".format("Tool", "Parameters", "First", "Validation"))
+    for dictTool in listTools:
+        print("{0:<36}{1:>10.4f} s{2:>10.4f} s{3:>10.4f} s".format(dictTool["tool"], dictTool["parameter_info_seconds"],
+                                                                 dictTool["first_validation_seconds"], dictTool["validation_seconds"]))
+
+    if strResults:
+        with open(strResults, "a") as fileResults:
+            fileResults.write(json.dumps(dictResult) + "\n")
+
+    return dictResult
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark loading and validating the Confinement Toolbox.")
+    parser.add_argument("--project", help="Confinement project XML set on the project parameter of each tool")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repeats (best is kept)")
+    parser.add_argument("--validations", type=int, default=20, help="Number of validations timed after the first")
+    parser.add_argument("--results", help="Results file (JSON lines, appended)")
+    args = parser.parse_args()
+
+    main(args.project, args.repeat, args.validations, args.results)
@@ -0,0 +1,312 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Array Functions Module                                         #
+# Purpose:     NumPy support components for the Confinement Toolbox. Nothing  #
+#              in this module imports arcpy.                                  #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import numpy as np
+
+
+# # Linear Referencing # #
+def seed_positions(dblRouteLength, dblSeedDistance, dblMaxWindowSize):
+    """Return the positions (measures) of moving window seed points along a route.
+
+    Seeds start at half of the largest window and are spaced every dblSeedDistance
+    for as long as the largest window still fits on the route.
+    """
+
+    dblHalfWindow = float(dblMaxWindowSize) / 2.0
+    return np.arange(dblHalfWindow, float(dblRouteLength) - dblHalfWindow, float(dblSeedDistance))
+
+
+def interval_coverage(arrayStart, arrayEnd, arrayValue=None):
+    """Build the cumulative coverage function of a set of intervals along a route.
+
+    Each interval (start, end) contributes its value (default 1.0) per unit of
+    length. Returns (arrayBreaks, arrayCumulative) where arrayCumulative[i] is the
+    value-weighted length covered between the first break and arrayBreaks[i].
+    The function is linear between breaks, so it can be evaluated at any measure
+    with np.interp.
+    """
+
+    arrayStart = np.asarray(arrayStart, dtype=float)
+    arrayEnd = np.asarray(arrayEnd, dtype=float)
+    if arrayValue is None:
+        arrayValue = np.ones(arrayStart.shape, dtype=float)
+    else:
+        arrayValue = np.asarray(arrayValue, dtype=float)
+
+    # Intervals may be digitized in either direction along the route.
+    arrayLow = np.minimum(arrayStart, arrayEnd)
+    arrayHigh = np.maximum(arrayStart, arrayEnd)
+
+    arrayBreaks = np.unique(np.concatenate([arrayLow, arrayHigh]))
+    if len(arrayBreaks) == 0:
+        return np.zeros(1), np.zeros(1)
+
+    arrayDelta = np.zeros(len(arrayBreaks), dtype=float)
+    np.add.at(arrayDelta, np.searchsorted(arrayBreaks, arrayLow), arrayValue)
+    np.add.at(arrayDelta, np.searchsorted(arrayBreaks, arrayHigh), -arrayValue)
+    arrayDensity = np.cumsum(arrayDelta)[:-1]
+
+    arrayCumulative = np.concatenate([[0.0], np.cumsum(arrayDensity * np.diff(arrayBreaks))])
+
+    return arrayBreaks, arrayCumulative
+
+
+def window_sums(arrayBreaks, arrayCumulative, arrayWindowStart, arrayWindowEnd):
+    """Return the covered value within each window [start, end] of a coverage function."""
+
+    return np.interp(arrayWindowEnd, arrayBreaks, arrayCumulative) - \
+           np.interp(arrayWindowStart, arrayBreaks, arrayCumulative)
+
+
+def window_fractions(arrayStart, arrayEnd, arrayFlag, arrayWindowStart, arrayWindowEnd):
+    """Return the fraction of each window's covered length where arrayFlag is set.
+
+    arrayStart/arrayEnd are the measures of each line segment on a route and
+    arrayFlag its 0/1 state (e.g. IsConfined). Equivalent to
+    SUM(length where flag = 1) / SUM(length) of the segments intersected with
+    each window. Windows with no covered length return NaN.
+    """
+
+    arrayFlag = (np.nan_to_num(np.asarray(arrayFlag, dtype=float)) != 0).astype(float)
+
+    arrayBreaks, arrayCovered = interval_coverage(arrayStart, arrayEnd)
+    arrayTotal = window_sums(arrayBreaks, arrayCovered, arrayWindowStart, arrayWindowEnd)
+
+    arrayBreaks, arrayFlagged = interval_coverage(arrayStart, arrayEnd, arrayFlag)
+    arrayValue = window_sums(arrayBreaks, arrayFlagged, arrayWindowStart, arrayWindowEnd)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arrayFraction = np.where(arrayTotal > 0.0, arrayValue / arrayTotal, np.nan)
+
+    return arrayFraction
+
+
+def merge_intervals(arrayStart, arrayEnd):
+    """Merge overlapping intervals along a route.
+
+    Returns (arrayStart, arrayEnd) of the sorted, disjoint intervals. Intervals
+    may be given in either direction.
+    """
+
+    arrayLow = np.minimum(arrayStart, arrayEnd).astype(float)
+    arrayHigh = np.maximum(arrayStart, arrayEnd).astype(float)
+    if len(arrayLow) == 0:
+        return arrayLow, arrayHigh
+
+    arrayOrder = np.argsort(arrayLow, kind="mergesort")
+    arrayLow = arrayLow[arrayOrder]
+    arrayHigh = np.maximum.accumulate(arrayHigh[arrayOrder])
+
+    # A new interval starts wherever the start is past the end of everything before it
+    arrayNew = np.concatenate([[True], arrayLow[1:] > arrayHigh[:-1]])
+    arrayLast = np.concatenate([np.flatnonzero(arrayNew)[1:] - 1, [len(arrayLow) - 1]])
+    return arrayLow[arrayNew], arrayHigh[arrayLast]
+
+
+def interval_breaks(arrayStart, arrayEnd, dblLength):
+    """Split a route of dblLength at the ends of a set of intervals.
+
+    Returns (arrayBreaks, arrayFlag) where arrayFlag is 1 for each piece between
+    consecutive breaks that is covered by an interval and 0 otherwise.
+    """
+
+    arrayStart, arrayEnd = merge_intervals(np.clip(arrayStart, 0.0, dblLength), np.clip(arrayEnd, 0.0, dblLength))
+    arrayBreaks = np.unique(np.concatenate([[0.0, float(dblLength)], arrayStart, arrayEnd]))
+    arrayMid = (arrayBreaks[:-1] + arrayBreaks[1:]) / 2.0
+    if len(arrayStart) == 0:
+        return arrayBreaks, np.zeros(len(arrayMid), dtype=np.int32)
+
+    arrayInterval = np.searchsorted(arrayStart, arrayMid, side="right") - 1
+    arrayFlag = (arrayInterval >= 0) & (arrayMid < arrayEnd[np.maximum(arrayInterval, 0)])
+    return arrayBreaks, arrayFlag.astype(np.int32)
+
+
+def interval_flags(arrayBreaks, arrayFlag, arrayMeasure):
+    """Look up the flag (from interval_breaks) of the piece containing each measure."""
+
+    arrayPiece = np.searchsorted(arrayBreaks, arrayMeasure, side="right") - 1
+    return arrayFlag[np.clip(arrayPiece, 0, len(arrayFlag) - 1)]
+
+
+def cut_line(arrayXY, dblSegmentLength, dblTolerance=0.01):
+    """Cut a line, given as an (n, 2) array of vertices, every dblSegmentLength along its length.
+
+    The cut positions are interpolated on the cumulative vertex distances, so the line
+    is walked once. The last piece holds the remainder; a remainder shorter than
+    dblTolerance is merged into the previous piece. Returns (arrayFrom, arrayTo,
+    listPieces) with the measures of each piece and its (m, 2) vertex array.
+    """
+
+    arrayXY = np.asarray(arrayXY, dtype=float)[:, 0:2]
+    arrayDistance = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(arrayXY, axis=0).T))])
+    dblLength = arrayDistance[-1]
+
+    arrayCuts = np.arange(0.0, dblLength, float(dblSegmentLength))
+    if len(arrayCuts) > 1 and dblLength - arrayCuts[-1] < dblTolerance:
+        arrayCuts = arrayCuts[:-1]
+    arrayCuts = np.append(arrayCuts, dblLength)
+
+    arrayCutXY = np.column_stack([np.interp(arrayCuts, arrayDistance, arrayXY[:, 0]),
+                                  np.interp(arrayCuts, arrayDistance, arrayXY[:, 1])])
+    arrayFirstVertex = np.searchsorted(arrayDistance, arrayCuts, side="right")
+    arrayLastVertex = np.searchsorted(arrayDistance, arrayCuts, side="left")
+
+    listPieces = []
+    for i in range(len(arrayCuts) - 1):
+        listPieces.append(np.vstack([arrayCutXY[i],
+                                     arrayXY[arrayFirstVertex[i]:arrayLastVertex[i + 1]],
+                                     arrayCutXY[i + 1]]))
+
+    return arrayCuts[:-1], arrayCuts[1:], listPieces
+
+
+def line_stations(listParts, dblDistance):
+    """Return the stations every dblDistance along a line, plus its last vertex.
+
+    listParts holds the (n, 2) vertex array of each part of the line. Parts are measured
+    end to end without the gaps between them. Returns (arrayXY, arrayPosition), where
+    arrayPosition numbers the stations from 0.
+    """
+
+    listXY = []
+    listDistance = []
+    dblOffset = 0.0
+    for arrayPart in listParts:
+        arrayPart = np.asarray(arrayPart, dtype=float)[:, 0:2]
+        arrayDistance = dblOffset + np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(arrayPart, axis=0).T))])
+        listXY.append(arrayPart)
+        listDistance.append(arrayDistance)
+        dblOffset = arrayDistance[-1]
+    arrayXY = np.concatenate(listXY)
+    arrayDistance = np.concatenate(listDistance)
+
+    arrayMeasure = np.append(np.arange(0.0, dblOffset, float(dblDistance)), dblOffset)
+    arrayStationXY = np.column_stack([np.interp(arrayMeasure, arrayDistance, arrayXY[:, 0]),
+                                      np.interp(arrayMeasure, arrayDistance, arrayXY[:, 1])])
+    arrayStationXY[-1] = arrayXY[-1]
+
+    return arrayStationXY, np.arange(len(arrayMeasure))
+
+
+# # Attributes # #
+def group_fractions(arrayGroup, arrayLength, arrayFlag):
+    """Return, for each row, the fraction of the length of its group where the flag is 1.
+
+    Groups are given by any hashable value (i.e. a segment ID). NaN where the group
+    has no length.
+    """
+
+    arrayGroupIndex = np.unique(np.asarray(arrayGroup), return_inverse=True)[1].ravel()
+    arrayLength = np.asarray(arrayLength, dtype=float)
+    arrayFlagged = np.where(np.asarray(arrayFlag) == 1, arrayLength, 0.0)
+    arrayTotal = np.bincount(arrayGroupIndex, weights=arrayLength)
+    arrayValue = np.bincount(arrayGroupIndex, weights=arrayFlagged)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arrayFraction = np.where(arrayTotal > 0.0, arrayValue / arrayTotal, np.nan)
+
+    return arrayFraction[arrayGroupIndex]
+
+
+def confinement_type(arrayLeft, arrayRight):
+    """Classify confinement from the Con_LEFT and Con_RIGHT flags.
+
+    Returns (arrayConType, arrayIsConfined, arrayIsConstric): Con_Type is BOTH,
+    LEFT, RIGHT or NONE, a segment confined on either side is confined and a
+    segment confined on both sides is constricted.
+    """
+
+    boolLeft = np.asarray(arrayLeft) == 1
+    boolRight = np.asarray(arrayRight) == 1
+    arrayConType = np.select([boolLeft & boolRight, boolLeft, boolRight], ["BOTH", "LEFT", "RIGHT"], "NONE")
+    return arrayConType, (boolLeft | boolRight).astype(np.int16), (boolLeft & boolRight).astype(np.int16)
+
+
+def integrated_widths(arrayLength, arrayChannelArea, arrayValleyArea):
+    """Return (arrayIWChannel, arrayIWValley, arrayIWRatio) from the segment lengths and areas.
+
+    Widths are NaN for segments without length, and the ratio is NaN where the
+    channel width is zero.
+    """
+
+    arrayLength = np.asarray(arrayLength, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arrayIWChannel = np.where(arrayLength > 0.0, np.asarray(arrayChannelArea, dtype=float) / arrayLength, np.nan)
+        arrayIWValley = np.where(arrayLength > 0.0, np.asarray(arrayValleyArea, dtype=float) / arrayLength, np.nan)
+        arrayIWRatio = np.where(arrayIWChannel > 0.0, arrayIWValley / arrayIWChannel, np.nan)
+
+    return arrayIWChannel, arrayIWValley, arrayIWRatio
+
+
+def nan_to_none(value):
+    """Convert NaN to None for writing null values through a cursor."""
+
+    value = float(value)
+    if value != value:
+        return None
+    return value
+
+
+# # Planar Geometry # #
+def side_of_segments(arraySegments, arrayPoints):
+    """Return the side of each point relative to the direction of its segment.
+
+    arraySegments is an (n, 4) array of x0, y0, x1, y1 and arrayPoints an (n, 2)
+    array of x, y. The sign of the cross product of the segment direction and the
+    vector to the point is +1 for points on the left, -1 on the right and 0 on
+    the line.
+    """
+
+    arraySegments = np.asarray(arraySegments, dtype=float).reshape(-1, 4)
+    arrayPoints = np.asarray(arrayPoints, dtype=float).reshape(-1, 2)
+    arrayCross = (arraySegments[:, 2] - arraySegments[:, 0]) * (arrayPoints[:, 1] - arraySegments[:, 1]) - \
+                 (arraySegments[:, 3] - arraySegments[:, 1]) * (arrayPoints[:, 0] - arraySegments[:, 0])
+    return np.sign(arrayCross).astype(np.int8)
+
+
+def rotate_coordinates(arrayXY, xc=0.0, yc=0.0, angle=0.0, units="DEGREES"):
+    """Rotate an (n, 2) coordinate array clockwise by angle about (xc, yc)."""
+
+    angle = -angle
+    if units == "DEGREES":
+        angle = np.radians(angle)
+    arrayRotation = np.array([[np.cos(angle), np.sin(angle)],
+                              [-np.sin(angle), np.cos(angle)]])
+    arrayCenter = np.array([xc, yc], dtype=float)
+
+    return (np.asarray(arrayXY, dtype=float)[:, 0:2] - arrayCenter).dot(arrayRotation) + arrayCenter
+
+
+def vertex_keys(arrayXY, dblTolerance=0.001):
+    """Return hashable keys of vertices snapped to a grid of dblTolerance.
+
+    Vertices closer than the tolerance (i.e. the same junction digitized on two features)
+    share a key, so a set of keys replaces a linear search of a coordinate list.
+    """
+
+    arrayKeys = np.round(np.asarray(arrayXY, dtype=float).reshape(-1, 2) / dblTolerance).astype(np.int64)
+    return [tuple(key) for key in arrayKeys]
+
+
+def ring_start(arrayXY, setKeys, dblTolerance=0.001):
+    """Return the index of the last vertex of a ring found in setKeys (0 if none)."""
+
+    arrayMatch = np.flatnonzero([key in setKeys for key in vertex_keys(arrayXY, dblTolerance)])
+    if len(arrayMatch) == 0:
+        return 0
+    return int(arrayMatch[-1])
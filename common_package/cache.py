@@ -0,0 +1,185 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Cache Module                                                   #
+# Purpose:     On-disk cache of intermediate products for the Confinement     #
+#              Toolbox, keyed by a hash of the inputs and step parameters.    #
+#              Nothing in this module imports arcpy.                          #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+
+intDefaultMaxBytes = 2 * 1024 ** 3
+strEntryFile = "entry.json"
+
+
+class Cache(object):
+    """Content-addressed cache of intermediate products.
+
+    Each entry is a folder in the cache workspace named by its key, holding the products of
+    one step and an entry.json with the step name, size and last access time. Entries are
+    written to a temporary folder and renamed into place, so concurrent runs (i.e.
+    partitions) never see a partial entry. The least recently used entries are evicted
+    when the cache grows past intMaxBytes.
+    """
+
+    def __init__(self, cacheWorkspace, intMaxBytes=intDefaultMaxBytes):
+        self.workspace = cacheWorkspace
+        self.maxBytes = int(intMaxBytes)
+        self.dictPending = {}
+        if not os.path.isdir(self.workspace):
+            os.makedirs(self.workspace)
+
+    def key(self, strStep, *listInputs):
+        """Return the key of a step from its input hashes and parameters."""
+
+        hashKey = hashlib.sha1(strStep.encode("utf-8"))
+        for value in listInputs:
+            hashKey.update(repr(value).encode("utf-8"))
+        return strStep + "_" + hashKey.hexdigest()
+
+    def get(self, strKey):
+        """Return the folder of a cached entry (marking it as used), or None if not cached."""
+
+        strEntry = os.path.join(self.workspace, strKey)
+        dictEntry = read_entry(strEntry)
+        if dictEntry is None:
+            return None
+        dictEntry["accessed"] = time.time()
+        write_entry(strEntry, dictEntry)
+        return strEntry
+
+    def create(self, strKey):
+        """Return an empty temporary folder to write the products of a new entry to."""
+
+        strPending = os.path.join(self.workspace, strKey + ".tmp" + str(os.getpid()))
+        if os.path.isdir(strPending):
+            shutil.rmtree(strPending)
+        os.makedirs(strPending)
+        self.dictPending[strKey] = strPending
+        return strPending
+
+    def commit(self, strKey):
+        """Move a new entry into place and evict old entries past the size cap."""
+
+        strPending = self.dictPending.pop(strKey)
+        strEntry = os.path.join(self.workspace, strKey)
+        write_entry(strPending, {"key": strKey,
+                                 "step": strKey.rsplit("_", 1)[0],
+                                 "size": folder_size(strPending),
+                                 "accessed": time.time()})
+        try:
+            os.rename(strPending, strEntry)
+        except OSError:
+            # Another run committed the same entry first.
+            shutil.rmtree(strPending, ignore_errors=True)
+        self.evict(strKey)
+        return strEntry
+
+    def entries(self):
+        """Return the entry.json of each committed entry, least recently used first."""
+
+        listEntries = []
+        for strName in os.listdir(self.workspace):
+            dictEntry = read_entry(os.path.join(self.workspace, strName))
+            if dictEntry is not None:
+                listEntries.append(dictEntry)
+        return sorted(listEntries, key=lambda dictEntry: dictEntry["accessed"])
+
+    def evict(self, strKeepKey=None):
+        """Remove the least recently used entries until the cache fits in maxBytes."""
+
+        listEntries = self.entries()
+        intTotal = sum(dictEntry["size"] for dictEntry in listEntries)
+        listRemoved = []
+        for dictEntry in listEntries:
+            if intTotal <= self.maxBytes:
+                break
+            if dictEntry["key"] == strKeepKey:
+                continue
+            shutil.rmtree(os.path.join(self.workspace, dictEntry["key"]), ignore_errors=True)
+            intTotal = intTotal - dictEntry["size"]
+            listRemoved.append(dictEntry["key"])
+        return listRemoved
+
+    def invalidate(self, strKey=None, strStep=None):
+        """Remove an entry by key, all entries of a step, or (with neither) the whole cache."""
+
+        listRemoved = []
+        for dictEntry in self.entries():
+            if strKey and dictEntry["key"] != strKey:
+                continue
+            if strStep and dictEntry["step"] != strStep:
+                continue
+            shutil.rmtree(os.path.join(self.workspace, dictEntry["key"]), ignore_errors=True)
+            listRemoved.append(dictEntry["key"])
+        return listRemoved
+
+
+def read_entry(strEntry):
+    strEntryPath = os.path.join(strEntry, strEntryFile)
+    if not os.path.isfile(strEntryPath):
+        return None
+    try:
+        with open(strEntryPath) as fileEntry:
+            return json.load(fileEntry)
+    except ValueError:
+        return None
+
+
+def write_entry(strEntry, dictEntry):
+    strEntryPath = os.path.join(strEntry, strEntryFile)
+    strTempPath = strEntryPath + "." + str(os.getpid())
+    with open(strTempPath, "w") as fileEntry:
+        json.dump(dictEntry, fileEntry)
+    if os.path.exists(strEntryPath):
+        os.remove(strEntryPath)
+    os.rename(strTempPath, strEntryPath)
+
+
+def folder_size(strFolder):
+    intSize = 0
+    for strRoot, listDirs, listFiles in os.walk(strFolder):
+        for strFile in listFiles:
+            intSize = intSize + os.path.getsize(os.path.join(strRoot, strFile))
+    return intSize
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Manage the Confinement Toolbox cache.")
+    parser.add_argument("cacheWorkspace", help="Cache folder")
+    parser.add_argument("command", choices=["list", "invalidate", "evict"])
+    parser.add_argument("--key", help="Invalidate a single entry")
+    parser.add_argument("--step", help="Invalidate all entries of a step (i.e. NetworkProducts)")
+    parser.add_argument("--max-bytes", type=int, default=intDefaultMaxBytes, help="Size cap used by evict")
+    args = parser.parse_args()
+
+    cache = Cache(args.cacheWorkspace, args.max_bytes)
+    if args.command == "list":
+        for dictEntry in cache.entries():
+            print(dictEntry["key"] + "\t" + str(dictEntry["size"]) + "\t" + time.ctime(dictEntry["accessed"]))
+    elif args.command == "invalidate":
+        for strKey in cache.invalidate(args.key, args.step):
+            print("Removed " + strKey)
+    else:
+        for strKey in cache.evict():
+            print("Removed " + strKey)
+
+    sys.exit(0)
@@ -0,0 +1,173 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Profiling Module                                               #
+# Purpose:     Per stage timing, memory and scratch usage of the Confinement  #
+#              Toolbox processing chains, written as JSON and to the SFR      #
+#              metadata XML. Nothing in this module imports arcpy.            #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import sys
+import json
+import time
+import datetime
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .sfr_metadata import Metadata
+
+try:
+    import resource
+except ImportError:
+    resource = None # Windows
+
+listColumns = ["Stage", "WallSeconds", "CPUSeconds", "PeakRSSBytes", "FeaturesIn", "FeaturesOut", "ScratchBytes"]
+
+
+class Stage(object):
+    """Measurements of one named stage. Set the stage outputs with out() inside the with block."""
+
+    def __init__(self, strName, inputs=None):
+        self.name = strName
+        self.inputs = inputs
+        self.outputs = None
+        self.values = OrderedDict()
+
+    def out(self, outputs):
+        self.outputs = outputs
+        return outputs
+
+
+class Profiler(object):
+    """Record the wall time, CPU time, peak RSS, feature counts and scratch bytes written of each stage of a tool.
+
+    Stages are wrapped with "with profiler.stage(name, inputs) as stage:". Inputs and outputs are a dataset or a
+    list of datasets, counted with funcCount after the stage is timed. Peak RSS is the high water mark of the
+    process at the end of the stage. Scratch bytes are the growth of the scratch workspace folder during the stage
+    (None for in_memory). A disabled profiler does no measurements and writes nothing.
+    """
+
+    def __init__(self, strToolName, scratchWorkspace=None, boolEnabled=True, funcCount=len):
+        self.toolName = strToolName
+        self.scratchWorkspace = scratchWorkspace
+        self.enabled = boolEnabled
+        self.count = funcCount
+        self.stages = []
+        self.timeStart = time.time()
+
+    @contextmanager
+    def stage(self, strName, inputs=None):
+        stage = Stage(strName, inputs)
+        if not self.enabled:
+            yield stage
+            return
+
+        intScratchStart = scratch_size(self.scratchWorkspace)
+        dblWallStart = time.time()
+        dblCPUStart = cpu_time()
+        yield stage
+        stage.values["Stage"] = strName
+        stage.values["WallSeconds"] = round(time.time() - dblWallStart, 4)
+        stage.values["CPUSeconds"] = round(cpu_time() - dblCPUStart, 4)
+        stage.values["PeakRSSBytes"] = peak_rss()
+        stage.values["FeaturesIn"] = self.features(stage.inputs)
+        stage.values["FeaturesOut"] = self.features(stage.outputs)
+        intScratchEnd = scratch_size(self.scratchWorkspace)
+        stage.values["ScratchBytes"] = None if intScratchStart is None else intScratchEnd - intScratchStart
+        self.stages.append(stage)
+
+    def features(self, datasets):
+        if datasets is None:
+            return None
+        if not isinstance(datasets, (list, tuple)):
+            datasets = [datasets]
+        return sum(int(self.count(dataset)) for dataset in datasets)
+
+    def results(self):
+        return [stage.values for stage in self.stages]
+
+    def write(self, strOutput, dictParameters=None):
+        """Write <output>_Profile.json and <output>_Metadata.xml next to an output dataset or in an output folder.
+
+        Returns the paths written, or None if the profiler is disabled or the output is in memory.
+        """
+
+        if not self.enabled or str(strOutput).replace("\\", "/").split("/")[0].lower() in ("in_memory", "memory"):
+            return None
+        strBase = profile_base(strOutput, self.toolName)
+
+        strJSON = strBase + "_Profile.json"
+        with open(strJSON, "w") as fileProfile:
+            json.dump(OrderedDict([("tool", self.toolName),
+                                   ("total_seconds", round(time.time() - self.timeStart, 4)),
+                                   ("stages", self.results())]), fileProfile, indent=2)
+
+        mWriter = Metadata.MetadataWriter(self.toolName, "")
+        mWriter.createRun()
+        mWriter.currentRun.timestampStart = datetime.datetime.fromtimestamp(self.timeStart)
+        for strName, value in (dictParameters or {}).items():
+            mWriter.currentRun.addParameter(strName, str(value))
+        mWriter.currentRun.addOutput("Profile", strJSON)
+        mWriter.currentRun.addTable("StageProfile", listColumns,
+                                    [[stage.values[strColumn] for strColumn in listColumns] for stage in self.stages])
+        mWriter.finalizeRun("Success")
+        strMetadata = strBase + "_Metadata.xml"
+        mWriter.writeMetadataFile(strMetadata)
+
+        return strJSON, strMetadata
+
+
+def profile_base(strOutput, strToolName):
+    """Return the path (without extension) of the profile files of an output."""
+
+    strOutput = os.path.abspath(strOutput)
+    if os.path.isdir(strOutput) and os.path.splitext(strOutput)[1].lower() not in (".gdb",):
+        return os.path.join(strOutput, strToolName.replace(" ", ""))
+
+    # Profile files are not written inside a geodatabase or geopackage
+    strFolder = os.path.dirname(strOutput)
+    while os.path.splitext(strFolder)[1].lower() in (".gdb", ".gpkg", ".mdb"):
+        strFolder = os.path.dirname(strFolder)
+    return os.path.join(strFolder, os.path.splitext(os.path.basename(strOutput))[0])
+
+
+def cpu_time():
+    if hasattr(time, "process_time"):
+        return time.process_time()
+    return time.clock()
+
+
+def peak_rss():
+    if resource is not None:
+        intMaxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return intMaxRSS if sys.platform == "darwin" else intMaxRSS * 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss)
+
+
+def scratch_size(scratchWorkspace):
+    if not scratchWorkspace or not os.path.isdir(str(scratchWorkspace)):
+        return None
+    intSize = 0
+    for strRoot, listDirs, listFiles in os.walk(scratchWorkspace):
+        for strFile in listFiles:
+            try:
+                intSize = intSize + os.path.getsize(os.path.join(strRoot, strFile))
+            except OSError:
+                pass # removed by the stage while walking
+    return intSize
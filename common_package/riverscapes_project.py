@@ -0,0 +1,126 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Riverscapes Project Module                                     #
+# Purpose:     Read the inputs and realizations of a Confinement Project XML  #
+#              and add realizations to it, without the Riverscapes module of  #
+#              the ArcGIS toolbox. Nothing in this module imports arcpy.      #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import uuid
+import datetime
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+from .release import ConfinementToolReleaseVersion
+
+
+class Project(object):
+    """A Confinement Project XML (project.rs.xml).
+
+    InputDatasets are the Vector nodes of the project Inputs by name, and Realizations the
+    Confinement nodes of the project Realizations by name. Dataset paths in the XML are
+    relative to the project folder (projectPath).
+    """
+
+    def __init__(self, strProjectXML):
+
+        self.projectXML = strProjectXML
+        self.projectPath = os.path.dirname(os.path.abspath(strProjectXML))
+        self.tree = ET.parse(strProjectXML)
+        self.root = self.tree.getroot()
+
+        self.InputDatasets = OrderedDict()
+        for nodeDataset in self.root.findall("Inputs/*"):
+            self.InputDatasets[nodeDataset.findtext("Name")] = nodeDataset
+        self.Realizations = OrderedDict()
+        for nodeRealization in self.root.findall("Realizations/Confinement"):
+            self.Realizations[nodeRealization.findtext("Name")] = nodeRealization
+
+    def absolute_path(self, nodeDataset):
+        """Return the absolute path of a dataset node."""
+
+        strPath = nodeDataset.findtext("Path").replace("\\", "/")
+        return os.path.normpath(os.path.join(self.projectPath, *strPath.split("/")))
+
+    def get_dataset_id(self, strDataset):
+        """Return the id of the input dataset at a path, or None if it is not a project input."""
+
+        for nodeDataset in self.InputDatasets.values():
+            if os.path.normcase(self.absolute_path(nodeDataset)) == os.path.normcase(os.path.abspath(strDataset)):
+                return nodeDataset.get("id")
+        return None
+
+    def get_next_realization_id(self):
+        """Return the id of the next realization (Confinement001, Confinement002, ...)."""
+
+        setIds = set(nodeRealization.get("id") for nodeRealization in self.Realizations.values())
+        intRealization = len(setIds) + 1
+        while "Confinement" + str(intRealization).zfill(3) in setIds:
+            intRealization = intRealization + 1
+        return "Confinement" + str(intRealization).zfill(3)
+
+    def add_realization(self, strName, strId, dictInputIds, listOutputs, strProductVersion=ConfinementToolReleaseVersion):
+        """Add a Confinement realization node and return it.
+
+        dictInputIds are the ids of the StreamNetwork, ValleyBottom and ChannelPolygon inputs, and
+        listOutputs the (name, absolute path) of its output datasets.
+        """
+
+        nodeRealizations = self.root.find("Realizations")
+        if nodeRealizations is None:
+            nodeRealizations = ET.SubElement(self.root, "Realizations")
+        nodeRealization = ET.SubElement(nodeRealizations, "Confinement")
+        nodeRealization.set("id", strId)
+        nodeRealization.set("dateCreated", datetime.datetime.now().isoformat())
+        nodeRealization.set("guid", str(uuid.uuid4()).upper())
+        nodeRealization.set("productVersion", strProductVersion)
+        ET.SubElement(nodeRealization, "Name").text = strName
+
+        nodeInputs = ET.SubElement(nodeRealization, "Inputs")
+        for strInput in ("StreamNetwork", "ValleyBottom", "ChannelPolygon"):
+            ET.SubElement(nodeInputs, strInput).set("ref", dictInputIds[strInput])
+        self.add_datasets(ET.SubElement(nodeRealization, "Outputs"), listOutputs)
+        ET.SubElement(nodeRealization, "Analyses")
+
+        self.Realizations[strName] = nodeRealization
+        return nodeRealization
+
+    def add_analysis(self, nodeRealization, strType, strName, strId, dictParameters, listOutputs):
+        """Add an analysis node (SegmentedNetwork or MovingWindow) with its parameters and outputs to a realization."""
+
+        nodeAnalysis = ET.SubElement(nodeRealization.find("Analyses"), strType)
+        nodeAnalysis.set("id", strId)
+        ET.SubElement(nodeAnalysis, "Name").text = strName
+        nodeParameters = ET.SubElement(nodeAnalysis, "Parameters")
+        for strParameter, value in dictParameters.items():
+            nodeParameter = ET.SubElement(nodeParameters, "Param")
+            nodeParameter.set("name", strParameter)
+            nodeParameter.text = str(value)
+        self.add_datasets(ET.SubElement(nodeAnalysis, "Outputs"), listOutputs)
+        return nodeAnalysis
+
+    def add_datasets(self, nodeParent, listDatasets):
+
+        for strName, strDataset in listDatasets:
+            nodeDataset = ET.SubElement(nodeParent, "Vector")
+            nodeDataset.set("guid", str(uuid.uuid4()).upper())
+            nodeDataset.set("id", strName)
+            ET.SubElement(nodeDataset, "Name").text = strName
+            ET.SubElement(nodeDataset, "Path").text = os.path.relpath(strDataset, self.projectPath)
+
+    def write(self, strProjectXML=None):
+        """Write the project XML (to its own file by default)."""
+
+        self.tree.write(strProjectXML or self.projectXML, encoding="utf-8", xml_declaration=True)
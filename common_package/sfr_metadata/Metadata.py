@@ -30,6 +30,7 @@ class MetadataWriter():
         Operator (Optional): Name of the user. If not specified, the os username is used.
         """
 
+        self.Runs = []
         self.toolName = ToolName
         self.toolVersion = ToolVersion
         #self.gisVersion = GISVersion
@@ -93,6 +94,12 @@ class MetadataWriter():
             nodeResults = ET.SubElement(nodeRun,"Results")
             for result in run.Results:
                 ET.SubElement(nodeResults,result.Name).text = result.Value
+            for table in run.Tables:
+                nodeTable = ET.SubElement(nodeResults,table.Name)
+                for row in table.Rows:
+                    nodeRow = ET.SubElement(nodeTable,"Row")
+                    for column,value in zip(table.Columns,row):
+                        ET.SubElement(nodeRow,column).text = "" if value is None else str(value)
 
         #nodeSummary = ET.SubElement(nodeProcessing,"Summary")
 
@@ -107,10 +114,16 @@ class run():
     Outputs = []
     Messages = []
     Results = []
+    Tables = []
 
     def __init__(self):
         """Get the start timestamp"""
         self.timestampStart = datetime.datetime.now()
+        self.Parameters = []
+        self.Outputs = []
+        self.Messages = []
+        self.Results = []
+        self.Tables = []
 
     def addParameter(self,parameterName,parameterValue):
         """Add a parameter to the processing run"""
@@ -132,6 +145,11 @@ class run():
         newResult = result(Name,Value)
         self.Results.append(newResult)
 
+    def addTable(self,Name,Columns,Rows):
+        """Add a table node (one Row node per row, one node per column) to the Results Node"""
+        newTable = table(Name,Columns,Rows)
+        self.Tables.append(newTable)
+
     def finalize(self,status=""):
         """Sets the stop timestamp and total processing time"""
         self.timestampStop = datetime.datetime.now()
@@ -163,6 +181,13 @@ class result():
         self.Name = Name
         self.Value = Value
 
+class table():
+
+    def __init__(self,Name,Columns,Rows):
+        self.Name = Name
+        self.Columns = Columns
+        self.Rows = Rows
+
 def indent(elem, level=0, more_sibs=False):
     """ Pretty Print XML Element
     Source: http://stackoverflow.com/questions/749796/pretty-printing-xml-in-python
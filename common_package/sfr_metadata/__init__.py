@@ -0,0 +1 @@
+from .Metadata import MetadataWriter
\ No newline at end of file
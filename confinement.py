@@ -0,0 +1,381 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Confinement Command Line                                       #
+# Purpose:     Run the Confinement Toolbox tools headless, from command line  #
+#              options or a JSON/YAML run config, with structured exit codes. #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+"""Run a Confinement Toolbox tool from the command line.
+
+    python -m confinement margins --network Network.shp --valley-bottom VB.shp ...
+    python -m confinement bankfull --config bankfull.yaml --min-width 5
+
+Options given on the command line override those of the --config file. The tool modules
+(and numpy, shapely, rasterio or arcpy) are only imported once the options are valid, so
+--help and usage errors return without loading them.
+"""
+
+# # Import Modules # #
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import traceback
+from collections import OrderedDict
+
+# Exit codes, also written to the --status file
+dictExitCodes = OrderedDict([("success", 0),
+                             ("failed", 1),      # the tool raised an error
+                             ("usage", 2),       # invalid or missing options (as argparse)
+                             ("config", 3),      # the run config could not be read
+                             ("input", 4),       # an input dataset does not exist
+                             ("dependency", 5)]) # the backend could not be imported (i.e. no arcpy)
+
+listBackends = ["geos", "arcpy"]
+
+# Options of each command: (option, dest, type, default, required, help). Type "input" is an input dataset,
+# checked before the tool runs, and "flag" a boolean switch.
+dictCommands = OrderedDict([
+    ("margins", ("Generate the raw confining state and confining margins of a stream network.", [
+        ("--network", "network", "input", None, True, "Stream line network"),
+        ("--valley-bottom", "valley_bottom", "input", None, True, "Valley bottom polygon"),
+        ("--channel", "channel", "input", None, True, "Channel (bankfull) polygon"),
+        ("--raw-output", "raw_output", str, None, True, "Output raw confining state network"),
+        ("--margins-output", "margins_output", str, None, True, "Output confining margins"),
+        ("--scratch", "scratch", str, "in_memory", False, "Scratch workspace"),
+        ("--integrated-width", "integrated_width", "flag", False, False, "Calculate integrated width attributes"),
+        ("--cache", "cache", str, None, False, "Cache workspace for network products"),
+        ("--partition-field", "partition_field", str, None, False, "Run per value of this network field (geos only)"),
+        ("--tile-size", "tile_size", float, None, False, "Run per square tile of this size (geos only)"),
+        ("--workers", "workers", int, None, False, "Worker processes of a partitioned run (geos only)"),
+        ("--incremental", "incremental", "flag", False, False, "Re-run only where the valley bottom or channel changed since the previous run (geos only, requires --cache)"),
+        ("--route-id", "route_id", str, None, False, "Stream route ID field of the moving window to update (incremental)"),
+        ("--seed-distance", "seed_distance", float, None, False, "Distance between seed points of the moving window (incremental)"),
+        ("--window-sizes", "window_sizes", float, None, False, "Window sizes of the moving window (incremental)", "+"),
+        ("--moving-window-workspace", "moving_window_workspace", str, None, False, "Moving window output workspace to update (incremental)"),
+        ("--profile", "profile", "flag", False, False, "Write a per-stage profile next to the raw output")])),
+    ("moving-window", ("Run a moving window analysis of confinement along a network.", [
+        ("--network", "network", "input", None, True, "Network with confinement and constriction fields"),
+        ("--route-id", "route_id", str, None, True, "Stream route ID field"),
+        ("--confinement-field", "confinement_field", str, "IsConfined", False, "Confinement field"),
+        ("--constriction-field", "constriction_field", str, "IsConstric", False, "Constriction field"),
+        ("--seed-distance", "seed_distance", float, None, True, "Distance between seed points"),
+        ("--window-sizes", "window_sizes", float, None, True, "Window sizes", "+"),
+        ("--output-workspace", "output_workspace", str, None, True, "Output workspace"),
+        ("--scratch", "scratch", str, "in_memory", False, "Scratch workspace"),
+        ("--profile", "profile", "flag", False, False, "Write a per-stage profile to the output workspace")])),
+    ("segments", ("Calculate confinement on custom segments (--segment-id) or fixed length segments (--segment-length).", [
+        ("--network", "network", "input", None, True, "Network with confinement and constriction fields"),
+        ("--segment-id", "segment_id", str, None, False, "Segment ID field of custom segments"),
+        ("--segment-length", "segment_length", float, None, False, "Length of fixed segments"),
+        ("--route-id", "route_id", str, None, False, "Stream route ID field (fixed segments)"),
+        ("--confinement-field", "confinement_field", str, "IsConfined", False, "Confinement field"),
+        ("--constriction-field", "constriction_field", str, "IsConstric", False, "Constriction field"),
+        ("--output-workspace", "output_workspace", str, None, True, "Output workspace"),
+        ("--scratch", "scratch", str, "in_memory", False, "Scratch workspace")])),
+    ("bankfull", ("Create the bankfull channel polygon of a network.", [
+        ("--network", "network", "input", None, True, "Segmented stream network"),
+        ("--drainage-area", "drainage_area", "input", None, True, "Drainage area raster (km2)"),
+        ("--precipitation", "precipitation", "input", None, True, "Precipitation raster (mm)"),
+        ("--valley-bottom", "valley_bottom", "input", None, True, "Valley bottom polygon"),
+        ("--output-workspace", "output_workspace", str, None, True, "Output folder, GeoPackage or file geodatabase"),
+        ("--min-width", "min_width", float, 5.0, False, "Minimum bankfull width (map units)"),
+        ("--percent-buffer", "percent_buffer", float, 100.0, False, "Percent buffer of the bankfull width"),
+        ("--curve", "curve", str, "Beechie_Imaki", False, "Bankfull width regression, a name or 'a;b;c'"),
+        ("--scratch", "scratch", str, None, False, "Scratch workspace (arcpy: temporary folder, required)"),
+        ("--keep-scratch", "keep_scratch", "flag", False, False, "Keep the temporary folder (arcpy only)"),
+        ("--workers", "workers", int, 1, False, "Worker processes for the thiessen polygons (geos only)"),
+        ("--profile", "profile", "flag", False, False, "Write a per-stage profile next to the output (geos only)")])),
+    ("divide", ("Divide a polygon into the thiessen regions of the centerline segments.", [
+        ("--centerline", "centerline", "input", None, True, "Segmented centerline"),
+        ("--polygon", "polygon", "input", None, True, "Polygon to divide"),
+        ("--output", "output", str, None, True, "Output segmented polygons"),
+        ("--scratch", "scratch", str, "in_memory", False, "Scratch workspace"),
+        ("--point-density", "point_density", float, 10.0, False, "Densification distance of the centerline"),
+        ("--junction-buffer", "junction_buffer", float, 120.0, False, "Junction buffer (kept for compatibility)"),
+        ("--segment-id", "segment_id", str, None, False, "Segment ID field written to JOIN_FID")]))])
+
+
+class RunError(Exception):
+    """An error with the exit code of its status."""
+
+    def __init__(self, strStatus, message):
+        Exception.__init__(self, message)
+        self.status = strStatus
+
+
+# # Main Function # #
+def main(listArguments=None):
+    """Parse the arguments, run the command and return its exit code."""
+
+    parser = build_parser()
+    args = parser.parse_args(listArguments)
+    if not args.command:
+        parser.print_help()
+        return dictExitCodes["usage"]
+
+    logging.basicConfig(level=getattr(logging, args.log_level), format="%(asctime)s %(levelname)s %(message)s")
+    dblStart = time.time()
+    dictStatus = OrderedDict([("command", args.command), ("backend", args.backend)])
+    try:
+        dictOptions = resolve_options(args)
+        check_inputs(args.command, dictOptions)
+        dictStatus["outputs"] = run_command(args.command, args.backend, dictOptions)
+        dictStatus["status"] = "success"
+    except RunError as err:
+        dictStatus["status"] = err.status
+        dictStatus["error"] = str(err)
+        print("confinement " + args.command + ": " + err.status + " error: " + str(err), file=sys.stderr)
+    except Exception as err:
+        dictStatus["status"] = "failed"
+        dictStatus["error"] = str(err)
+        traceback.print_exc()
+
+    dictStatus["exit_code"] = dictExitCodes[dictStatus["status"]]
+    dictStatus["seconds"] = round(time.time() - dblStart, 3)
+    if args.status:
+        with open(args.status, "w") as fileStatus:
+            json.dump(dictStatus, fileStatus, indent=2, default=str)
+
+    return dictStatus["exit_code"]
+
+
+def build_parser():
+    """Return the argument parser, with a sub parser for each command."""
+
+    parser = argparse.ArgumentParser(prog="confinement",
+                                     description="Run a Confinement Toolbox tool headless.",
+                                     epilog="Exit codes: " + ", ".join(str(intCode) + " " + strStatus
+                                                                       for strStatus, intCode in dictExitCodes.items()))
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    for strCommand, (strHelp, listOptions) in dictCommands.items():
+        subparser = subparsers.add_parser(strCommand, help=strHelp, description=strHelp)
+        subparser.add_argument("--config", help="JSON or YAML run config of the options below (dashes or underscores)")
+        subparser.add_argument("--backend", choices=listBackends, default="geos", help="Geoprocessing backend")
+        subparser.add_argument("--status", help="Write the run status (JSON) to this file")
+        subparser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+        for tupleOption in listOptions:
+            strOption, strDest, typeOption, valueDefault, boolRequired, strOptionHelp = tupleOption[:6]
+            strRequired = " (required)" if boolRequired else ""
+            # Defaults are applied after the config is merged, so unset options are None here
+            if typeOption == "flag":
+                subparser.add_argument(strOption, dest=strDest, action="store_const", const=True, default=None,
+                                       help=strOptionHelp)
+            else:
+                subparser.add_argument(strOption, dest=strDest, default=None, metavar=strDest.upper(),
+                                       type=str if typeOption == "input" else typeOption,
+                                       nargs=tupleOption[6] if len(tupleOption) > 6 else None,
+                                       help=strOptionHelp + strRequired + ("" if valueDefault is None else " [" + str(valueDefault) + "]"))
+    return parser
+
+
+def resolve_options(args):
+    """Return the options of the command: command line, then config file, then defaults."""
+
+    dictConfig = read_config(args.config) if args.config else {}
+    listOptions = dictCommands[args.command][1]
+    dictDests = dict((tupleOption[1], tupleOption) for tupleOption in listOptions)
+
+    listUnknown = [strKey for strKey in dictConfig if strKey.replace("-", "_") not in dictDests]
+    if listUnknown:
+        raise RunError("config", "unknown options in " + args.config + ": " + ", ".join(sorted(listUnknown)))
+
+    dictOptions = OrderedDict()
+    for strKey, value in dictConfig.items():
+        dictOptions[strKey.replace("-", "_")] = value
+    for tupleOption in listOptions:
+        strOption, strDest, typeOption, valueDefault, boolRequired = tupleOption[:5]
+        if getattr(args, strDest) is not None:
+            dictOptions[strDest] = getattr(args, strDest)
+        elif dictOptions.get(strDest) is not None:
+            dictOptions[strDest] = convert_option(dictOptions[strDest], typeOption, strOption, args.config)
+        else:
+            dictOptions[strDest] = valueDefault
+        if boolRequired and dictOptions[strDest] is None:
+            raise RunError("usage", "the following option is required: " + strOption)
+
+    if args.command == "segments":
+        if (dictOptions["segment_id"] is None) == (dictOptions["segment_length"] is None):
+            raise RunError("usage", "use one of --segment-id or --segment-length")
+        if dictOptions["segment_length"] is not None and dictOptions["route_id"] is None:
+            raise RunError("usage", "--segment-length requires --route-id")
+    if args.command == "bankfull" and args.backend == "arcpy" and dictOptions["scratch"] is None:
+        raise RunError("usage", "the arcpy backend requires --scratch (temporary folder)")
+    if args.command == "margins":
+        boolPartitioned = dictOptions["partition_field"] or dictOptions["tile_size"] or dictOptions["workers"]
+        listMovingWindow = ["route_id", "seed_distance", "window_sizes", "moving_window_workspace"]
+        if args.backend == "arcpy" and (boolPartitioned or dictOptions["incremental"]):
+            raise RunError("usage", "partitioned and incremental runs are only available with the geos backend")
+        if dictOptions["incremental"] and boolPartitioned:
+            raise RunError("usage", "use one of --incremental or the partition options")
+        if dictOptions["incremental"] and dictOptions["cache"] is None:
+            raise RunError("usage", "--incremental requires --cache")
+        if any(dictOptions[strDest] is not None for strDest in listMovingWindow):
+            if not dictOptions["incremental"]:
+                raise RunError("usage", "the moving window options require --incremental")
+            if any(dictOptions[strDest] is None for strDest in listMovingWindow):
+                raise RunError("usage", "--incremental updates the moving window with all of --route-id, --seed-distance, "
+                                        "--window-sizes and --moving-window-workspace")
+
+    return dictOptions
+
+
+def read_config(strConfig):
+    """Return the options of a JSON (.json) or YAML (.yaml, .yml) run config."""
+
+    try:
+        with open(strConfig) as fileConfig:
+            if os.path.splitext(strConfig)[1].lower() in (".yaml", ".yml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RunError("dependency", "PyYAML is required to read " + strConfig)
+                dictConfig = yaml.safe_load(fileConfig)
+            else:
+                dictConfig = json.load(fileConfig)
+    except RunError:
+        raise
+    except Exception as err:
+        raise RunError("config", "could not read " + strConfig + ": " + str(err))
+
+    if dictConfig is None:
+        return {}
+    if not isinstance(dictConfig, dict):
+        raise RunError("config", strConfig + " is not a mapping of options")
+    return dictConfig
+
+
+def convert_option(value, typeOption, strOption, strConfig):
+    """Return a config value as the type of its option."""
+
+    try:
+        if typeOption == "flag":
+            return value if isinstance(value, bool) else str(value).lower() in ("true", "yes", "1")
+        if typeOption == "input":
+            return str(value)
+        if isinstance(value, list):
+            return [typeOption(item) for item in value]
+        return typeOption(value)
+    except (TypeError, ValueError):
+        raise RunError("config", "invalid value for " + strOption + " in " + strConfig + ": " + repr(value))
+
+
+def check_inputs(strCommand, dictOptions):
+    """Raise an input error if an input dataset does not exist.
+
+    A dataset inside a GeoPackage or file geodatabase exists if its workspace does.
+    """
+
+    for tupleOption in dictCommands[strCommand][1]:
+        strOption, strDest, typeOption = tupleOption[:3]
+        strPath = dictOptions.get(strDest)
+        if typeOption != "input" or strPath is None:
+            continue
+        strWorkspace = os.path.dirname(strPath)
+        if not (os.path.exists(strPath) or
+                (os.path.splitext(strWorkspace)[1].lower() in (".gpkg", ".gdb") and os.path.exists(strWorkspace))):
+            raise RunError("input", strOption + " does not exist: " + strPath)
+
+
+def load_module(strBackend, strModule):
+    """Import a tool module of a backend, raising a dependency error if it (or arcpy) cannot be imported."""
+
+    try:
+        if strModule == "BankfullChannel" and strBackend == "arcpy":
+            return load_toolbox(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Bankfull_Channel.pyt"))
+        strPackage = "geos_package" if strBackend == "geos" else "arcgis_package"
+        __import__(strPackage + "." + strModule)
+        return sys.modules[strPackage + "." + strModule]
+    except ImportError as err:
+        raise RunError("dependency", "could not load the " + strBackend + " backend: " + str(err))
+
+
+def load_toolbox(strToolbox):
+    """Import a python toolbox (.pyt) as a module."""
+
+    if sys.version_info[0] < 3:
+        import imp
+        return imp.load_source("Bankfull_Channel", strToolbox)
+    from importlib.machinery import SourceFileLoader
+    return SourceFileLoader("Bankfull_Channel", strToolbox).load_module()
+
+
+def run_command(strCommand, strBackend, dictOptions):
+    """Run the tool of a command with its options, returning its outputs."""
+
+    o = dictOptions
+    if strCommand == "margins":
+        ConfiningMargins = load_module(strBackend, "ConfiningMargins")
+        if o["incremental"]:
+            fcPartitionRaw = ConfiningMargins.incremental(o["network"], o["valley_bottom"], o["channel"], o["raw_output"],
+                                                          o["margins_output"], o["scratch"], o["cache"], o["integrated_width"])
+            if o["moving_window_workspace"] is None:
+                return [o["raw_output"], o["margins_output"]]
+            MovingWindow = load_module(strBackend, "MovingWindow")
+            MovingWindow.incremental(o["raw_output"], o["route_id"], "IsConfined", "IsConstric",
+                                     format_number(o["seed_distance"]), ";".join(format_number(value) for value in o["window_sizes"]),
+                                     o["moving_window_workspace"], sorted(set(fcPartitionRaw.getValues(o["route_id"]))), o["scratch"])
+            return [o["raw_output"], o["margins_output"], o["moving_window_workspace"]]
+        if o["partition_field"] or o["tile_size"] or o["workers"]:
+            ConfiningMargins.partitioned(o["network"], o["valley_bottom"], o["channel"], o["raw_output"], o["margins_output"],
+                                         o["scratch"], o["integrated_width"], o["partition_field"], o["tile_size"],
+                                         intWorkers=o["workers"], cacheWorkspace=o["cache"])
+        else:
+            ConfiningMargins.main(o["network"], o["valley_bottom"], o["channel"], o["raw_output"], o["margins_output"],
+                                  o["scratch"], o["integrated_width"], o["cache"], o["profile"])
+        return [o["raw_output"], o["margins_output"]]
+
+    if strCommand == "moving-window":
+        MovingWindow = load_module(strBackend, "MovingWindow")
+        MovingWindow.main(o["network"], o["route_id"], o["confinement_field"], o["constriction_field"],
+                          format_number(o["seed_distance"]), ";".join(format_number(value) for value in o["window_sizes"]),
+                          o["output_workspace"], o["scratch"], o["profile"])
+        return [o["output_workspace"]]
+
+    if strCommand == "segments":
+        ConfinementSegments = load_module(strBackend, "ConfinementSegments")
+        if o["segment_id"] is not None:
+            return [ConfinementSegments.custom_segments(o["network"], o["segment_id"], o["confinement_field"],
+                                                        o["constriction_field"], o["output_workspace"], o["scratch"])]
+        return [ConfinementSegments.fixed_segments(o["network"], o["route_id"], o["confinement_field"], o["constriction_field"],
+                                                   o["segment_length"], o["output_workspace"], o["scratch"])]
+
+    if strCommand == "bankfull":
+        BankfullChannel = load_module(strBackend, "BankfullChannel")
+        if strBackend == "geos":
+            return [BankfullChannel.main(o["network"], o["drainage_area"], o["precipitation"], o["valley_bottom"],
+                                         o["output_workspace"], o["min_width"], o["percent_buffer"], o["curve"],
+                                         o["scratch"] or "in_memory", o["profile"], o["workers"])]
+        BankfullChannel.main(o["network"], o["drainage_area"], o["precipitation"], o["valley_bottom"], o["output_workspace"],
+                             o["min_width"], o["percent_buffer"], o["scratch"], str(not o["keep_scratch"]), o["curve"])
+        return [o["output_workspace"]]
+
+    if strCommand == "divide":
+        DividePolygonBySegment = load_module(strBackend, "DividePolygonBySegment")
+        DividePolygonBySegment.main(o["centerline"], o["polygon"], o["output"], o["scratch"], o["point_density"],
+                                    o["junction_buffer"], o["segment_id"])
+        return [o["output"]]
+
+
+def format_number(value):
+    """Return a number as the tools expect it in strings (no trailing .0 for whole numbers)."""
+
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
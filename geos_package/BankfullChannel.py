@@ -0,0 +1,467 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Bankfull Channel Tool (GEOS Backend)                           #
+# Purpose:     Creates a polygon representing the bankfull channel for the    #
+#              input network, from a regional regression (Beechie and Imaki   #
+#              by default) of bankfull width on drainage area and precip.     #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+import rasterio.errors
+import rasterio.features
+import rasterio.windows
+import shapely
+from shapely import STRtree
+
+from common_package import profiling
+from . import gis_tools
+
+dblValleyBuffer = 15.0 # Meters, the thiessen polygons are clipped to the valley bottom buffered by this distance
+dblSmoothTolerance = 10.0 # Meters, as the PAEK tolerance of the arcpy tool
+dblThiessenTileSize = 10000.0 # Meters, the thiessen polygons are built per square tile of this size
+dblTileSize = 5000.0 # Meters, the reach buffers are unioned and smoothed per square tile of this size
+dblTileOverlap = 0.001 # Meters, tiles overlap by this much so their pieces union without slivers
+
+# Regional regressions of bankfull width (m) on drainage area (km2) and precipitation (cm), as
+# (coefficient, drainage area exponent, precipitation exponent): width = a * DRAREA ^ b * (PRECIP / 10) ^ c.
+# PRECIP is read from the precipitation raster (i.e. PRISM) in mm and converted to cm for the curves.
+dblMillimetersPerCentimeter = 10.0
+dictBankfullCurves = OrderedDict([("Beechie_Imaki", (0.177, 0.397, 0.453))]) # interior Columbia River Basin
+
+
+# # Main Function # #
+def main(fcInputNetwork,
+         rasterDrainageArea,
+         rasterPrecipitation,
+         fcInputValleyBottom,
+         outputWorkspace,
+         dblMinBankfullWidth,
+         dblPercentBuffer,
+         strBankfullCurve="Beechie_Imaki",
+         tempWorkspace=gis_tools.scratchWorkspace,
+         boolProfile=False,
+         intWorkers=1):
+    """Create the bankfull channel polygon of a network.
+
+    Each reach takes the drainage area (km2) and precipitation (mm) of the thiessen polygon of its
+    midpoint, clipped to the buffered valley bottom. The rasters are expected in the coordinate
+    system of the network. Writes network_buffer_values (network pieces with DRAREA, PRECIP,
+    BFWIDTH and BUFWIDTH) and final_bankfull_channel to the output workspace. strBankfullCurve is
+    the name of a curve in dictBankfullCurves or its three coefficients separated by ";". The
+    thiessen polygons are built by tile in a pool of intWorkers processes.
+    """
+
+    gis_tools.AddMessage("Starting Bankfull Channel Tool")
+    profiler = profiling.Profiler("Bankfull Channel", tempWorkspace, boolProfile, gis_tools.feature_count)
+    dblMinBankfullWidth = float(dblMinBankfullWidth)
+    dblPercentBuffer = float(dblPercentBuffer)
+    tupleCurve = bankfull_curve(strBankfullCurve)
+
+    fcNetwork = gis_tools.read_dataset(fcInputNetwork)
+    fcValleyBottom = gis_tools.read_dataset(fcInputValleyBottom)
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+
+    # Thiessen polygons of the reach midpoints, clipped to the buffered valley bottom
+    gis_tools.AddMessage("Creating thiessen polygons")
+    with profiler.stage("Thiessen Polygons", [arrayNetwork]) as stage:
+        arrayValleyBuffer = shapely.buffer(shapely.get_parts(gis_tools.geometry_array(fcValleyBottom)), dblValleyBuffer)
+        arrayMidpoints = shapely.line_interpolate_point(arrayNetwork, 0.5, normalized=True)
+        arrayThiessen = stage.out(thiessen_cells(arrayMidpoints, arrayValleyBuffer, dblThiessenTileSize, intWorkers))
+
+    # Drainage area and precipitation of each thiessen polygon
+    gis_tools.AddMessage("Adding drainage area and precipitation values to thiessen polygons")
+    with profiler.stage("Raster Values", [arrayThiessen]) as stage:
+        arrayValues = stage.out(raster_values(arrayThiessen, [rasterDrainageArea, rasterPrecipitation], tuple(shapely.total_bounds(arrayValleyBuffer))))
+
+    # Network pieces in each thiessen polygon
+    gis_tools.AddMessage("Applying precip and drainage area data to line network")
+    with profiler.stage("Intersect", [arrayNetwork, arrayThiessen]) as stage:
+        arrayPieces, arrayPieceCell, arrayUncovered = network_pieces(arrayNetwork, arrayThiessen)
+        stage.out(arrayPieces)
+
+    gis_tools.AddMessage("Calculating bankfull buffer width")
+    with profiler.stage("Buffer Width", [arrayPieces]) as stage:
+        arrayDrainageArea = arrayValues[arrayPieceCell, 0]
+        arrayPrecipitation = arrayValues[arrayPieceCell, 1]
+        arrayBankfullWidth, arrayBufferWidth = buffer_widths(arrayDrainageArea, arrayPrecipitation, dblMinBankfullWidth, dblPercentBuffer, tupleCurve)
+
+        fcNetworkValues = gis_tools.FeatureClass("LineString", fcNetwork.crs)
+        fcNetworkValues.geometries = list(arrayPieces)
+        for FieldName, arrayField in [("DRAREA", arrayDrainageArea), ("PRECIP", arrayPrecipitation),
+                                      ("BFWIDTH", arrayBankfullWidth), ("BUFWIDTH", arrayBufferWidth)]:
+            fcNetworkValues.addField(FieldName, "DOUBLE")
+            fcNetworkValues.setValues(FieldName, arrayField.tolist())
+        gis_tools.write_dataset(fcNetworkValues, gis_tools.newGISDataset(outputWorkspace, "network_buffer_values"))
+        stage.out(fcNetworkValues)
+
+    gis_tools.AddMessage("Buffering network")
+    fcOutput = gis_tools.newGISDataset(outputWorkspace, "final_bankfull_channel")
+    with profiler.stage("Bankfull Polygon", [arrayPieces]) as stage:
+        # Each piece at its buffer width (at least the minimum width), the network outside of the pieces at the minimum width
+        arrayLines = np.concatenate([arrayPieces, arrayUncovered])
+        arrayWidths = np.concatenate([np.fmax(arrayBufferWidth, dblMinBankfullWidth), np.full(len(arrayUncovered), dblMinBankfullWidth)])
+        fcBankfull = gis_tools.FeatureClass("Polygon", fcNetwork.crs)
+        with gis_tools.DatasetWriter(fcOutput, fcBankfull) as writerBankfull:
+            for arrayBankfull in bankfull_polygons(arrayLines, arrayWidths):
+                fcBankfull.geometries = list(arrayBankfull)
+                writerBankfull.write(fcBankfull)
+        stage.out(fcOutput)
+
+    profiler.write(fcOutput, OrderedDict([("StreamNetwork", fcInputNetwork),
+                                          ("DrainageArea", rasterDrainageArea),
+                                          ("Precipitation", rasterPrecipitation),
+                                          ("ValleyBottom", fcInputValleyBottom),
+                                          ("MinBankfullWidth", dblMinBankfullWidth),
+                                          ("PercentBuffer", dblPercentBuffer),
+                                          ("BankfullCurve", strBankfullCurve)]))
+
+    gis_tools.AddMessage("Bankfull Channel Tool Complete")
+    return fcOutput
+
+
+def thiessen_cells(arrayPoints, arrayClip, dblTileSize=dblThiessenTileSize, intWorkers=1):
+    """Return the thiessen (Voronoi) polygon of each point clipped to the union of the arrayClip polygons.
+
+    The polygons extend to the envelope of the points and clip polygons, as if built for all points at
+    once, but are built per square tile of dblTileSize from the points within a halo around the tile,
+    and clipped to the clip polygons within the halo only. The polygon of a point is exact when each of
+    its vertices is closer to the point than to the inner edges of the halo, as no point outside the
+    halo can be nearer. The points of other polygons are built again with twice the halo. Tiles are built
+    in a pool of intWorkers processes.
+    """
+
+    arrayCells = np.empty(len(arrayPoints), dtype=object)
+    if len(arrayPoints) == 0:
+        return arrayCells
+
+    arrayCoordinates = shapely.get_coordinates(arrayPoints)
+    arrayPointBounds = np.concatenate([arrayCoordinates.min(axis=0), arrayCoordinates.max(axis=0)])
+    arrayClipBounds = shapely.total_bounds(arrayClip)
+    tupleExtent = (min(arrayPointBounds[0], arrayClipBounds[0]), min(arrayPointBounds[1], arrayClipBounds[1]),
+                   max(arrayPointBounds[2], arrayClipBounds[2]), max(arrayPointBounds[3], arrayClipBounds[3]))
+    treePoints = STRtree(arrayPoints)
+    treeClip = STRtree(arrayClip)
+    arrayTiles = np.floor(arrayCoordinates / dblTileSize).astype(np.int64)
+
+    arrayPending = np.arange(len(arrayPoints))
+    dblHalo = dblTileSize / 2.0
+    while len(arrayPending):
+        listTasks = []
+        # Group the pending points by tile once, in point order within each tile
+        arrayKeys, arrayInverse = np.unique(arrayTiles[arrayPending], axis=0, return_inverse=True)
+        arrayInverse = arrayInverse.ravel()
+        listCores = np.split(arrayPending[np.argsort(arrayInverse, kind="stable")],
+                             np.cumsum(np.bincount(arrayInverse, minlength=len(arrayKeys)))[:-1])
+        for (x, y), arrayCore in zip(arrayKeys.tolist(), listCores):
+            tupleBox = (max(x * dblTileSize - dblHalo, tupleExtent[0]), max(y * dblTileSize - dblHalo, tupleExtent[1]),
+                        min((x + 1) * dblTileSize + dblHalo, tupleExtent[2]), min((y + 1) * dblTileSize + dblHalo, tupleExtent[3]))
+            gBox = shapely.box(*tupleBox)
+            arraySites = treePoints.query(gBox, predicate="intersects")
+            arrayLocalClip = shapely.intersection(arrayClip[treeClip.query(gBox, predicate="intersects")], gBox)
+            listTasks.append((arrayCore, arrayCoordinates[arrayCore], arrayCoordinates[arraySites], tupleBox, tupleExtent, arrayLocalClip))
+
+        if intWorkers == 1 or len(listTasks) < 2:
+            listResults = [thiessen_tile(task) for task in listTasks]
+        else:
+            with ProcessPoolExecutor(max_workers=intWorkers) as executor:
+                listResults = list(executor.map(thiessen_tile, listTasks))
+
+        listPending = []
+        for arrayCore, arrayTileCells, boolExact in listResults:
+            arrayCells[arrayCore[boolExact]] = arrayTileCells[boolExact]
+            listPending.append(arrayCore[~boolExact])
+        arrayPending = np.concatenate(listPending)
+        dblHalo = dblHalo * 2.0
+
+    return arrayCells
+
+
+def thiessen_tile(task):
+    """Worker process: build the thiessen polygons of the core points of a tile from the sites in its halo box.
+
+    Returns the core point indices, their polygons clipped to the local clip polygons and whether each is exact.
+    """
+
+    arrayCore, arrayCoreCoordinates, arraySiteCoordinates, tupleBox, tupleExtent, arrayLocalClip = task
+    gBox = shapely.box(*tupleBox)
+    # Coincident points share a polygon, the points are keyed as complex numbers (x + yj) to find it
+    arrayUniqueKeys = np.unique(arraySiteCoordinates[:, 0] + 1j * arraySiteCoordinates[:, 1])
+    arrayRows = np.searchsorted(arrayUniqueKeys, arrayCoreCoordinates[:, 0] + 1j * arrayCoreCoordinates[:, 1])
+    if len(arrayUniqueKeys) == 1:
+        arrayUniqueCells = np.array([gBox], dtype=object)
+    else:
+        gSites = shapely.multipoints(np.column_stack([arrayUniqueKeys.real, arrayUniqueKeys.imag]))
+        arrayUniqueCells = shapely.get_parts(shapely.voronoi_polygons(gSites, extend_to=gBox, ordered=True))
+    arrayTileCells = shapely.intersection(arrayUniqueCells[arrayRows], gBox)
+
+    # Exact if each vertex is closer to its point than to the inner edges of the box
+    arrayVertices, arrayVertexCell = shapely.get_coordinates(arrayTileCells, return_index=True)
+    arrayPointDistance = np.hypot(*(arrayVertices - arrayCoreCoordinates[arrayVertexCell]).T)
+    arrayEdgeDistance = np.full(len(arrayVertices), np.inf)
+    for dblEdge, dblExtent, iCoordinate, dblSign in [(tupleBox[0], tupleExtent[0], 0, 1.0),
+                                                     (tupleBox[1], tupleExtent[1], 1, 1.0),
+                                                     (tupleBox[2], tupleExtent[2], 0, -1.0),
+                                                     (tupleBox[3], tupleExtent[3], 1, -1.0)]:
+        if dblEdge != dblExtent:
+            arrayEdgeDistance = np.minimum(arrayEdgeDistance, dblSign * (arrayVertices[:, iCoordinate] - dblEdge))
+    boolVertexExact = arrayPointDistance <= arrayEdgeDistance * (1.0 + 1e-9)
+    boolExact = np.bincount(arrayVertexCell, ~boolVertexExact, minlength=len(arrayCore)) == 0
+
+    gLocalClip = shapely.union_all(arrayLocalClip)
+    arrayTileCells[boolExact] = shapely.intersection(arrayTileCells[boolExact], gLocalClip)
+    return arrayCore, arrayTileCells, boolExact
+
+
+def raster_values(arrayPolygons, listRasters, tupleBounds=None):
+    """Return the maximum value of each raster in each polygon, as an (n polygons, n rasters) array.
+
+    Only the raster blocks within tupleBounds (i.e. the buffered valley bottom) and under the polygons
+    are read. Rasters on the same grid are read together, so the polygons are burned once per block for
+    all of them. Polygons that contain no cell center (smaller than a cell) take the value of the cell
+    under their inside point. NaN where there is no data.
+    """
+
+    arrayValues = np.full((len(arrayPolygons), len(listRasters)), np.nan)
+    if len(arrayPolygons) == 0:
+        return arrayValues
+
+    # Group the rasters by grid
+    dictGrids = OrderedDict()
+    for iRaster, strRaster in enumerate(listRasters):
+        with rasterio.open(strRaster) as src:
+            dictGrids.setdefault((src.transform, src.width, src.height, src.block_shapes[0]), []).append(iRaster)
+
+    treePolygons = STRtree(arrayPolygons)
+    for listGridRasters in dictGrids.values():
+        listSources = [rasterio.open(listRasters[iRaster]) for iRaster in listGridRasters]
+        try:
+            arrayValues[:, listGridRasters] = zonal_maximum(treePolygons, arrayPolygons, listSources, tupleBounds)
+            arrayMissing = np.flatnonzero(np.isnan(arrayValues[:, listGridRasters]).all(axis=1))
+            if len(arrayMissing):
+                arrayInsidePoints = shapely.point_on_surface(arrayPolygons[arrayMissing])
+                arrayValues[np.ix_(arrayMissing, listGridRasters)] = sample_points(listSources, arrayInsidePoints)
+        finally:
+            for src in listSources:
+                src.close()
+
+    return arrayValues
+
+
+def zonal_maximum(treePolygons, arrayPolygons, listSources, tupleBounds=None):
+    """Return the maximum of each raster (on the same grid) under each polygon, reading block by block."""
+
+    srcGrid = listSources[0]
+    arrayMaximum = np.full((len(arrayPolygons), len(listSources)), np.nan)
+    windowBounds = None
+    if tupleBounds is not None:
+        windowBounds = rasterio.windows.from_bounds(*tupleBounds, transform=srcGrid.transform).round_offsets().round_lengths()
+
+    for ij, windowBlock in srcGrid.block_windows(1):
+        if windowBounds is not None:
+            try:
+                windowBlock = windowBlock.intersection(windowBounds)
+            except rasterio.errors.WindowError:
+                continue # block outside the bounds
+        transformBlock = srcGrid.window_transform(windowBlock)
+        gBlock = shapely.box(*rasterio.windows.bounds(windowBlock, srcGrid.transform))
+        arrayBlockPolygons = treePolygons.query(gBlock, predicate="intersects")
+        if len(arrayBlockPolygons) == 0:
+            continue
+
+        # Burn polygon index + 1 at the cell centers of the block (0 = no polygon)
+        arrayZones = rasterio.features.rasterize(zip(arrayPolygons[arrayBlockPolygons], arrayBlockPolygons + 1),
+                                                 out_shape=(int(windowBlock.height), int(windowBlock.width)),
+                                                 transform=transformBlock, fill=0, dtype="int64")
+        boolZone = arrayZones > 0
+        if not boolZone.any():
+            continue
+        arrayZoneIndex = arrayZones[boolZone] - 1
+        for iSource, src in enumerate(listSources):
+            arrayBlock = src.read(1, window=windowBlock, masked=True)
+            arrayData = arrayBlock.filled(np.nan).astype(float)[boolZone]
+            boolData = ~np.isnan(arrayData)
+            np.fmax.at(arrayMaximum[:, iSource], arrayZoneIndex[boolData], arrayData[boolData])
+
+    return arrayMaximum
+
+
+def sample_points(listSources, arrayPoints):
+    """Return the value of the cell under each point for each raster (on the same grid), reading only the blocks with points."""
+
+    srcGrid = listSources[0]
+    arrayValues = np.full((len(arrayPoints), len(listSources)), np.nan)
+    arrayCoordinates = shapely.get_coordinates(arrayPoints)
+    arrayCols, arrayRows = ~srcGrid.transform * (arrayCoordinates[:, 0], arrayCoordinates[:, 1])
+    arrayRows = np.floor(arrayRows).astype(np.int64)
+    arrayCols = np.floor(arrayCols).astype(np.int64)
+    boolInside = (arrayRows >= 0) & (arrayRows < srcGrid.height) & (arrayCols >= 0) & (arrayCols < srcGrid.width)
+
+    intBlockHeight, intBlockWidth = srcGrid.block_shapes[0]
+    arrayBlockKeys = (arrayRows // intBlockHeight) * (srcGrid.width // intBlockWidth + 1) + arrayCols // intBlockWidth
+    for keyBlock in np.unique(arrayBlockKeys[boolInside]):
+        arrayInBlock = np.flatnonzero(boolInside & (arrayBlockKeys == keyBlock))
+        intRowOffset = int(arrayRows[arrayInBlock[0]] // intBlockHeight * intBlockHeight)
+        intColOffset = int(arrayCols[arrayInBlock[0]] // intBlockWidth * intBlockWidth)
+        windowBlock = rasterio.windows.Window(intColOffset, intRowOffset,
+                                              min(intBlockWidth, srcGrid.width - intColOffset),
+                                              min(intBlockHeight, srcGrid.height - intRowOffset))
+        for iSource, src in enumerate(listSources):
+            arrayBlock = src.read(1, window=windowBlock, masked=True).filled(np.nan).astype(float)
+            arrayValues[arrayInBlock, iSource] = arrayBlock[arrayRows[arrayInBlock] - intRowOffset,
+                                                            arrayCols[arrayInBlock] - intColOffset]
+
+    return arrayValues
+
+
+def network_pieces(arrayNetwork, arrayCells):
+    """Split the network lines by the cells.
+
+    Returns the line pieces, the cell index of each piece and the lines not entirely covered by the
+    cells (i.e. leaving the valley bottom), which are returned whole.
+    """
+
+    arrayLines = shapely.get_parts(arrayNetwork)
+    arrayLineIndex, arrayCellIndex = STRtree(arrayCells).query(arrayLines, predicate="intersects")
+    arrayPieces = shapely.intersection(arrayLines[arrayLineIndex], arrayCells[arrayCellIndex])
+    arrayPieceLength = shapely.length(arrayPieces)
+    boolLine = arrayPieceLength > 0
+
+    arrayCoveredLength = np.bincount(arrayLineIndex, arrayPieceLength, minlength=len(arrayLines))
+    arrayLineLength = shapely.length(arrayLines)
+    boolUncovered = arrayCoveredLength < arrayLineLength - np.maximum(arrayLineLength * 1e-9, 1e-6)
+    return shapely.line_merge(arrayPieces[boolLine]), arrayCellIndex[boolLine], arrayLines[boolUncovered]
+
+
+def bankfull_curve(strBankfullCurve):
+    """Return the (coefficient, drainage area exponent, precipitation exponent) of a bankfull curve.
+
+    strBankfullCurve is a name in dictBankfullCurves, or the three values separated by ";".
+    """
+
+    if strBankfullCurve in dictBankfullCurves:
+        return dictBankfullCurves[strBankfullCurve]
+    try:
+        tupleCurve = tuple(float(strValue) for strValue in strBankfullCurve.split(";"))
+    except ValueError:
+        tupleCurve = ()
+    if len(tupleCurve) != 3:
+        raise ValueError("Unknown bankfull curve " + str(strBankfullCurve) + ", use one of " +
+                         ", ".join(dictBankfullCurves) + " or 'coefficient;drainage area exponent;precipitation exponent'")
+    return tupleCurve
+
+
+def buffer_widths(arrayDrainageArea, arrayPrecipitation, dblMinBankfullWidth, dblPercentBuffer, tupleCurve=dictBankfullCurves["Beechie_Imaki"]):
+    """Return the bankfull width (at least dblMinBankfullWidth) and the buffer width of each reach.
+
+    Bankfull width is the curve of dictBankfullCurves for the (a, b, c) of tupleCurve, with drainage area
+    in km2 and precipitation in mm. The buffer width is half the bankfull width plus dblPercentBuffer.
+    """
+
+    dblCoefficient, dblDrainageAreaExponent, dblPrecipitationExponent = tupleCurve
+    with np.errstate(invalid="ignore"):
+        arrayBankfullWidth = (dblCoefficient * np.power(arrayDrainageArea, dblDrainageAreaExponent) *
+                              np.power(arrayPrecipitation / dblMillimetersPerCentimeter, dblPrecipitationExponent))
+    arrayBankfullWidth = np.fmax(arrayBankfullWidth, dblMinBankfullWidth)
+    arrayBufferWidth = arrayBankfullWidth / 2.0 * (1.0 + dblPercentBuffer / 100.0)
+    return arrayBankfullWidth, arrayBufferWidth
+
+
+def bankfull_polygons(arrayLines, arrayWidths, dblTileSize=dblTileSize, dblTolerance=dblSmoothTolerance):
+    """Yield the smoothed parts of the union of the buffer of each line by its width, as they are completed.
+
+    The smoothing is a closing (buffer out and back in) by dblTolerance / 2, which stands in for the
+    PAEK smoothing of the arcpy tool: notches and concave corners under the tolerance are rounded,
+    and narrow parts of the polygon (i.e. the minimum width) are kept. The lines are buffered with
+    the closing distance added, so only the buffer back in remains after the union.
+
+    The union and smoothing are done per square tile of dblTileSize, from the lines within reach of
+    the tile plus a halo of twice the closing distance, and clipped to the tile. The buffer back in
+    at a point only depends on the union within the closing distance, so the tiles give the same
+    polygon as smoothing the whole union. Tiles are built row by row. The parts inside a tile are
+    yielded with the tile, and the parts on a tile edge are joined with those of the same row and
+    of the row below, then yielded once they do not reach the next row. Only the parts crossing
+    the current row are held.
+    """
+
+    dblDistance = dblTolerance / 2.0
+    dblHalo = 2.0 * dblDistance
+    arrayReach = arrayWidths + dblDistance
+    if len(arrayLines) == 0:
+        return
+
+    # Tiles touched by the buffer of each line
+    arrayBounds = shapely.bounds(arrayLines) + np.outer(arrayReach, [-1.0, -1.0, 1.0, 1.0])
+    arrayTileMin = np.floor(arrayBounds[:, :2] / dblTileSize).astype(np.int64)
+    arrayTileMax = np.floor(arrayBounds[:, 2:] / dblTileSize).astype(np.int64)
+    dictRows = {}
+    for (xMin, yMin), (xMax, yMax) in zip(arrayTileMin.tolist(), arrayTileMax.tolist()):
+        for y in range(yMin, yMax + 1):
+            dictRows.setdefault(y, set()).update(range(xMin, xMax + 1))
+
+    treeLines = STRtree(arrayLines)
+    dblMaxReach = float(arrayReach.max())
+    arrayOpen = np.array([], dtype=object) # parts reaching the top of the previous row
+    intPreviousRow = None
+    for y in sorted(dictRows):
+        if intPreviousRow != y - 1 and len(arrayOpen):
+            yield arrayOpen
+            arrayOpen = np.array([], dtype=object)
+        listEdgeParts = [arrayOpen]
+        for x in sorted(dictRows[y]):
+            gTile = shapely.box(x * dblTileSize - dblTileOverlap, y * dblTileSize - dblTileOverlap,
+                                (x + 1) * dblTileSize + dblTileOverlap, (y + 1) * dblTileSize + dblTileOverlap)
+            gHalo = shapely.buffer(gTile, dblHalo, join_style="mitre")
+            arrayIndex = treeLines.query(gHalo, predicate="dwithin", distance=dblMaxReach)
+            if len(arrayIndex) == 0:
+                continue
+            gUnion = shapely.intersection(shapely.union_all(shapely.buffer(arrayLines[arrayIndex], arrayReach[arrayIndex])), gHalo)
+            arrayParts = shapely.get_parts(shapely.intersection(shapely.buffer(gUnion, -dblDistance), gTile))
+            arrayParts = arrayParts[~shapely.is_empty(arrayParts)]
+            boolEdge = shapely.dwithin(arrayParts, gTile.boundary, dblTileOverlap)
+            if not boolEdge.all():
+                yield arrayParts[~boolEdge]
+            listEdgeParts.append(arrayParts[boolEdge])
+
+        # Join the parts across the tile edges of the row and with the open parts of the row below
+        arrayEdgeParts = np.concatenate(listEdgeParts)
+        if len(arrayEdgeParts):
+            arrayEdgeParts = shapely.get_parts(shapely.union_all(arrayEdgeParts))
+        boolOpen = shapely.bounds(arrayEdgeParts)[:, 3] >= (y + 1) * dblTileSize
+        if not boolOpen.all():
+            yield arrayEdgeParts[~boolOpen]
+        arrayOpen = arrayEdgeParts[boolOpen]
+        intPreviousRow = y
+
+    if len(arrayOpen):
+        yield arrayOpen
+
+
+# # Run as Script # #
+if __name__ == "__main__":
+
+    main(sys.argv[1],
+         sys.argv[2],
+         sys.argv[3],
+         sys.argv[4],
+         sys.argv[5],
+         float(sys.argv[6]),
+         float(sys.argv[7]),
+         sys.argv[8] if len(sys.argv) > 8 else "Beechie_Imaki",
+         sys.argv[9] if len(sys.argv) > 9 else gis_tools.scratchWorkspace,
+         sys.argv[10].lower() == "true" if len(sys.argv) > 10 else False)
@@ -0,0 +1,362 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Batch Realizations (GEOS Backend)                              #
+# Purpose:     Run many confinement realizations headless in a process pool,  #
+#              from a list of Riverscapes project XMLs or a JSON manifest.    #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from common_package import release
+from common_package import riverscapes_project
+from . import gis_tools
+from . import ConfiningMargins
+from . import ConfinementSegments
+from . import MovingWindow
+
+# Realization settings used when a manifest entry does not provide them
+dictDefaults = {"route_id": "BranchID",
+                "segment_id": None,
+                "segment_length": None,
+                "seed_distance": None,
+                "window_sizes": None,
+                "integrated_width": False,
+                "profile": False}
+
+# Input dataset type of a project, by the Inputs folder the Load Input Datasets tool copies it to
+dictInputFolders = {"network": "StreamNetworks",
+                    "valley_bottom": "ValleyBottoms",
+                    "channel": "ChannelPolygons"}
+
+
+# # Main Function # #
+def main(listInputs,
+         scratchWorkspace,
+         strRealizationName="Batch",
+         cacheWorkspace=None,
+         intWorkers=None,
+         intRetries=1):
+    """Run a batch of confinement realizations in a pool of worker processes.
+
+    listInputs is a JSON manifest or a list of project XMLs (one realization named strRealizationName
+    per project, on the project's input datasets). Each realization runs the Confining Margins tool
+    and then the segmented network, fixed segment and moving window analyses it has settings for.
+    Realizations of the same project run in order in one worker, so a project XML is only written by
+    one process. Each attempt runs in its own scratch workspace, and a failed realization is retried
+    intRetries times. A realization already in its project is skipped, so a batch can be re-run after
+    a failure. The status of each realization is written to BatchResults.json in the scratch workspace.
+
+    :return: list of result dicts (name, project, status, attempts, seconds, error)
+    """
+
+    dictManifest = read_inputs(listInputs, strRealizationName)
+    scratchWorkspace = dictManifest.get("scratch", scratchWorkspace)
+    cacheWorkspace = dictManifest.get("cache", cacheWorkspace)
+    intWorkers = dictManifest.get("workers", intWorkers)
+    intRetries = int(dictManifest.get("retries", intRetries))
+
+    listTasks = []
+    for listJobs in group_jobs(dictManifest):
+        listTasks.append((listJobs, scratchWorkspace, cacheWorkspace, intRetries))
+
+    gis_tools.AddMessage("Running " + str(sum(len(task[0]) for task in listTasks)) + " realizations in " +
+                         str(len(listTasks)) + " tasks...")
+    listResults = []
+    if intWorkers == 1 or len(listTasks) < 2:
+        for task in listTasks:
+            listResults.extend(run_task(task))
+    else:
+        with ProcessPoolExecutor(max_workers=intWorkers) as executor:
+            listFutures = [executor.submit(run_task, task) for task in listTasks]
+            for future in as_completed(listFutures):
+                listTaskResults = future.result()
+                listResults.extend(listTaskResults)
+                gis_tools.AddMessage("Finished " + ", ".join(dictResult["name"] + " (" + dictResult["status"] + ")"
+                                                             for dictResult in listTaskResults))
+
+    if not os.path.isdir(scratchWorkspace):
+        os.makedirs(scratchWorkspace)
+    with open(os.path.join(scratchWorkspace, "BatchResults.json"), "w") as fileResults:
+        json.dump(listResults, fileResults, indent=2)
+
+    return listResults
+
+
+def read_inputs(listInputs, strRealizationName):
+    """Return the manifest of a JSON manifest file, or a manifest with one realization per project XML."""
+
+    if len(listInputs) == 1 and os.path.splitext(listInputs[0])[1].lower() == ".json":
+        with open(listInputs[0]) as fileManifest:
+            dictManifest = json.load(fileManifest, object_pairs_hook=OrderedDict)
+        # Paths in a manifest are relative to the manifest
+        dictManifest["root"] = os.path.dirname(os.path.abspath(listInputs[0]))
+        return dictManifest
+
+    return {"realizations": [{"name": strRealizationName, "project": strProject} for strProject in listInputs]}
+
+
+def group_jobs(dictManifest):
+    """Return the lists of realizations run by each task: one per project, or one per realization without a project."""
+
+    strRoot = dictManifest.get("root", os.getcwd())
+    dictTasks = OrderedDict()
+    for i, dictRealization in enumerate(dictManifest["realizations"]):
+        dictJob = dict(dictDefaults)
+        dictJob.update(dictManifest.get("defaults", {}))
+        dictJob.update(dictRealization)
+        dictJob.setdefault("name", "Realization" + str(i + 1).zfill(3))
+        for strKey in ("project", "network", "valley_bottom", "channel", "output"):
+            if dictJob.get(strKey) and not os.path.isabs(dictJob[strKey]):
+                dictJob[strKey] = os.path.join(strRoot, dictJob[strKey])
+        dictTasks.setdefault(dictJob.get("project") or "job_" + str(i), []).append(dictJob)
+
+    return list(dictTasks.values())
+
+
+def run_task(task):
+    """Worker process: run the realizations of one project (or a single realization) in order."""
+
+    listJobs, scratchWorkspace, cacheWorkspace, intRetries = task
+
+    listResults = []
+    for dictJob in listJobs:
+        dictResult = {"name": dictJob["name"], "project": dictJob.get("project"), "status": "failed",
+                      "attempts": 0, "seconds": 0.0, "error": None}
+        timeStart = time.time()
+        try:
+            project = load_project(dictJob)
+            if project is not None and dictJob["name"] in project.Realizations:
+                gis_tools.AddWarning("Realization " + dictJob["name"] + " already exists in " + dictJob["project"])
+                dictResult["status"] = "skipped"
+                listResults.append(dictResult)
+                continue
+
+            for intAttempt in range(intRetries + 1):
+                dictResult["attempts"] = intAttempt + 1
+                workspaceJob = job_workspace(scratchWorkspace, dictJob, intAttempt)
+                try:
+                    dictOutputs = run_realization(dictJob, project, workspaceJob, cacheWorkspace)
+                except Exception:
+                    dictResult["error"] = traceback.format_exc()
+                    gis_tools.AddWarning("Realization " + dictJob["name"] + " failed (attempt " +
+                                         str(intAttempt + 1) + "):\n" + dictResult["error"])
+                    continue
+                if project is not None:
+                    add_realization(dictJob, dictOutputs)
+                if not gis_tools.is_memory_dataset(workspaceJob):
+                    shutil.rmtree(workspaceJob, ignore_errors=True)
+                dictResult["status"] = "succeeded"
+                dictResult["error"] = None
+                break
+        except Exception:
+            dictResult["error"] = traceback.format_exc()
+            gis_tools.AddWarning("Realization " + dictJob["name"] + " failed:\n" + dictResult["error"])
+
+        dictResult["seconds"] = round(time.time() - timeStart, 3)
+        listResults.append(dictResult)
+
+    return listResults
+
+
+def load_project(dictJob):
+    """Return the Riverscapes project of a realization, or None if it is not in project mode."""
+
+    if not dictJob.get("project"):
+        return None
+
+    return riverscapes_project.Project(dictJob["project"])
+
+
+def job_workspace(scratchWorkspace, dictJob, intAttempt):
+    """Return an empty scratch workspace for one attempt of a realization."""
+
+    # Worker processes are reused across realizations, so the in_memory workspace is cleared as well
+    gis_tools.dictMemoryWorkspace.clear()
+    if gis_tools.is_memory_dataset(scratchWorkspace):
+        return scratchWorkspace
+
+    strProject = os.path.splitext(os.path.basename(dictJob.get("project") or ""))[0]
+    strJob = "_".join(part for part in (strProject, dictJob["name"], str(intAttempt)) if part).replace(" ", "_")
+    workspaceJob = os.path.join(scratchWorkspace, strJob)
+    if os.path.isdir(workspaceJob):
+        shutil.rmtree(workspaceJob)
+    os.makedirs(workspaceJob)
+    return workspaceJob
+
+
+def project_inputs(project, dictJob):
+    """Return the absolute paths of the network, valley bottom and channel inputs of a realization.
+
+    A manifest may name the inputs by project input dataset name or by path. Any input it does not name
+    is the project's only input dataset of that type.
+    """
+
+    dictPaths = OrderedDict((strName, project.absolute_path(nodeDataset))
+                            for strName, nodeDataset in project.InputDatasets.items())
+    dictInputs = {}
+    for strKey, strFolder in dictInputFolders.items():
+        if dictJob.get(strKey):
+            dictInputs[strKey] = dictPaths.get(dictJob[strKey], dictJob[strKey])
+            continue
+        listPaths = [strPath for strPath in dictPaths.values()
+                     if strFolder in os.path.normpath(strPath).replace("\\", "/").split("/")]
+        if len(listPaths) != 1:
+            raise ValueError("Project " + dictJob["project"] + " has " + str(len(listPaths)) + " " + strFolder +
+                             " inputs. Name the " + strKey + " input in the manifest.")
+        dictInputs[strKey] = listPaths[0]
+
+    return dictInputs
+
+
+def run_realization(dictJob, project, workspaceJob, cacheWorkspace):
+    """Run the Confining Margins tool and the analyses of one realization, returning the output paths."""
+
+    dictOutputs = {}
+    if project is not None:
+        dictJob.update(project_inputs(project, dictJob))
+        dictOutputs["realization_id"] = project.get_next_realization_id()
+        outputWorkspace = os.path.join(project.projectPath, "Outputs", dictOutputs["realization_id"])
+    else:
+        outputWorkspace = dictJob["output"]
+    if not os.path.isdir(outputWorkspace):
+        os.makedirs(outputWorkspace)
+
+    gis_tools.AddMessage("Realization " + dictJob["name"] + ": Confining Margins")
+    dictOutputs["raw"] = gis_tools.newGISDataset(outputWorkspace, "RawConfiningState.shp")
+    dictOutputs["margins"] = gis_tools.newGISDataset(outputWorkspace, "ConfiningMargins.shp")
+    ConfiningMargins.main(dictJob["network"],
+                          dictJob["valley_bottom"],
+                          dictJob["channel"],
+                          dictOutputs["raw"],
+                          dictOutputs["margins"],
+                          workspaceJob,
+                          bool(dictJob["integrated_width"]),
+                          cacheWorkspace,
+                          bool(dictJob["profile"]))
+
+    intAnalysis = 0
+    if dictJob["segment_id"]:
+        intAnalysis = intAnalysis + 1
+        gis_tools.AddMessage("Realization " + dictJob["name"] + ": Segmented Network Confinement")
+        dictOutputs["segments"] = ConfinementSegments.custom_segments(dictOutputs["raw"],
+                                                                      dictJob["segment_id"],
+                                                                      "IsConfined",
+                                                                      "IsConstric",
+                                                                      analysis_workspace(outputWorkspace, intAnalysis),
+                                                                      workspaceJob)
+
+    if dictJob["segment_length"]:
+        intAnalysis = intAnalysis + 1
+        gis_tools.AddMessage("Realization " + dictJob["name"] + ": Fixed Segment Confinement")
+        dictOutputs["fixed_segments"] = ConfinementSegments.fixed_segments(dictOutputs["raw"],
+                                                                           dictJob["route_id"],
+                                                                           "IsConfined",
+                                                                           "IsConstric",
+                                                                           dictJob["segment_length"],
+                                                                           analysis_workspace(outputWorkspace, intAnalysis),
+                                                                           workspaceJob)
+
+    if dictJob["seed_distance"] and dictJob["window_sizes"]:
+        intAnalysis = intAnalysis + 1
+        gis_tools.AddMessage("Realization " + dictJob["name"] + ": Moving Window Confinement")
+        workspaceAnalysis = analysis_workspace(outputWorkspace, intAnalysis)
+        MovingWindow.main(dictOutputs["raw"],
+                          dictJob["route_id"],
+                          "IsConfined",
+                          "IsConstric",
+                          str(dictJob["seed_distance"]),
+                          ";".join(str(value) for value in dictJob["window_sizes"]),
+                          workspaceAnalysis,
+                          workspaceJob,
+                          bool(dictJob["profile"]))
+        dictOutputs["seed_points"] = os.path.join(workspaceAnalysis, "MovingWindowSeedPoints.shp")
+        dictOutputs["windows"] = os.path.join(workspaceAnalysis, "MovingWindowSegments.shp")
+
+    return dictOutputs
+
+
+def analysis_workspace(outputWorkspace, intAnalysis):
+    workspaceAnalysis = os.path.join(outputWorkspace, "Analyses", "ConfiningSegments_" + str(intAnalysis).zfill(3))
+    if not os.path.isdir(workspaceAnalysis):
+        os.makedirs(workspaceAnalysis)
+    return workspaceAnalysis
+
+
+def add_realization(dictJob, dictOutputs):
+    """Add a realization and its analyses to the project XML, as the Confinement Toolbox tools do."""
+
+    project = riverscapes_project.Project(dictJob["project"])
+    nodeRealization = project.add_realization(dictJob["name"],
+                                              dictOutputs["realization_id"],
+                                              {"StreamNetwork": project.get_dataset_id(dictJob["network"]),
+                                               "ValleyBottom": project.get_dataset_id(dictJob["valley_bottom"]),
+                                               "ChannelPolygon": project.get_dataset_id(dictJob["channel"])},
+                                              [("ConfiningMargins", dictOutputs["margins"]),
+                                               ("RawConfiningState", dictOutputs["raw"])],
+                                              release.ConfinementToolReleaseVersion)
+
+    # Analyses, numbered in the order run_realization created their folders
+    for strKey, fieldSegmentID in (("segments", dictJob["segment_id"]), ("fixed_segments", "SegID")):
+        if strKey in dictOutputs:
+            analysis_id = os.path.basename(os.path.dirname(dictOutputs[strKey]))
+            project.add_analysis(nodeRealization,
+                                 "SegmentedNetwork",
+                                 dictJob["name"] + "_" + analysis_id,
+                                 analysis_id,
+                                 OrderedDict([("SegmentIDField", fieldSegmentID),
+                                              ("ConfinementField", "IsConfined"),
+                                              ("ConstrictionField", "IsConstric")]),
+                                 [(os.path.splitext(os.path.basename(dictOutputs[strKey]))[0], dictOutputs[strKey])])
+    if "seed_points" in dictOutputs:
+        analysis_id = os.path.basename(os.path.dirname(dictOutputs["seed_points"]))
+        project.add_analysis(nodeRealization,
+                             "MovingWindow",
+                             dictJob["name"] + "_" + analysis_id,
+                             analysis_id,
+                             OrderedDict([("SeedPointDistance", dictJob["seed_distance"]),
+                                          ("WindowSizes", ";".join(str(value) for value in dictJob["window_sizes"]))]),
+                             [("MovingWindowSeedPoints", dictOutputs["seed_points"]),
+                              ("MovingWindowSegments", dictOutputs["windows"])])
+    project.write()
+
+    return
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run confinement realizations for a list of project XMLs or a JSON manifest.")
+    parser.add_argument("inputs", nargs="+", help="Manifest (.json) or Riverscapes project XMLs")
+    parser.add_argument("--scratch", default="BatchScratch", help="Scratch workspace, one folder per realization attempt")
+    parser.add_argument("--realization", default="Batch", help="Realization name used with project XMLs")
+    parser.add_argument("--cache", help="Cache workspace shared by all realizations")
+    parser.add_argument("--workers", type=int, help="Number of worker processes")
+    parser.add_argument("--retries", type=int, default=1, help="Retries of a failed realization")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    listResults = main(args.inputs, args.scratch, args.realization, args.cache, args.workers, args.retries)
+    for dictResult in listResults:
+        print(dictResult["status"] + "\t" + str(dictResult["attempts"]) + "\t" + dictResult["name"] + "\t" +
+              str(dictResult["project"] or ""))
+
+    sys.exit(1 if any(dictResult["status"] == "failed" for dictResult in listResults) else 0)
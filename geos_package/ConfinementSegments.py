@@ -0,0 +1,140 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Confinement Segments (GEOS Backend)                            #
+# Purpose:     Summarize confinement on a segmented stream network.           #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from common_package import array_functions
+from . import gis_tools
+
+
+def custom_segments(fcInputNetwork,
+                    fieldSegmentID,
+                    fieldConfinement,
+                    fieldConstriction,
+                    outputWorkspace,
+                    tempWorkspace=gis_tools.scratchWorkspace):
+    """
+
+    :param fcInputNetwork:
+    :param fieldSegmentID:
+    :param fieldConfinement:
+    :param fieldConstriction:
+    :param outputWorkspace:
+    :param tempWorkspace:
+    :return: Output Network: str
+    """
+
+    # Copy Network
+    fcNetwork = gis_tools.read_dataset(fcInputNetwork).copy()
+    for FieldName in ["Con_LEFT", "Con_RIGHT", "Con_Type"]:
+        fcNetwork.deleteField(FieldName)
+
+    # Length weighted Confinement/Constriction per Segment
+    arraySegmentID = np.array(fcNetwork.getValues(fieldSegmentID))
+    arrayLength = shapely.length(gis_tools.geometry_array(fcNetwork))
+    arrayConfinementValue = array_functions.group_fractions(arraySegmentID, arrayLength, fcNetwork.getValues(fieldConfinement))
+    arrayConstrictionValue = array_functions.group_fractions(arraySegmentID, arrayLength, fcNetwork.getValues(fieldConstriction))
+
+    # Write Results to Network
+    fieldSegLength = gis_tools.resetField(fcNetwork, "SegLen", "DOUBLE")
+    fieldConfinementValue = gis_tools.resetField(fcNetwork, "CONF_Value", "DOUBLE")
+    fieldConstrictionValue = gis_tools.resetField(fcNetwork, "CNST_Value", "DOUBLE")
+    fcNetwork.setValues(fieldSegLength, arrayLength.tolist())
+    fcNetwork.setValues(fieldConfinementValue, [array_functions.nan_to_none(value) for value in arrayConfinementValue])
+    fcNetwork.setValues(fieldConstrictionValue, [array_functions.nan_to_none(value) for value in arrayConstrictionValue])
+
+    fcNetwork.deleteField(fieldConfinement)
+    fcNetwork.deleteField(fieldConstriction)
+
+    outNetwork = gis_tools.newGISDataset(outputWorkspace, "ConfinementSegments")
+    gis_tools.write_dataset(fcNetwork, outNetwork)
+
+    return outNetwork
+
+
+def fixed_segments(fcInputNetwork,
+                   fieldStreamRouteID,
+                   fieldConfinement,
+                   fieldConstriction,
+                   dblSegmentLength,
+                   outputWorkspace,
+                   tempWorkspace=gis_tools.scratchWorkspace):
+    """Calculate confinement on fixed length segments of each route.
+
+    Each route is cut every dblSegmentLength from its start (the last segment holds the
+    remainder), and the confined and constricted fractions of each segment are calculated
+    from the measures of the raw confining state segments along the route.
+
+    :param fcInputNetwork: Stream network with confining state
+    :param fieldStreamRouteID:
+    :param fieldConfinement:
+    :param fieldConstriction:
+    :param dblSegmentLength:
+    :param outputWorkspace:
+    :param tempWorkspace:
+    :return: Output Network: str
+    """
+
+    dblSegmentLength = float(dblSegmentLength)
+
+    fcNetwork = gis_tools.read_dataset(fcInputNetwork)
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+    arrayRouteID = np.array(fcNetwork.getValues(fieldStreamRouteID), dtype=object)
+    arrayConfinement = np.array([value or 0 for value in fcNetwork.getValues(fieldConfinement)], dtype=float)
+    arrayConstriction = np.array([value or 0 for value in fcNetwork.getValues(fieldConstriction)], dtype=float)
+
+    fcSegments = gis_tools.FeatureClass("LineString", fcNetwork.crs)
+    fcSegments.addField("RouteID", "LONG")
+    fcSegments.addField("SegID", "LONG")
+    fcSegments.addField("SegLen", "DOUBLE")
+    fcSegments.addField("CONF_Value", "DOUBLE")
+    fcSegments.addField("CNST_Value", "DOUBLE")
+
+    for valueRouteID in gis_tools.unique_values(fcNetwork, fieldStreamRouteID):
+        arraySegmentIndex = np.flatnonzero(arrayRouteID == valueRouteID)
+        arraySegments = arrayNetwork[arraySegmentIndex]
+        arrayParts = shapely.get_parts(shapely.line_merge(shapely.union_all(shapely.get_parts(arraySegments))))
+
+        # Measure each network segment along its route part
+        arrayPartIndex = STRtree(arrayParts).nearest(shapely.line_interpolate_point(arraySegments, 0.5, normalized=True))
+        arrayFirstPoints, arrayLastPoints = gis_tools.line_end_points(arraySegments)
+        arrayStart = shapely.line_locate_point(arrayParts[arrayPartIndex], arrayFirstPoints)
+        arrayEnd = shapely.line_locate_point(arrayParts[arrayPartIndex], arrayLastPoints)
+
+        for iPart, gRoute in enumerate(arrayParts):
+            boolPart = arrayPartIndex == iPart
+            arrayFrom, arrayTo, listPieces = array_functions.cut_line(shapely.get_coordinates(gRoute), dblSegmentLength)
+            arrayConfinementValue = array_functions.window_fractions(arrayStart[boolPart], arrayEnd[boolPart],
+                                                                     arrayConfinement[arraySegmentIndex][boolPart],
+                                                                     arrayFrom, arrayTo)
+            arrayConstrictionValue = array_functions.window_fractions(arrayStart[boolPart], arrayEnd[boolPart],
+                                                                      arrayConstriction[arraySegmentIndex][boolPart],
+                                                                      arrayFrom, arrayTo)
+            for i, arrayPiece in enumerate(listPieces):
+                fcSegments.addRow(shapely.linestrings(arrayPiece),
+                                  {"RouteID": valueRouteID,
+                                   "SegID": len(fcSegments),
+                                   "SegLen": float(arrayTo[i] - arrayFrom[i]),
+                                   "CONF_Value": array_functions.nan_to_none(arrayConfinementValue[i]),
+                                   "CNST_Value": array_functions.nan_to_none(arrayConstrictionValue[i])})
+
+    outNetwork = gis_tools.newGISDataset(outputWorkspace, "ConfinementFixedSegments")
+    gis_tools.write_dataset(fcSegments, outNetwork)
+
+    return outNetwork
@@ -0,0 +1,860 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Valley Confinement Tool (GEOS Backend)                         #
+# Purpose:     Calculate Valley Confinement Along a Stream Network            #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import sys
+import json
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import LineString
+from shapely.ops import nearest_points, substring
+
+from common_package import array_functions
+from common_package import cache
+from common_package import profiling
+from . import gis_tools
+from . import DividePolygonBySegment
+
+dblTolerance = 0.01 # Meters, used to match coincident edges
+dblMarginSampleDistance = 10.0 # Meters, margins are transferred to the network in pieces of this length
+fieldPartitionCore = "Prt_Core"
+listIntegratedWidthFields = ["IW_Length", "ChanneArea", "IWChannel", "ValleyArea", "IWValley", "IW_Ratio"]
+
+
+# # Main Function # #
+def main(fcInputStreamLineNetwork,
+         fcInputValleyBottomPolygon,
+         fcInputChannelPolygon,
+         fcOutputRawConfiningState,
+         fcOutputConfiningMargins,
+         scratchWorkspace,
+         boolIntegratedWidthAttributes=False,
+         cacheWorkspace=None,
+         boolProfile=False,
+         gExtent=None):
+
+    ##Prepare processing environments
+    gis_tools.AddMessage("Starting Confining Margins Tool")
+    profiler = profiling.Profiler("Confining Margins", scratchWorkspace, boolProfile, gis_tools.feature_count)
+
+    # Intermediates are removed when the run completes or fails
+    with gis_tools.WorkspaceManager(scratchWorkspace) as manager:
+        fcNetwork = gis_tools.read_dataset(fcInputStreamLineNetwork)
+        fcValleyBottom = gis_tools.read_dataset(fcInputValleyBottomPolygon)
+        fcChannel = gis_tools.read_dataset(fcInputChannelPolygon)
+
+        arrayNetwork = gis_tools.geometry_array(fcNetwork) # 'empty' z values can cause problem with dissolve
+        gValleyBottom = shapely.union_all(gis_tools.geometry_array(fcValleyBottom))
+        gChannel = shapely.union_all(gis_tools.geometry_array(fcChannel))
+        if gExtent is not None:
+            gValleyBottom = shapely.intersection(gValleyBottom, gExtent)
+            gChannel = shapely.intersection(gChannel, gExtent)
+
+        # Create Confined Channel Polygon
+        with profiler.stage("Confined Channel", [fcChannel, fcValleyBottom]) as stage:
+            gConfinedChannel = shapely.intersection(gChannel, gValleyBottom)
+            save_intermediate([gConfinedChannel], fcNetwork.crs, manager, "ChannelConfined")
+            stage.out(gConfinedChannel)
+
+        # Create Confinement Edges
+        with profiler.stage("Confining Margins", [gConfinedChannel]) as stage:
+            arrayConfiningMargins = stage.out(confining_margins(gConfinedChannel, gValleyBottom, gExtent))
+
+        # Merge segments in Polyline Center to create Route Layer
+        # one feature per 'section between trib or branch junctions', reused across runs on the same network
+        with profiler.stage("Dissolve", [fcNetwork]) as stage:
+            fcStreamNetworkDissolved = gis_tools.cached_dataset(cacheWorkspace,
+                                                                "StreamNetworkDissolved",
+                                                                [fcNetwork],
+                                                                ["SINGLE_PART", "UNSPLIT_LINES"],
+                                                                lambda: line_feature_class(dissolve_network(arrayNetwork), fcNetwork.crs))
+            arrayStreamNetworkDissolved = stage.out(gis_tools.geometry_array(fcStreamNetworkDissolved))
+            save_intermediate(arrayStreamNetworkDissolved, fcNetwork.crs, manager, "StreamNetworkDissolved")
+
+        #SegmentPolgyons
+        gis_tools.AddMessage("Preparing Segmented Polygons...")
+        with profiler.stage("Bank Polygons", [gConfinedChannel]) as stage:
+            arrayChannelBankLines = channel_bank_lines(arrayNetwork, gConfinedChannel)
+            fcChannelBankPolygons = gis_tools.FeatureClass("Polygon", fcNetwork.crs)
+            fcChannelBankPolygons.geometries = list(channel_bank_polygons(arrayNetwork, gConfinedChannel, arrayChannelBankLines))
+            stage.out(fcChannelBankPolygons)
+
+        # Create River Side buffer to select right or left banks
+        gis_tools.AddMessage("Determining Relative Sides of Bank...")
+        with profiler.stage("Bank Sides", [fcChannelBankPolygons]) as stage:
+            determine_banks(fcNetwork, fcChannelBankPolygons, scratchWorkspace)
+            save_intermediate(fcChannelBankPolygons, fcNetwork.crs, manager, "Bank_Polygons")
+            stage.out(fcChannelBankPolygons)
+
+        # Split the margins at the bank polygons, each piece takes the BankSide of its polygon
+        with profiler.stage("Split Margins", [arrayConfiningMargins]) as stage:
+            fcConfinementMarginSegmentsBankSide = stage.out(margin_bank_sides(arrayConfiningMargins, fcChannelBankPolygons, arrayChannelBankLines))
+            save_intermediate(fcConfinementMarginSegmentsBankSide, fcNetwork.crs, manager, "ConfinementMarginSegmentsBank")
+
+        # Transfer Confining Margins to Stream Network ##
+        gis_tools.AddMessage("Transferring Confining Margins to Stream Network...")
+        arrayBankSide = np.array(fcConfinementMarginSegmentsBankSide.getValues("BankSide"))
+        dictConfinement = {}
+        for strBankSide in ("LEFT", "RIGHT"):
+            fcBankMargins = fcConfinementMarginSegmentsBankSide.subset(np.flatnonzero(arrayBankSide == strBankSide))
+            with profiler.stage("Transfer Line " + strBankSide, [fcBankMargins]) as stage:
+                dictConfinement[strBankSide] = stage.out(transfer_line(fcBankMargins, fcStreamNetworkDissolved, strBankSide))
+        dictConfinementLeft = dictConfinement["LEFT"]
+        dictConfinementRight = dictConfinement["RIGHT"]
+
+        # Integrated Width
+        fcIntersectLineNetwork = fcNetwork
+        if boolIntegratedWidthAttributes:
+            gis_tools.AddMessage("Calculating Integrated Width...")
+            with profiler.stage("Integrated Width", [fcNetwork]) as stage:
+                fcIntersectLineNetwork = stage.out(integrated_width(fcNetwork, gConfinedChannel, gValleyBottom, cacheWorkspace=cacheWorkspace))
+                save_intermediate(fcIntersectLineNetwork, fcNetwork.crs, manager, "IW_ChannelAndValley")
+
+        #Re-split centerline by segments
+        gis_tools.AddMessage("Determining Confinement State on Stream Network...")
+        with profiler.stage("Split", [fcIntersectLineNetwork]) as stage:
+            fcRawConfiningState = stage.out(split_network(fcIntersectLineNetwork,
+                                                          arrayNetwork,
+                                                          arrayStreamNetworkDissolved,
+                                                          dictConfinementLeft,
+                                                          dictConfinementRight))
+
+        #Table and Attributes
+        with profiler.stage("Classification", [fcRawConfiningState]) as stage:
+            arrayConType, arrayIsConfined, arrayIsConstric = array_functions.confinement_type(fcRawConfiningState.getValues("Con_LEFT"),
+                                                                                              fcRawConfiningState.getValues("Con_RIGHT"))
+            fcRawConfiningState.addField("Con_Type", "TEXT", 6)
+            fcRawConfiningState.addField("IsConfined", "SHORT")
+            fcRawConfiningState.addField("IsConstric", "SHORT")
+            fcRawConfiningState.setValues("Con_Type", arrayConType.tolist())
+            fcRawConfiningState.setValues("IsConfined", arrayIsConfined.tolist())
+            fcRawConfiningState.setValues("IsConstric", arrayIsConstric.tolist())
+            stage.out(fcRawConfiningState)
+
+        # Final Output
+        gis_tools.AddMessage("Preparing Final Output...")
+        with profiler.stage("Final Output", [fcRawConfiningState, fcConfinementMarginSegmentsBankSide]) as stage:
+            gis_tools.write_dataset(fcRawConfiningState, fcOutputRawConfiningState)
+
+            if fcOutputConfiningMargins:
+                gis_tools.write_dataset(fcConfinementMarginSegmentsBankSide, fcOutputConfiningMargins)
+            else:
+                manager.tempDataset("ConfiningMargins", fcConfinementMarginSegmentsBankSide)
+            stage.out([fcRawConfiningState, fcConfinementMarginSegmentsBankSide])
+
+        profiler.write(fcOutputRawConfiningState, OrderedDict([("StreamNetwork", fcInputStreamLineNetwork),
+                                                               ("ValleyBottom", fcInputValleyBottomPolygon),
+                                                               ("ChannelPolygon", fcInputChannelPolygon),
+                                                               ("IntegratedWidth", boolIntegratedWidthAttributes)]))
+
+        manager.report()
+
+    return
+
+
+def save_intermediate(listGeometries, crs, manager, strName):
+    """Save a scratch product as a temp dataset of the run's WorkspaceManager."""
+
+    if isinstance(listGeometries, gis_tools.FeatureClass):
+        fc = listGeometries
+    else:
+        fc = gis_tools.FeatureClass(None, crs)
+        fc.geometries = [gGeometry for gGeometry in listGeometries if gGeometry is not None and not gGeometry.is_empty]
+    if len(fc) == 0:
+        return
+    manager.tempDataset(strName, fc)
+
+    return
+
+
+def confining_margins(gConfinedChannel, gValleyBottom, gExtent=None):
+    """Return the single part edges of the confined channel that lie on the valley bottom margin.
+
+    Edges created by clipping the polygons to gExtent are not margins and are removed.
+    """
+
+    gValleyInterior = shapely.buffer(gValleyBottom, -dblTolerance)
+    gMargins = shapely.difference(gConfinedChannel.boundary, gValleyInterior)
+    if gExtent is not None:
+        gMargins = shapely.difference(gMargins, shapely.buffer(gExtent.boundary, dblTolerance))
+    gMargins = shapely.line_merge(gMargins)
+    arrayMargins = shapely.get_parts(gMargins)
+
+    return arrayMargins[shapely.length(arrayMargins) > dblTolerance]
+
+
+def line_feature_class(arrayLines, crs):
+    fc = gis_tools.FeatureClass("LineString", crs)
+    fc.geometries = list(arrayLines)
+    return fc
+
+
+def dissolve_network(arrayNetwork):
+    """Dissolve the network into single part lines between junctions (Dissolve SINGLE_PART, UNSPLIT_LINES)."""
+
+    return shapely.get_parts(shapely.line_merge(shapely.union_all(shapely.get_parts(arrayNetwork))))
+
+
+def dangle_points(arrayNetwork):
+    """Return the ends of the network lines that are not connected to another line."""
+
+    arrayLines = shapely.get_parts(arrayNetwork)
+    arrayFirstPoints, arrayLastPoints = gis_tools.line_end_points(arrayLines)
+    arrayEnds = shapely.get_coordinates(np.concatenate([arrayFirstPoints, arrayLastPoints]))
+    countEnds = Counter(map(tuple, arrayEnds))
+    arrayDangles = np.array([coord for coord, count in countEnds.items() if count == 1]).reshape(-1, 2)
+    arrayDanglePoints = shapely.points(arrayDangles)
+
+    # A line end touching the middle of another line is not a dangle.
+    treeLines = STRtree(arrayLines)
+    arrayPointIndex, arrayLineIndex = treeLines.query(arrayDanglePoints, predicate="intersects")
+    countTouches = np.bincount(arrayPointIndex, minlength=len(arrayDanglePoints))
+
+    return arrayDanglePoints[countTouches == 1]
+
+
+def channel_bank_lines(arrayNetwork, gConfinedChannel, dblPointDensity=10.0):
+    """Return the lines that split the confined channel into bank polygons.
+
+    These are the network, the near lines closing its dangles to the channel edge and the edges of the
+    Thiessen regions of the network segments (DividePolygonBySegment), so each bank polygon is on one
+    side of one segment. A bank polygon in a tributary junction is split between the two streams.
+    """
+
+    arrayStreamNetworkDangles = dangle_points(arrayNetwork)
+    arrayDanglesInChannel = arrayStreamNetworkDangles[shapely.intersects(arrayStreamNetworkDangles, gConfinedChannel)]
+    arrayChannelBankNearLines = near_lines(arrayDanglesInChannel, gConfinedChannel.boundary)
+
+    arrayCells, arrayTag = DividePolygonBySegment.segment_voronoi(arrayNetwork, dblPointDensity, gConfinedChannel.envelope)
+    arraySegmentPolygons = DividePolygonBySegment.dissolve_tags(arrayCells, arrayTag)[1]
+    arraySegmentPolygonLines = shapely.get_parts(shapely.boundary(arraySegmentPolygons))
+
+    return np.concatenate([shapely.get_parts(arrayNetwork), arrayChannelBankNearLines, arraySegmentPolygonLines])
+
+
+def channel_bank_polygons(arrayNetwork, gConfinedChannel, arrayChannelBankLines=None):
+    """Split the confined channel into bank polygons by the channel_bank_lines.
+
+    Polygons closed by the lines outside the confined channel (i.e. where the stream leaves it) are not banks.
+    """
+
+    if arrayChannelBankLines is None:
+        arrayChannelBankLines = channel_bank_lines(arrayNetwork, gConfinedChannel)
+
+    gChannelBankLines = shapely.union_all(np.concatenate([arrayChannelBankLines,
+                                                          shapely.get_parts(gConfinedChannel.boundary)]))
+    arrayPolygons = shapely.get_parts(shapely.polygonize(shapely.get_parts(gChannelBankLines)))
+    return arrayPolygons[shapely.intersects(gConfinedChannel, shapely.point_on_surface(arrayPolygons))]
+
+
+def near_lines(arrayPoints, gLines):
+    """Return the line from each point to the nearest location on gLines (Near_analysis and XYToLine).
+
+    The lines are extended dblTolerance past the near location so that they cross gLines and are
+    noded with it by union_all; a line that stops on gLines does not split the polygons.
+    """
+
+    listNearLines = []
+    for gPoint in arrayPoints:
+        arrayNear = shapely.get_coordinates(LineString(nearest_points(gPoint, gLines)))
+        arrayDirection = arrayNear[1] - arrayNear[0]
+        dblDistance = np.hypot(*arrayDirection)
+        if dblDistance > 0:
+            arrayNear[1] = arrayNear[1] + arrayDirection / dblDistance * dblTolerance
+        listNearLines.append(LineString(arrayNear))
+
+    return np.array(listNearLines, dtype=object)
+
+
+def determine_banks(fcInputStreamLineNetwork, fcChannelBankPolygons, scratchWorkspace):
+
+    fcNetwork = gis_tools.read_dataset(fcInputStreamLineNetwork)
+    fcBankPolygons = gis_tools.read_dataset(fcChannelBankPolygons)
+
+    arrayBankPoints = shapely.point_on_surface(gis_tools.geometry_array(fcBankPolygons))
+    gis_tools.resetField(fcBankPolygons, "BankSide", "TEXT", 10)
+    fcBankPolygons.setValues("BankSide", bank_sides(gis_tools.geometry_array(fcNetwork), arrayBankPoints))
+
+    if not isinstance(fcChannelBankPolygons, gis_tools.FeatureClass):
+        gis_tools.write_dataset(fcBankPolygons, fcChannelBankPolygons)
+
+    return
+
+
+def bank_sides(arrayLines, arrayPoints):
+    """Label each point LEFT or RIGHT of the nearest line segment, in the direction of the line."""
+
+    if len(arrayPoints) == 0:
+        return []
+
+    arraySegments = gis_tools.line_segments(arrayLines)[0]
+    arraySegments = arraySegments[(arraySegments[:, 0] != arraySegments[:, 2]) | (arraySegments[:, 1] != arraySegments[:, 3])]
+    treeSegments = STRtree(shapely.linestrings(arraySegments.reshape(-1, 2, 2)))
+    arrayNearest = treeSegments.nearest(arrayPoints)
+
+    arraySide = array_functions.side_of_segments(arraySegments[arrayNearest], shapely.get_coordinates(arrayPoints))
+    return ["LEFT" if intSide > 0 else "RIGHT" for intSide in arraySide]
+
+
+def margin_bank_sides(arrayConfiningMargins, fcChannelBankPolygons, arrayChannelBankLines):
+    """Split the confining margins where the bank lines cross them and label each piece with the BankSide of its polygon.
+
+    The margins lie on the edge of the confined channel, so each piece is on the edge of one bank polygon, the
+    nearest to its midpoint. Splitting by measure keeps the margin vertices, an overlay with the polygons loses
+    short pieces where the margin and the polygon edge are not exactly coincident.
+    """
+
+    fcMargins = gis_tools.FeatureClass("LineString", fcChannelBankPolygons.crs)
+    fcMargins.addField("BankSide", "TEXT", 254)
+    if len(arrayConfiningMargins) == 0 or len(fcChannelBankPolygons) == 0:
+        return fcMargins
+
+    arrayPieces = split_lines(arrayConfiningMargins, arrayChannelBankLines)
+    arrayMidPoints = shapely.line_interpolate_point(arrayPieces, 0.5, normalized=True)
+    arrayNearestBank = STRtree(gis_tools.geometry_array(fcChannelBankPolygons)).nearest(arrayMidPoints)
+
+    listBankSide = fcChannelBankPolygons.getValues("BankSide")
+    for gPiece, iBank in zip(arrayPieces, arrayNearestBank):
+        fcMargins.addRow(gPiece, {"BankSide": listBankSide[iBank]})
+
+    return fcMargins
+
+
+def split_lines(arrayLines, arrayCutLines):
+    """Split the lines where the cut lines cross them (SplitLineAtPoint at their intersection points)."""
+
+    arrayLineIndex, arrayCutIndex = STRtree(arrayCutLines).query(arrayLines, predicate="intersects")
+    arrayCrossings = shapely.intersection(arrayLines[arrayLineIndex], arrayCutLines[arrayCutIndex])
+    arrayCoords, arrayCrossingIndex = shapely.get_coordinates(arrayCrossings, return_index=True)
+    arrayOwner = arrayLineIndex[arrayCrossingIndex]
+    arrayMeasures = shapely.line_locate_point(arrayLines[arrayOwner], shapely.points(arrayCoords))
+    arrayOrder = np.argsort(arrayOwner, kind="mergesort")
+    arrayBounds = np.searchsorted(arrayOwner[arrayOrder], np.arange(len(arrayLines) + 1))
+
+    listPieces = []
+    for iLine, gLine in enumerate(arrayLines):
+        arrayLineMeasures = arrayMeasures[arrayOrder[arrayBounds[iLine]:arrayBounds[iLine + 1]]]
+        arrayBreaks = np.unique(np.concatenate([[0.0], arrayLineMeasures, [gLine.length]]))
+        for dblFrom, dblTo in zip(arrayBreaks[:-1], arrayBreaks[1:]):
+            if dblTo - dblFrom > dblTolerance:
+                listPieces.append(substring(gLine, dblFrom, dblTo))
+
+    return np.array(listPieces, dtype=object)
+
+
+def transfer_line(fcInLine, fcToLine, strStreamSide):
+    """Transfer the margin segments to the routes in fcToLine as confined intervals.
+
+    The margins are densified and each two point piece is assigned to the routes nearest
+    its ends, so a margin passing a junction is shared between the routes. The piece
+    ends are projected onto the route as measures and merged into confined intervals.
+    Returns a dictionary of route index: (arrayBreaks, arrayConfined) where the route is
+    split at each break (measure) and arrayConfined flags the pieces between consecutive
+    breaks that are confined on strStreamSide.
+    """
+
+    fcMargins = gis_tools.read_dataset(fcInLine)
+    fcRoutes = gis_tools.read_dataset(fcToLine)
+    arrayRoutes = gis_tools.geometry_array(fcRoutes)
+    arrayMargins = gis_tools.geometry_array(fcMargins)
+
+    dictConfinement = {}
+    if len(arrayMargins) == 0:
+        return dictConfinement
+
+    arrayPieces = gis_tools.line_segments(shapely.segmentize(arrayMargins, dblMarginSampleDistance))[0]
+    arrayStartPoints = shapely.points(arrayPieces[:, 0:2])
+    arrayEndPoints = shapely.points(arrayPieces[:, 2:4])
+
+    # A piece is transferred to the routes nearest each of its ends
+    treeRoutes = STRtree(arrayRoutes)
+    arrayPieceIndex, arrayPieceRoutes = np.unique(np.concatenate([
+        np.column_stack([np.arange(len(arrayPieces)), treeRoutes.nearest(arrayStartPoints)]),
+        np.column_stack([np.arange(len(arrayPieces)), treeRoutes.nearest(arrayEndPoints)])]), axis=0).T
+
+    arrayStart = shapely.line_locate_point(arrayRoutes[arrayPieceRoutes], arrayStartPoints[arrayPieceIndex])
+    arrayEnd = shapely.line_locate_point(arrayRoutes[arrayPieceRoutes], arrayEndPoints[arrayPieceIndex])
+
+    for iRoute in np.unique(arrayPieceRoutes):
+        boolRoute = arrayPieceRoutes == iRoute
+        dictConfinement[iRoute] = array_functions.interval_breaks(arrayStart[boolRoute],
+                                                                  arrayEnd[boolRoute],
+                                                                  arrayRoutes[iRoute].length)
+
+    return dictConfinement
+
+
+def split_network(fcIntersectLineNetwork, arrayNetwork, arrayRoutes, dictConfinementLeft, dictConfinementRight):
+    """Split each network segment at the confinement breaks of its route(s) and flag Con_LEFT/Con_RIGHT."""
+
+    fcOutput = fcIntersectLineNetwork.copySchema()
+    fcOutput.geometryType = "LineString"
+    fcOutput.addField("Con_LEFT", "LONG")
+    fcOutput.addField("Con_RIGHT", "LONG")
+
+    # Each part of a segment is cut from the route(s) it lies on by the measures of their overlap
+    arrayParts, arrayPartSegment = shapely.get_parts(arrayNetwork, return_index=True)
+    treeParts = STRtree(arrayParts)
+    arrayRouteIndex, arrayPartIndex = treeParts.query(arrayRoutes, predicate="dwithin", distance=dblTolerance)
+    arrayStart, arrayEnd = overlap_measures(arrayRoutes[arrayRouteIndex], arrayParts[arrayPartIndex])
+    boolOverlap = arrayEnd - arrayStart > dblTolerance
+
+    for iRoute, iPart, dblStart, dblEnd in zip(arrayRouteIndex[boolOverlap], arrayPartIndex[boolOverlap],
+                                               arrayStart[boolOverlap], arrayEnd[boolOverlap]):
+        gRoute = arrayRoutes[iRoute]
+        breaksLeft, confinedLeft = dictConfinementLeft.get(iRoute, (np.array([0.0, gRoute.length]), np.zeros(1, dtype=np.int32)))
+        breaksRight, confinedRight = dictConfinementRight.get(iRoute, (np.array([0.0, gRoute.length]), np.zeros(1, dtype=np.int32)))
+        dictValues = fcIntersectLineNetwork.getRow(arrayPartSegment[iPart])
+
+        arrayBreaks = np.concatenate([[dblStart],
+                                      breaksLeft[(breaksLeft > dblStart) & (breaksLeft < dblEnd)],
+                                      breaksRight[(breaksRight > dblStart) & (breaksRight < dblEnd)],
+                                      [dblEnd]])
+        arrayBreaks = np.unique(arrayBreaks)
+        arrayMid = (arrayBreaks[:-1] + arrayBreaks[1:]) / 2.0
+        arrayLeft = array_functions.interval_flags(breaksLeft, confinedLeft, arrayMid)
+        arrayRight = array_functions.interval_flags(breaksRight, confinedRight, arrayMid)
+        for dblFrom, dblTo, intLeft, intRight in zip(arrayBreaks[:-1], arrayBreaks[1:], arrayLeft, arrayRight):
+            if dblTo - dblFrom <= dblTolerance:
+                continue
+            dictValues["Con_LEFT"] = int(intLeft)
+            dictValues["Con_RIGHT"] = int(intRight)
+            fcOutput.addRow(substring(gRoute, dblFrom, dblTo), dictValues)
+
+    return fcOutput
+
+
+def overlap_measures(arrayRoutes, arrayLines):
+    """Return the (start, end) measures on each route of its overlap with the line paired with it.
+
+    The overlap of two lines of the same network ends at a line end on the route or at a route end on
+    the line, so it is found by measure within dblTolerance rather than by an exact intersection,
+    which loses pieces where the vertices of the route and the line do not match. Lines that only
+    touch the route, or join it at both ends by another path, get NaN measures.
+    """
+
+    arrayLineFirst, arrayLineLast = gis_tools.line_end_points(arrayLines)
+    arrayRouteFirst, arrayRouteLast = gis_tools.line_end_points(arrayRoutes)
+    arrayMeasures = np.column_stack([
+        np.where(shapely.distance(arrayRoutes, arrayLineFirst) <= dblTolerance, shapely.line_locate_point(arrayRoutes, arrayLineFirst), np.nan),
+        np.where(shapely.distance(arrayRoutes, arrayLineLast) <= dblTolerance, shapely.line_locate_point(arrayRoutes, arrayLineLast), np.nan),
+        np.where(shapely.distance(arrayLines, arrayRouteFirst) <= dblTolerance, 0.0, np.nan),
+        np.where(shapely.distance(arrayLines, arrayRouteLast) <= dblTolerance, shapely.length(arrayRoutes), np.nan)])
+    arrayStart = np.fmin.reduce(arrayMeasures, axis=1)
+    arrayEnd = np.fmax.reduce(arrayMeasures, axis=1)
+
+    # The middle of the overlap must be on the line
+    arrayMidPoints = shapely.line_interpolate_point(arrayRoutes, np.nan_to_num((arrayStart + arrayEnd) / 2.0))
+    boolOnLine = shapely.distance(arrayLines, arrayMidPoints) <= dblTolerance
+    arrayStart[~boolOnLine] = np.nan
+    arrayEnd[~boolOnLine] = np.nan
+
+    return arrayStart, arrayEnd
+
+
+def partitioned(fcInputStreamLineNetwork,
+                fcInputValleyBottomPolygon,
+                fcInputChannelPolygon,
+                fcOutputRawConfiningState,
+                fcOutputConfiningMargins,
+                scratchWorkspace,
+                boolIntegratedWidthAttributes=False,
+                fieldPartition=None,
+                dblTileSize=None,
+                dblPadding=500.0,
+                intWorkers=None,
+                cacheWorkspace=None):
+    """Run the Confining Margins tool per partition of the stream network in a pool of worker processes.
+
+    The network is partitioned by the values of fieldPartition (i.e. a HUC code) or, if not provided, by a
+    square grid of dblTileSize using the segment midpoints. Each partition is run with its own scratch
+    workspace on the valley bottom and channel polygons clipped to the partition extent plus a halo of
+    dblPadding, widened to partition_halo if the valley bottom reaches farther. The network segments within
+    the halo are included so that the margins and valley regions of the partition's own (core) segments are
+    the same as in a single run. Only the rows and margin pieces of the core segments are kept and written
+    to the single RawConfiningState and ConfiningMargins outputs.
+    """
+
+    gis_tools.AddMessage("Starting Confining Margins Tool (Partitioned)")
+
+    fcNetwork = gis_tools.read_dataset(fcInputStreamLineNetwork)
+    fcValleyBottom = gis_tools.read_dataset(fcInputValleyBottomPolygon)
+    fcChannel = gis_tools.read_dataset(fcInputChannelPolygon)
+
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+    if len(arrayNetwork) == 0:
+        gis_tools.AddWarning("The stream network has no segments to partition.")
+        gis_tools.write_dataset(raw_schema(fcNetwork, boolIntegratedWidthAttributes), fcOutputRawConfiningState)
+        if fcOutputConfiningMargins:
+            gis_tools.write_dataset(merge_margins([], fcNetwork.crs), fcOutputConfiningMargins)
+        return
+
+    arrayPartitionKeys = partition_keys(fcNetwork, fieldPartition, dblTileSize)
+    treeNetwork = STRtree(arrayNetwork)
+    treeValleyBottom = STRtree(gis_tools.geometry_array(fcValleyBottom))
+    treeChannel = STRtree(gis_tools.geometry_array(fcChannel))
+    dblHalo = partition_halo(treeNetwork, gis_tools.geometry_array(fcValleyBottom), dblPadding)
+
+    listTasks = []
+    for valueKey in OrderedDict.fromkeys(arrayPartitionKeys.tolist()):
+        arrayCore = np.flatnonzero(arrayPartitionKeys == valueKey)
+        gExtent = shapely.box(*shapely.total_bounds(arrayNetwork[arrayCore])).buffer(dblHalo, join_style="mitre")
+
+        # Partition network: the core segments and the segments of other partitions within the extent, in network order
+        arraySegments = np.sort(treeNetwork.query(gExtent, predicate="intersects"))
+        fcPartitionNetwork = fcNetwork.subset(arraySegments)
+        fcPartitionNetwork.addField(fieldPartitionCore, "SHORT")
+        fcPartitionNetwork.setValues(fieldPartitionCore, np.isin(arraySegments, arrayCore).astype(int).tolist())
+
+        fcPartitionValleyBottom = fcValleyBottom.subset(treeValleyBottom.query(gExtent, predicate="intersects"))
+        fcPartitionChannel = fcChannel.subset(treeChannel.query(gExtent, predicate="intersects"))
+        listTasks.append((str(valueKey),
+                          fcPartitionNetwork,
+                          fcPartitionValleyBottom,
+                          fcPartitionChannel,
+                          partition_workspace(scratchWorkspace, valueKey),
+                          boolIntegratedWidthAttributes,
+                          gExtent,
+                          cacheWorkspace))
+
+    gis_tools.AddMessage("Running " + str(len(listTasks)) + " partitions...")
+    if intWorkers == 1 or len(listTasks) < 2:
+        listResults = [run_partition(task) for task in listTasks]
+    else:
+        with ProcessPoolExecutor(max_workers=intWorkers) as executor:
+            listResults = list(executor.map(run_partition, listTasks))
+
+    # Merge Partitions: the core rows and margins of each partition are streamed to the output
+    gis_tools.AddMessage("Merging Partitions...")
+    fcRawSchema = listResults[0][0].copySchema()
+    fcRawSchema.deleteField(fieldPartitionCore)
+    strGeometryType = gis_tools.geometry_type([gLine for fcPartitionRaw, fcPartitionMargins in listResults
+                                               for gLine in fcPartitionRaw.geometries], fcRawSchema.geometryType)
+    writerRaw = gis_tools.DatasetWriter(fcOutputRawConfiningState, fcRawSchema, strGeometryType)
+    listMargins = []
+    for fcPartitionRaw, fcPartitionMargins in listResults:
+        writerRaw.write(fcPartitionRaw)
+        listMargins.extend(zip(fcPartitionMargins.geometries, fcPartitionMargins.getValues("BankSide")))
+    writerRaw.close()
+
+    if fcOutputConfiningMargins:
+        gis_tools.write_dataset(merge_margins(listMargins, fcNetwork.crs), fcOutputConfiningMargins)
+
+    return
+
+
+def merge_margins(listMargins, crs):
+    """Return the (geometry, BankSide) margin pieces of several runs as one ConfiningMargins FeatureClass.
+
+    Each run keeps only the pieces of its core segments, so the pieces of adjacent runs do not overlap.
+    """
+
+    fcConfiningMargins = gis_tools.FeatureClass("LineString", crs)
+    fcConfiningMargins.addField("BankSide", "TEXT", 254)
+    for gMargin, strBankSide in listMargins:
+        fcConfiningMargins.addRow(gMargin, {"BankSide": strBankSide})
+
+    return fcConfiningMargins
+
+
+def raw_schema(fcNetwork, boolIntegratedWidthAttributes=False):
+    """Return an empty RawConfiningState with the fields main writes for fcNetwork."""
+
+    fcRaw = fcNetwork.copySchema()
+    fcRaw.geometryType = "LineString"
+    if boolIntegratedWidthAttributes:
+        for FieldName in listIntegratedWidthFields:
+            fcRaw.addField(FieldName, "DOUBLE")
+    fcRaw.addField("Con_LEFT", "LONG")
+    fcRaw.addField("Con_RIGHT", "LONG")
+    fcRaw.addField("Con_Type", "TEXT", 6)
+    fcRaw.addField("IsConfined", "SHORT")
+    fcRaw.addField("IsConstric", "SHORT")
+
+    return fcRaw
+
+
+def partition_halo(treeNetwork, arrayValleyBottom, dblPadding):
+    """Return the halo of a partition extent: dblPadding, or more where the valley bottom is wider.
+
+    The valley region (integrated width) and the margins of a segment reach no farther from the network
+    than the valley bottom edge, and the segments that can claim them are within twice that distance. With
+    a halo of twice the farthest valley bottom edge, clipping at the extent leaves the core segments as in
+    a single run.
+    """
+
+    arrayEdgePoints = shapely.points(shapely.get_coordinates(shapely.segmentize(shapely.boundary(arrayValleyBottom), dblMarginSampleDistance)))
+    if len(arrayEdgePoints) == 0:
+        return dblPadding
+    arrayDistance = treeNetwork.query_nearest(arrayEdgePoints, return_distance=True)[1]
+    dblHalo = 2.0 * float(arrayDistance.max()) + dblMarginSampleDistance
+    if dblHalo > dblPadding:
+        gis_tools.AddMessage("Partition halo widened to " + str(round(dblHalo, 1)) + " to cover the valley bottom")
+        return dblHalo
+    return dblPadding
+
+
+def partition_keys(fcNetwork, fieldPartition=None, dblTileSize=None):
+    """Return the partition key of each network segment, from a field or a grid of square tiles."""
+
+    if fieldPartition:
+        return np.array([str(value) for value in fcNetwork.getValues(fieldPartition)], dtype=object)
+    if not dblTileSize:
+        return np.array(["0"] * len(fcNetwork), dtype=object)
+
+    arrayMidPoints = shapely.get_coordinates(
+        shapely.line_interpolate_point(gis_tools.geometry_array(fcNetwork), 0.5, normalized=True))
+    arrayTiles = np.floor(arrayMidPoints / float(dblTileSize)).astype(np.int64)
+    return np.array([str(x) + "_" + str(y) for x, y in arrayTiles], dtype=object)
+
+
+def partition_workspace(scratchWorkspace, valueKey):
+    """Return an isolated scratch workspace for a partition."""
+
+    if gis_tools.is_memory_dataset(scratchWorkspace):
+        return scratchWorkspace # in_memory is private to each worker process
+    workspacePartition = os.path.join(scratchWorkspace, "Partition_" + str(valueKey))
+    if not os.path.isdir(workspacePartition):
+        os.makedirs(workspacePartition)
+    return workspacePartition
+
+
+def run_partition(task):
+    """Worker process: run the tool on one partition, returning the RawConfiningState and margins of its core segments."""
+
+    strKey, fcNetwork, fcValleyBottom, fcChannel, workspacePartition, boolIntegratedWidthAttributes, gExtent, cacheWorkspace = task
+    gis_tools.AddMessage("Partition " + strKey + ": " + str(len(fcNetwork)) + " segments")
+
+    fcMemRaw = gis_tools.memory_key("RawConfiningState_" + strKey)
+    fcMemMargins = gis_tools.memory_key("ConfiningMargins_" + strKey)
+    main(fcNetwork, fcValleyBottom, fcChannel, fcMemRaw, fcMemMargins, workspacePartition,
+         boolIntegratedWidthAttributes, cacheWorkspace, gExtent=gExtent)
+
+    fcRaw = gis_tools.read_dataset(fcMemRaw)
+    fcMargins = gis_tools.read_dataset(fcMemMargins)
+    gis_tools.resetData(fcMemRaw)
+    gis_tools.resetData(fcMemMargins)
+    if not gis_tools.is_memory_dataset(workspacePartition) and not os.listdir(workspacePartition):
+        os.rmdir(workspacePartition) # nothing was kept in the partition workspace
+
+    listCore = [i for i, valueCore in enumerate(fcRaw.getValues(fieldPartitionCore)) if valueCore == 1]
+
+    # Pieces reaching the clipped edge of the extent are clipping artifacts, the halo keeps core pieces
+    # clear of it. The others are split by segment and belong to the partition of their nearest segment.
+    if len(fcMargins) > 0 and gExtent is not None:
+        fcMargins = fcMargins.subset(np.flatnonzero(~shapely.dwithin(gis_tools.geometry_array(fcMargins),
+                                                                     gExtent.boundary, dblMarginSampleDistance)))
+    if len(fcMargins) > 0:
+        arrayCore = np.array(fcNetwork.getValues(fieldPartitionCore)) == 1
+        arrayOwner = STRtree(gis_tools.geometry_array(fcNetwork)).nearest(
+            shapely.line_interpolate_point(gis_tools.geometry_array(fcMargins), 0.5, normalized=True))
+        fcMargins = fcMargins.subset(np.flatnonzero(arrayCore[arrayOwner]))
+
+    return fcRaw.subset(listCore), fcMargins
+
+
+def incremental(fcInputStreamLineNetwork,
+                fcInputValleyBottomPolygon,
+                fcInputChannelPolygon,
+                fcOutputRawConfiningState,
+                fcOutputConfiningMargins,
+                scratchWorkspace,
+                cacheWorkspace,
+                boolIntegratedWidthAttributes=False,
+                dblPadding=500.0):
+    """Re-run the Confining Margins tool only where the valley bottom or channel polygons were edited.
+
+    The inputs of each run are recorded in the cache workspace. The polygons added or removed since the
+    previous run mark the changed area, and the network segments within dblPadding of it are re-run as a
+    single partition. Their raw confining state and margins replace those in the existing outputs. A full
+    run is made when there is no previous run, the network changed or an output is missing.
+
+    :return: the re-run part of the RawConfiningState (all of it after a full run), i.e. to find the routes
+    to update with MovingWindow.incremental.
+    """
+
+    fcNetwork = gis_tools.read_dataset(fcInputStreamLineNetwork)
+    fcValleyBottom = gis_tools.read_dataset(fcInputValleyBottomPolygon)
+    fcChannel = gis_tools.read_dataset(fcInputChannelPolygon)
+
+    cacheRuns = cache.Cache(cacheWorkspace)
+    strKey = cacheRuns.key("IncrementalInputs", os.path.abspath(str(fcOutputRawConfiningState)))
+    strEntry = cacheRuns.get(strKey)
+    strNetworkHash = gis_tools.dataset_hash(fcNetwork)
+
+    boolFullRun = strEntry is None or not gis_tools.exists(fcOutputRawConfiningState) or \
+                  not gis_tools.exists(fcOutputConfiningMargins)
+    if not boolFullRun and not gis_tools.exists(os.path.join(strEntry, "ValleyBottom" + gis_tools.intermediateExtension)):
+        boolFullRun = True # recorded by an earlier version
+    if not boolFullRun:
+        with open(os.path.join(strEntry, "inputs.json")) as fileInputs:
+            boolFullRun = json.load(fileInputs)["network"] != strNetworkHash
+    if boolFullRun:
+        gis_tools.AddMessage("No previous run on this network, running the full network...")
+        main(fcNetwork, fcValleyBottom, fcChannel, fcOutputRawConfiningState, fcOutputConfiningMargins,
+             scratchWorkspace, boolIntegratedWidthAttributes, cacheWorkspace)
+        record_inputs(cacheRuns, strKey, strNetworkHash, fcValleyBottom, fcChannel)
+        return gis_tools.read_dataset(fcOutputRawConfiningState)
+
+    gChanged = shapely.union_all([changed_area(gis_tools.read_dataset(os.path.join(strEntry, "ValleyBottom" + gis_tools.intermediateExtension)), fcValleyBottom),
+                                  changed_area(gis_tools.read_dataset(os.path.join(strEntry, "Channel" + gis_tools.intermediateExtension)), fcChannel)])
+    fcRawConfiningState = gis_tools.read_dataset(fcOutputRawConfiningState).copy()
+    if shapely.is_empty(gChanged):
+        gis_tools.AddMessage("Inputs unchanged since the previous run.")
+        return fcRawConfiningState.subset([])
+
+    # Re-run the segments near the changed area, with the padding as for a partition
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+    treeNetwork = STRtree(arrayNetwork)
+    arrayCore = treeNetwork.query(gChanged, predicate="dwithin", distance=dblPadding)
+    if len(arrayCore) == 0:
+        gis_tools.AddMessage("No network segments within the padding of the changed area.")
+        record_inputs(cacheRuns, strKey, strNetworkHash, fcValleyBottom, fcChannel)
+        return fcRawConfiningState.subset([])
+    gis_tools.AddMessage("Re-running " + str(len(arrayCore)) + " of " + str(len(fcNetwork)) + " segments...")
+    dblHalo = partition_halo(treeNetwork, gis_tools.geometry_array(fcValleyBottom), dblPadding)
+    gExtent = shapely.box(*shapely.total_bounds(arrayNetwork[arrayCore])).buffer(dblHalo, join_style="mitre")
+
+    arraySegments = np.sort(treeNetwork.query(gExtent, predicate="intersects"))
+    fcPartitionNetwork = fcNetwork.subset(arraySegments)
+    fcPartitionNetwork.addField(fieldPartitionCore, "SHORT")
+    fcPartitionNetwork.setValues(fieldPartitionCore, np.isin(arraySegments, arrayCore).astype(int).tolist())
+    fcPartitionValleyBottom = fcValleyBottom.subset(STRtree(gis_tools.geometry_array(fcValleyBottom)).query(gExtent, predicate="intersects"))
+    fcPartitionChannel = fcChannel.subset(STRtree(gis_tools.geometry_array(fcChannel)).query(gExtent, predicate="intersects"))
+    fcPartitionRaw, fcPartitionMargins = run_partition(("Incremental",
+                                                        fcPartitionNetwork,
+                                                        fcPartitionValleyBottom,
+                                                        fcPartitionChannel,
+                                                        partition_workspace(scratchWorkspace, "Incremental"),
+                                                        boolIntegratedWidthAttributes,
+                                                        gExtent,
+                                                        cacheWorkspace))
+    fcPartitionRaw.deleteField(fieldPartitionCore)
+
+    # Patch the outputs: rows and margins are owned by their nearest network segment
+    setCore = set(arrayCore.tolist())
+    arrayRawOwner = treeNetwork.nearest(shapely.line_interpolate_point(gis_tools.geometry_array(fcRawConfiningState), 0.5, normalized=True))
+    fcRawConfiningState = fcRawConfiningState.subset([i for i, owner in enumerate(arrayRawOwner) if owner not in setCore])
+    for i in range(len(fcPartitionRaw)):
+        fcRawConfiningState.addRow(fcPartitionRaw.geometries[i], fcPartitionRaw.getRow(i))
+
+    fcMargins = gis_tools.read_dataset(fcOutputConfiningMargins)
+    listMargins = []
+    if len(fcMargins) > 0:
+        arrayOwner = treeNetwork.nearest(shapely.line_interpolate_point(gis_tools.geometry_array(fcMargins), 0.5, normalized=True))
+        listMargins.extend((gMargin, strBankSide) for gMargin, strBankSide, owner in
+                           zip(fcMargins.geometries, fcMargins.getValues("BankSide"), arrayOwner)
+                           if owner not in setCore)
+    listMargins.extend(zip(fcPartitionMargins.geometries, fcPartitionMargins.getValues("BankSide")))
+
+    gis_tools.write_dataset(fcRawConfiningState, fcOutputRawConfiningState)
+    gis_tools.write_dataset(merge_margins(listMargins, fcNetwork.crs), fcOutputConfiningMargins)
+    record_inputs(cacheRuns, strKey, strNetworkHash, fcValleyBottom, fcChannel)
+
+    return fcPartitionRaw
+
+
+def changed_area(fcPrevious, fcCurrent):
+    """Return the area that differs between two versions of a polygon dataset.
+
+    Unchanged polygons are matched by their normalized WKB, and the changed area is the symmetric
+    difference of the removed and added polygons, so an edit to a large polygon only marks the
+    edited part.
+    """
+
+    arrayPrevious = shapely.normalize(gis_tools.geometry_array(fcPrevious))
+    arrayCurrent = shapely.normalize(gis_tools.geometry_array(fcCurrent))
+    arrayPreviousWKB = shapely.to_wkb(arrayPrevious)
+    arrayCurrentWKB = shapely.to_wkb(arrayCurrent)
+    gRemoved = shapely.union_all(arrayPrevious[~np.isin(arrayPreviousWKB, arrayCurrentWKB)])
+    gAdded = shapely.union_all(arrayCurrent[~np.isin(arrayCurrentWKB, arrayPreviousWKB)])
+    return shapely.symmetric_difference(gRemoved, gAdded)
+
+
+def record_inputs(cacheRuns, strKey, strNetworkHash, fcValleyBottom, fcChannel):
+    """Record the inputs of a run in the cache for the next incremental run."""
+
+    cacheRuns.invalidate(strKey)
+    strEntry = cacheRuns.create(strKey)
+    gis_tools.write_dataset(fcValleyBottom, os.path.join(strEntry, "ValleyBottom" + gis_tools.intermediateExtension))
+    gis_tools.write_dataset(fcChannel, os.path.join(strEntry, "Channel" + gis_tools.intermediateExtension))
+    with open(os.path.join(strEntry, "inputs.json"), "w") as fileInputs:
+        json.dump({"network": strNetworkHash}, fileInputs)
+    cacheRuns.commit(strKey)
+
+    return
+
+
+def integrated_width(fcInLines, gChannel, gValleyBottom, dblPointDensity=5.0, cacheWorkspace=None):
+    """Return a copy of the lines with the integrated channel and valley widths and their ratio.
+
+    The valley bottom is divided once into the region nearest each line, and the channel area
+    of a line is the part of its region inside the channel. Both areas are keyed by the line
+    index, so no spatial join is needed.
+    """
+
+    fcLines = gis_tools.read_dataset(fcInLines).copy()
+    arrayLines = gis_tools.geometry_array(fcLines)
+    arrayLength = shapely.length(arrayLines)
+
+    def valley_segments():
+        arrayIndex, arraySegmentPolygons = DividePolygonBySegment.segment_regions(arrayLines, gValleyBottom, dblPointDensity)
+        fcValleySegments = gis_tools.FeatureClass("Polygon", fcLines.crs)
+        fcValleySegments.addField("JOIN_FID", "LONG")
+        for joinFID, gSegmentPolygon in zip(arrayIndex, arraySegmentPolygons):
+            if not shapely.is_empty(gSegmentPolygon):
+                fcValleySegments.addRow(gSegmentPolygon, {"JOIN_FID": int(joinFID)})
+        return fcValleySegments
+
+    # The valley segments do not depend on the channel, so they are reused across runs
+    fcValleySegments = gis_tools.cached_dataset(cacheWorkspace, "ValleySegments", [fcLines, gValleyBottom], [dblPointDensity], valley_segments)
+    arraySegmentIndex = np.array(fcValleySegments.getValues("JOIN_FID"), dtype=np.int64)
+    arrayRegions = gis_tools.geometry_array(fcValleySegments)
+    arrayValleyArea = np.zeros(len(fcLines))
+    arrayChannelArea = np.zeros(len(fcLines))
+    arrayValleyArea[arraySegmentIndex] = shapely.area(arrayRegions)
+    arrayChannelArea[arraySegmentIndex] = shapely.area(shapely.intersection(arrayRegions, gChannel))
+
+    arrayIWChannel, arrayIWValley, arrayIWRatio = array_functions.integrated_widths(arrayLength, arrayChannelArea, arrayValleyArea)
+
+    for FieldName, arrayValues in zip(listIntegratedWidthFields, [arrayLength,
+                                                                  arrayChannelArea,
+                                                                  arrayIWChannel,
+                                                                  arrayValleyArea,
+                                                                  arrayIWValley,
+                                                                  arrayIWRatio]):
+        fieldValue = gis_tools.resetField(fcLines, FieldName, "DOUBLE")
+        fcLines.setValues(fieldValue, [array_functions.nan_to_none(value) for value in arrayValues])
+
+    return fcLines
+
+
+if __name__ == "__main__":
+
+    main(sys.argv[1],
+         sys.argv[2],
+         sys.argv[3],
+         sys.argv[4],
+         sys.argv[5],
+         sys.argv[6],
+         sys.argv[7].lower() == "true" if len(sys.argv) > 7 else False,
+         sys.argv[8] if len(sys.argv) > 8 else None,
+         sys.argv[9].lower() == "true" if len(sys.argv) > 9 else False)
@@ -0,0 +1,121 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Divide Polygon By Segments Tool (GEOS Backend)                 #
+# Purpose:     Divides a channel or valley polygon by centerline segments.    #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import sys
+
+import numpy as np
+import shapely
+
+from . import gis_tools
+
+
+# # Main Function # #
+def main(fcInputCenterline,
+         fcInputPolygon,
+         fcSegmentedPolygons,
+         workspaceTemp,
+         dblPointDensity=10.0,
+         dblJunctionBuffer=120.00,
+         fieldSegmentID=None):
+    """Divide a polygon into the Voronoi regions of the centerline segments.
+
+    Each densified centerline vertex is tagged with the index of its segment, so the
+    Voronoi cells are dissolved by tag and clipped to the polygon once, without joining
+    the cells back to the centerline. dblJunctionBuffer is kept for compatibility; the
+    cells of the vertices nearest a junction already divide it between the segments.
+    JOIN_FID is the centerline index, or the value of fieldSegmentID if given.
+    """
+
+    gis_tools.AddMessage("GNAT Divide Polygon By Segment Tool")
+    gis_tools.AddMessage("GNAT DPS: Saving Polygon Results to: " + str(fcSegmentedPolygons))
+
+    fcCenterline = gis_tools.read_dataset(fcInputCenterline)
+    fcPolygon = gis_tools.read_dataset(fcInputPolygon)
+
+    arrayCenterlines = gis_tools.geometry_array(fcCenterline)
+    gPolygon = shapely.union_all(gis_tools.geometry_array(fcPolygon))
+
+    arraySegmentIndex, arraySegmentPolygons = segment_regions(arrayCenterlines, gPolygon, float(dblPointDensity))
+
+    listJoinFID = arraySegmentIndex.tolist()
+    if fieldSegmentID:
+        listSegmentID = fcCenterline.getValues(fieldSegmentID)
+        listJoinFID = [listSegmentID[index] for index in listJoinFID]
+
+    fcOutput = gis_tools.FeatureClass("Polygon", fcPolygon.crs)
+    fcOutput.addField("JOIN_FID", "LONG")
+    for joinFID, gSegmentPolygon in zip(listJoinFID, arraySegmentPolygons):
+        if not shapely.is_empty(gSegmentPolygon):
+            fcOutput.addRow(gSegmentPolygon, {"JOIN_FID": joinFID})
+
+    gis_tools.write_dataset(fcOutput, fcSegmentedPolygons)
+
+    gis_tools.AddMessage("GNAT DPS: Tool Complete.")
+    return
+
+
+def segment_regions(arrayCenterlines, gPolygon, dblPointDensity=10.0):
+    """Return (arraySegmentIndex, arraySegmentPolygons): the part of gPolygon nearest each centerline."""
+
+    shapely.prepare(gPolygon)
+
+    ## Build Thiessan Polygons
+    gis_tools.AddMessage("GNAT DPS: Building Thiessan Polygons")
+    arrayThiessanCells, arraySegmentTag = segment_voronoi(arrayCenterlines, dblPointDensity, gPolygon.envelope)
+
+    gis_tools.AddMessage("GNAT DPS: Dissolve Thiessan Polygons By Segment")
+    arraySegmentIndex, arraySegmentPolygons = dissolve_tags(arrayThiessanCells, arraySegmentTag)
+
+    return arraySegmentIndex, shapely.intersection(arraySegmentPolygons, gPolygon)
+
+
+def segment_voronoi(arrayCenterlines, dblPointDensity, gExtent, dblGridSize=0.01):
+    """Return the Voronoi cells of the densified centerline vertices and the segment index of each cell.
+
+    Vertices shared by several segments (junctions) are kept once, tagged with the first segment.
+    """
+
+    arrayDensified = shapely.segmentize(arrayCenterlines, dblPointDensity)
+    arrayCoordinates, arrayTag = shapely.get_coordinates(arrayDensified, return_index=True)
+    # Near-duplicate vertices (i.e. segment ends at junctions) produce degenerate cells, so
+    # vertices are snapped to dblGridSize before removing duplicates.
+    arrayCoordinates = np.round(arrayCoordinates / dblGridSize) * dblGridSize
+    arrayCoordinates, arrayFirst = np.unique(arrayCoordinates, axis=0, return_index=True)
+    arrayTag = arrayTag[arrayFirst]
+
+    gThiessanPoly = shapely.voronoi_polygons(shapely.multipoints(arrayCoordinates), extend_to=gExtent, ordered=True)
+    return shapely.get_parts(gThiessanPoly), arrayTag
+
+
+def dissolve_tags(arrayCells, arrayTag):
+    """Dissolve Voronoi cells by tag. Returns (arrayUniqueTag, arrayDissolved)."""
+
+    arrayOrder = np.argsort(arrayTag, kind="mergesort")
+    arrayUniqueTag, arrayGroupStart = np.unique(arrayTag[arrayOrder], return_index=True)
+    listDissolved = [shapely.union_all(arrayGroup) for arrayGroup in np.split(arrayCells[arrayOrder], arrayGroupStart[1:])]
+    return arrayUniqueTag, np.array(listDissolved, dtype=object)
+
+
+# # Run as Script # #
+if __name__ == "__main__":
+
+    main(sys.argv[1],
+         sys.argv[2],
+         sys.argv[3],
+         sys.argv[4],
+         float(sys.argv[5]),
+         float(sys.argv[6]))
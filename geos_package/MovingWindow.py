@@ -0,0 +1,198 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Moving Window Analysis for Line Network (GEOS Backend)         #
+# Purpose:     Run a generic moving window analysis for a variable along a    #
+#              line network.                                                  #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.ops import substring
+
+from common_package import array_functions
+from common_package import profiling
+from . import gis_tools
+
+
+# # Main Function # #
+def main(
+    fcLineNetwork,
+    fieldStreamRouteID,
+    fieldConfinement,
+    fieldConstriction,
+    strSeedDistance,
+    inputliststrWindowSize,
+    outputWorkspace,
+    tempWorkspace=gis_tools.scratchWorkspace,
+    boolProfile=False):
+    """Perform a Moving Window Analysis on a Line Network."""
+
+    profiler = profiling.Profiler("Moving Window", tempWorkspace, boolProfile, gis_tools.feature_count)
+    liststrWindowSize = inputliststrWindowSize.split(";")
+    listdblWindowSize = [float(strWindowSize) for strWindowSize in liststrWindowSize]
+    dblMaxWindowSize = max(listdblWindowSize)
+
+    fcNetwork = gis_tools.read_dataset(fcLineNetwork)
+    arrayNetwork = gis_tools.geometry_array(fcNetwork)
+    arrayRouteID = np.array(fcNetwork.getValues(fieldStreamRouteID), dtype=object)
+    arrayConfinement = np.array([value or 0 for value in fcNetwork.getValues(fieldConfinement)], dtype=float)
+    arrayConstriction = np.array([value or 0 for value in fcNetwork.getValues(fieldConstriction)], dtype=float)
+
+    # Dissolve by route. A route ID may have more than one part if the route is discontinuous.
+    with profiler.stage("Dissolve", [fcNetwork]) as stage:
+        dictRoutes = OrderedDict()
+        for valueRouteID in gis_tools.unique_values(fcNetwork, fieldStreamRouteID):
+            arrayRouteSegments = arrayNetwork[arrayRouteID == valueRouteID]
+            gRoute = shapely.line_merge(shapely.union_all(shapely.get_parts(arrayRouteSegments)))
+            dictRoutes[valueRouteID] = shapely.get_parts(gRoute)
+        stage.out(list(dictRoutes.values()))
+
+    fcSeedPoints = gis_tools.FeatureClass("Point", fcNetwork.crs)
+    fcSeedPoints.addField("RouteID", "LONG")
+    fcSeedPoints.addField("SeedID", "LONG")
+    listConfinementFields = [fcSeedPoints.addField("Seg" + strWindowSize, "DOUBLE") for strWindowSize in liststrWindowSize]
+    listConstrictionFields = [fcSeedPoints.addField("Seg" + strWindowSize + "_1", "DOUBLE") for strWindowSize in liststrWindowSize]
+
+    fcWindowLines = gis_tools.FeatureClass("LineString", fcNetwork.crs)
+    fcWindowLines.addField("RouteID", "LONG")
+    fcWindowLines.addField("SeedID", "LONG")
+    fcWindowLines.addField("Seg", "DOUBLE")
+
+    intSeedID = 0
+    with profiler.stage("Windows", list(dictRoutes.values())) as stage:
+        for valueRouteID, arrayParts in dictRoutes.items():
+            arraySegmentIndex = np.flatnonzero(arrayRouteID == valueRouteID)
+            arraySegments = arrayNetwork[arraySegmentIndex]
+
+            # Measure each network segment along its route part
+            treeParts = STRtree(arrayParts)
+            arrayPartIndex = treeParts.nearest(shapely.line_interpolate_point(arraySegments, 0.5, normalized=True))
+            arrayFirstPoints, arrayLastPoints = gis_tools.line_end_points(arraySegments)
+            arrayStart = shapely.line_locate_point(arrayParts[arrayPartIndex], arrayFirstPoints)
+            arrayEnd = shapely.line_locate_point(arrayParts[arrayPartIndex], arrayLastPoints)
+
+            for iPart, gRoute in enumerate(arrayParts):
+                arraySeedPositions = array_functions.seed_positions(gRoute.length, float(strSeedDistance), dblMaxWindowSize)
+                if len(arraySeedPositions) == 0:
+                    continue
+
+                boolPart = arrayPartIndex == iPart
+                dictConfinement = {}
+                dictConstriction = {}
+                for dblWindowSize in listdblWindowSize:
+                    arrayWindowStart = arraySeedPositions - dblWindowSize / 2
+                    arrayWindowEnd = arraySeedPositions + dblWindowSize / 2
+                    dictConfinement[dblWindowSize] = array_functions.window_fractions(arrayStart[boolPart],
+                                                                                      arrayEnd[boolPart],
+                                                                                      arrayConfinement[arraySegmentIndex][boolPart],
+                                                                                      arrayWindowStart,
+                                                                                      arrayWindowEnd)
+                    dictConstriction[dblWindowSize] = array_functions.window_fractions(arrayStart[boolPart],
+                                                                                       arrayEnd[boolPart],
+                                                                                       arrayConstriction[arraySegmentIndex][boolPart],
+                                                                                       arrayWindowStart,
+                                                                                       arrayWindowEnd)
+
+                arraySeedPoints = shapely.line_interpolate_point(gRoute, arraySeedPositions)
+                for iSeed, dblSeedPointPosition in enumerate(arraySeedPositions):
+                    dictValues = {"RouteID": valueRouteID, "SeedID": intSeedID}
+                    for dblWindowSize, fieldConfinementValue, fieldConstrictionValue in zip(listdblWindowSize, listConfinementFields, listConstrictionFields):
+                        dictValues[fieldConfinementValue] = array_functions.nan_to_none(dictConfinement[dblWindowSize][iSeed])
+                        dictValues[fieldConstrictionValue] = array_functions.nan_to_none(dictConstriction[dblWindowSize][iSeed])
+                    fcSeedPoints.addRow(arraySeedPoints[iSeed], dictValues)
+
+                    for dblWindowSize in listdblWindowSize:
+                        gWindow = substring(gRoute, dblSeedPointPosition - dblWindowSize / 2, dblSeedPointPosition + dblWindowSize / 2)
+                        fcWindowLines.addRow(gWindow, {"RouteID": valueRouteID, "SeedID": intSeedID, "Seg": dblWindowSize})
+                    intSeedID = intSeedID + 1
+        stage.out([fcSeedPoints, fcWindowLines])
+
+    # Manage Outputs
+    with profiler.stage("Final Output", [fcSeedPoints, fcWindowLines]) as stage:
+        gis_tools.write_dataset(fcSeedPoints, gis_tools.newGISDataset(outputWorkspace, "MovingWindowSeedPoints"))
+        gis_tools.write_dataset(fcWindowLines, gis_tools.newGISDataset(outputWorkspace, "MovingWindowSegments"))
+        stage.out([fcSeedPoints, fcWindowLines])
+
+    profiler.write(outputWorkspace, OrderedDict([("LineNetwork", fcLineNetwork),
+                                                 ("SeedDistance", strSeedDistance),
+                                                 ("WindowSizes", inputliststrWindowSize)]))
+
+    return
+
+
+def incremental(
+    fcLineNetwork,
+    fieldStreamRouteID,
+    fieldConfinement,
+    fieldConstriction,
+    strSeedDistance,
+    inputliststrWindowSize,
+    outputWorkspace,
+    listRouteIDs,
+    tempWorkspace=gis_tools.scratchWorkspace):
+    """Recompute the moving window of the routes in listRouteIDs and patch them into the existing outputs.
+
+    Each window lies on a single route, so the windows of the other routes are unchanged. The new
+    seed points are numbered after the existing ones.
+    """
+
+    listOutputNames = ["MovingWindowSeedPoints", "MovingWindowSegments"]
+    listOutputs = [gis_tools.getGISDataset(outputWorkspace, strName + gis_tools.outputExtension) or gis_tools.getGISDataset(outputWorkspace, strName)
+                   for strName in listOutputNames]
+    if None in listOutputs:
+        return main(fcLineNetwork, fieldStreamRouteID, fieldConfinement, fieldConstriction, strSeedDistance,
+                    inputliststrWindowSize, outputWorkspace, tempWorkspace)
+
+    setRouteIDs = set(listRouteIDs)
+    fcNetwork = gis_tools.read_dataset(fcLineNetwork)
+    fcRouteNetwork = fcNetwork.subset([i for i, valueRouteID in enumerate(fcNetwork.getValues(fieldStreamRouteID))
+                                       if valueRouteID in setRouteIDs])
+    gis_tools.AddMessage("Updating the moving window of " + str(len(setRouteIDs)) + " routes...")
+    main(fcRouteNetwork, fieldStreamRouteID, fieldConfinement, fieldConstriction, strSeedDistance,
+         inputliststrWindowSize, "in_memory", tempWorkspace)
+
+    listSeedIDs = gis_tools.read_dataset(listOutputs[0]).getValues("SeedID")
+    intSeedOffset = max(listSeedIDs) + 1 if listSeedIDs else 0
+
+    for strName, strOutput in zip(listOutputNames, listOutputs):
+        fcOutput = gis_tools.read_dataset(strOutput)
+        fcPatched = fcOutput.subset([i for i, valueRouteID in enumerate(fcOutput.getValues("RouteID"))
+                                     if valueRouteID not in setRouteIDs])
+        strNewDataset = gis_tools.getGISDataset("in_memory", strName)
+        fcNew = gis_tools.read_dataset(strNewDataset)
+        for i in range(len(fcNew)):
+            dictValues = fcNew.getRow(i)
+            dictValues["SeedID"] = dictValues["SeedID"] + intSeedOffset
+            fcPatched.addRow(fcNew.geometries[i], dictValues)
+        gis_tools.resetData(strNewDataset)
+        gis_tools.write_dataset(fcPatched, strOutput)
+
+    return
+
+
+if __name__ == "__main__":
+
+    main(
+        sys.argv[1],
+        sys.argv[2],
+        sys.argv[3],
+        sys.argv[4],
+        sys.argv[5],
+        sys.argv[6],
+        sys.argv[7],
+        sys.argv[8])
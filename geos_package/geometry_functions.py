@@ -0,0 +1,189 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        Geometry Functions Module (GEOS Backend)                       #
+# Purpose:     Support components for GNAT using Shapely                      #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import math
+from collections import Counter
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, Point
+
+from common_package import array_functions
+from . import gis_tools
+
+
+def rotateFeatures(inFeatureClass, outFeatureClass, angle=0, units="DEGREES", anchor="CENTROID"):
+
+    fcIn = gis_tools.read_dataset(inFeatureClass)
+    fcOut = gis_tools.read_dataset(outFeatureClass) if gis_tools.exists(outFeatureClass) else None
+    if fcOut is None:
+        fcOut = gis_tools.FeatureClass("LineString", fcIn.crs)
+        fcOut.addField("CandidateID", "LONG")
+        fcOut.addField("Angle", "DOUBLE")
+
+    arrayFeatures = gis_tools.geometry_array(fcIn)
+    arrayCentroids = shapely.get_coordinates(shapely.centroid(arrayFeatures))
+    for gFeature, (xc, yc), valueCandidateID in zip(arrayFeatures, arrayCentroids, fcIn.getValues("CandidateID")):
+        listParts = [array_functions.rotate_coordinates(shapely.get_coordinates(part), xc, yc, angle, units)
+                     for part in shapely.get_parts(gFeature)]
+        if len(listParts) == 1:
+            gRotated = shapely.linestrings(listParts[0])
+        else:
+            gRotated = shapely.multilinestrings(listParts)
+        fcOut.addRow(gRotated, {"CandidateID": valueCandidateID, "Angle": angle})
+
+    if not isinstance(outFeatureClass, gis_tools.FeatureClass):
+        gis_tools.write_dataset(fcOut, outFeatureClass)
+
+    return
+
+
+def rotatePoint(x, y, xc=0, yc=0, angle=0, units="DEGREES"):
+    x = x - xc
+    y = y - yc
+
+    angle = angle * -1
+    if units == "DEGREES":
+        angle = math.radians(angle)
+
+    xr = (x * math.cos(angle)) - (y * math.sin(angle)) + xc
+    yr = (x * math.sin(angle)) + (y * math.cos(angle)) + yc
+
+    return xr, yr
+
+
+def calculatePerpendicularAngles(inputFeatureClass, outputFCLines, angleField, maxDistance, fieldID):
+
+    fcPoints = gis_tools.read_dataset(inputFeatureClass)
+    fcLines = gis_tools.FeatureClass("LineString", fcPoints.crs)
+    fcLines.addField(fieldID, fcPoints.fields[fieldID][0], fcPoints.fields[fieldID][1])
+
+    dblHalfDistance = maxDistance / 2.0
+    for gPoint, dblAngle, valueID in fcPoints.rows(["SHAPE@", angleField, fieldID]):
+        # Bearings are measured clockwise from north, so the perpendicular is (angle - 90) * -1 and its opposite.
+        dblAngle0 = math.radians(90.0 - (dblAngle - 90.0) * -1.0)
+        dblAngle180 = dblAngle0 + math.pi
+        fcLines.addRow(LineString([(gPoint.x + dblHalfDistance * math.cos(dblAngle180), gPoint.y + dblHalfDistance * math.sin(dblAngle180)),
+                                   (gPoint.x, gPoint.y),
+                                   (gPoint.x + dblHalfDistance * math.cos(dblAngle0), gPoint.y + dblHalfDistance * math.sin(dblAngle0))]),
+                       {fieldID: valueID})
+
+    gis_tools.write_dataset(fcLines, outputFCLines)
+
+    return
+
+
+def findSegmentJunctions(inputFCCenterline, strOutputJunctionPointsFC, strType="TRIBS"):
+
+    fcCenterline = gis_tools.read_dataset(inputFCCenterline)
+    arrayLines = gis_tools.geometry_array(fcCenterline)
+
+    # Dangles are line ends that do not touch any other line end.
+    listSegmentEnds = []
+    for gLine in shapely.get_parts(arrayLines):
+        coords = shapely.get_coordinates(gLine)
+        listSegmentEnds.extend([tuple(coords[0]), tuple(coords[-1])])
+    countEnds = Counter(listSegmentEnds)
+    setDangles = set(coord for coord, count in countEnds.items() if count == 1)
+
+    listJunctions = []
+    if strType == "SEGMENTS" or strType == "ALL":
+        listJunctions.extend(coord for coord in countEnds if coord not in setDangles)
+
+    if strType == "TRIBS" or strType == "ALL":
+        gMerged = shapely.line_merge(shapely.union_all(arrayLines))
+        for gLine in shapely.get_parts(gMerged):
+            coords = shapely.get_coordinates(gLine)
+            for coord in (tuple(coords[0]), tuple(coords[-1])):
+                if coord not in setDangles:
+                    listJunctions.append(coord)
+
+    if strType == "ALL":
+        listJunctions.extend(setDangles)
+
+    fcJunctions = gis_tools.FeatureClass("Point", fcCenterline.crs)
+    for coord in listJunctions:
+        fcJunctions.addRow(Point(coord))
+    gis_tools.write_dataset(fcJunctions, strOutputJunctionPointsFC)
+
+    return strOutputJunctionPointsFC
+
+
+def pointsAlongLine(fcInputLineNetwork,
+                    dblDistance,
+                    fcOutputPoints):
+    """Generate Points along a line network.
+
+    Generate a series of point along a line network based on a specified
+    distance or specified number of points (equally spaced). If set distance
+    is used, the last section (remainder) will be smaller than the set
+    distance. For this reason, line direction is important.
+
+    Points at the ends of the lines are also included.
+
+    Arguments:
+    fcInputLineNetwork -- line network to generate points along. This should be
+    dissolved as needed, since this tool will generate a new set of points per
+    line feature.
+    inDistanceOrNumberofPoints -- the distance or number of points to use.
+    """
+
+    gis_tools.resetData(fcOutputPoints)
+
+    fcLines = gis_tools.read_dataset(fcInputLineNetwork)
+    fcPoints = gis_tools.FeatureClass("Point", fcLines.crs)
+    fcPoints.addField("LineID", "LONG")
+    fcPoints.addField("Position", "LONG")
+
+    arrayAttributes = []
+    for lineID, gLine in enumerate(gis_tools.geometry_array(fcLines)):
+        listParts = [shapely.get_coordinates(part) for part in shapely.get_parts(gLine)]
+        arrayStations, arrayPosition = array_functions.line_stations(listParts, dblDistance)
+        for gPoint, pointPosition in zip(shapely.points(arrayStations), arrayPosition):
+            fcPoints.addRow(gPoint, {"LineID": lineID, "Position": int(pointPosition)})
+            arrayAttributes.append([lineID, int(pointPosition)])
+
+    gis_tools.write_dataset(fcPoints, fcOutputPoints)
+
+    return arrayAttributes
+
+
+def changeStartingVertex(fcInputPoints,
+                         fcInputPolygons,
+                         dblTolerance=0.001):
+    """Move the starting vertex of each polygon to the vertex that matches an input point."""
+
+    fcPoints = gis_tools.read_dataset(fcInputPoints)
+    fcPolygons = gis_tools.read_dataset(fcInputPolygons)
+
+    setPointKeys = set(array_functions.vertex_keys(shapely.get_coordinates(gis_tools.geometry_array(fcPoints)), dblTolerance))
+
+    arrayPolygons = gis_tools.geometry_array(fcPolygons)
+    arrayRings = shapely.get_exterior_ring(shapely.get_geometry(arrayPolygons, 0))
+    arrayCoordinates, arrayRingIndex = shapely.get_coordinates(arrayRings, return_index=True)
+    arrayRingBreaks = np.flatnonzero(np.diff(arrayRingIndex)) + 1
+
+    for index, arrayRing in zip(np.unique(arrayRingIndex), np.split(arrayCoordinates, arrayRingBreaks)):
+        arrayRing = arrayRing[:-1]
+        iStart = array_functions.ring_start(arrayRing, setPointKeys, dblTolerance)
+        if iStart != 0:
+            fcPolygons.geometries[index] = shapely.polygons(np.roll(arrayRing, -iStart, axis=0))
+
+    if not isinstance(fcInputPolygons, gis_tools.FeatureClass):
+        gis_tools.write_dataset(fcPolygons, fcInputPolygons)
+
+    return
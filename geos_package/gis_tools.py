@@ -0,0 +1,609 @@
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+# Name:        GIS Tools Module (GEOS Backend)                                #
+# Purpose:     Support components for the Confinement Toolbox using Shapely,  #
+#              NumPy and Fiona in place of arcpy.                             #
+#                                                                             #
+# Author:      South Fork Research, Inc                                       #
+#              Seattle, Washington                                            #
+#                                                                             #
+# Created:     2026-Oct-18                                                    #
+# Version:     1.0                                                            #
+# Modified:    2026-Oct-18                                                    #
+#                                                                             #
+# Copyright:   (c) South Fork Research 2026                                   #
+#                                                                             #
+# # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
+#!/usr/bin/env python
+
+# # Import Modules # #
+import os
+import glob
+import uuid
+import shutil
+import hashlib
+import tempfile
+import logging
+from collections import OrderedDict
+
+import fiona
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+from common_package import cache
+
+log = logging.getLogger("confinement")
+
+scratchWorkspace = "in_memory"
+
+# Datasets in the "in_memory" workspace (and layers) are held here, keyed by dataset name.
+dictMemoryWorkspace = {}
+
+dictDrivers = {".shp": "ESRI Shapefile",
+               ".gpkg": "GPKG",
+               ".fgb": "FlatGeobuf",
+               ".geojson": "GeoJSON"}
+
+# Layer creation options: GeoPackage and FlatGeobuf outputs are written with their spatial index.
+dictCreationOptions = {"GPKG": {"SPATIAL_INDEX": "YES"},
+                       "FlatGeobuf": {"SPATIAL_INDEX": "YES"}}
+
+# Extensions of new datasets in a folder workspace. Intermediates are FlatGeobuf: field names are not
+# truncated and the packed spatial index lets a later step read only the features in its extent.
+outputExtension = ".shp"
+intermediateExtension = ".fgb"
+
+# Features per writerecords call (one transaction per batch for a GeoPackage).
+intWriteBatch = 10000
+
+# Temp datasets of a WorkspaceManager are staged in memory until this many (estimated) bytes are held.
+intScratchMemoryBytes = 256 * 1024 ** 2
+boolKeepScratch = False
+
+dictFieldTypes = {"TEXT": "str",
+                  "SHORT": "int32",
+                  "LONG": "int",
+                  "FLOAT": "float",
+                  "DOUBLE": "float"}
+
+
+# # Messages # #
+def AddMessage(message):
+    log.info(message)
+
+
+def AddWarning(message):
+    log.warning(message)
+
+
+# # Feature Class # #
+class FeatureClass(object):
+    """In memory feature class: a list of shapely geometries and a column of values per field."""
+
+    def __init__(self, geometryType, crs=None):
+
+        self.geometryType = geometryType
+        self.crs = crs
+        self.fields = OrderedDict()
+        self.geometries = []
+        self.attributes = OrderedDict()
+        return
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def addField(self, FieldName, FieldType, TextLength=0, defaultValue=None):
+        self.fields[FieldName] = (FieldType, TextLength)
+        self.attributes[FieldName] = [defaultValue] * len(self.geometries)
+        return FieldName
+
+    def deleteField(self, FieldName):
+        if FieldName in self.fields:
+            del self.fields[FieldName]
+            del self.attributes[FieldName]
+        return
+
+    def hasField(self, FieldName):
+        return FieldName in self.fields
+
+    def addRow(self, geometry, dictValues=None):
+        dictValues = dictValues or {}
+        self.geometries.append(geometry)
+        for FieldName in self.fields:
+            self.attributes[FieldName].append(dictValues.get(FieldName))
+        return len(self.geometries) - 1
+
+    def getValues(self, FieldName):
+        return self.attributes[FieldName]
+
+    def setValues(self, FieldName, listValues):
+        self.attributes[FieldName] = list(listValues)
+        return
+
+    def getRow(self, index):
+        return OrderedDict((FieldName, self.attributes[FieldName][index]) for FieldName in self.fields)
+
+    def rows(self, listFields):
+        """Iterate tuples of values, "SHAPE@" returns the geometry (like arcpy.da.SearchCursor)."""
+        listColumns = [self.geometries if FieldName == "SHAPE@" else self.attributes[FieldName] for FieldName in listFields]
+        return zip(*listColumns)
+
+    def copySchema(self):
+        fcNew = FeatureClass(self.geometryType, self.crs)
+        for FieldName, (FieldType, TextLength) in self.fields.items():
+            fcNew.addField(FieldName, FieldType, TextLength)
+        return fcNew
+
+    def subset(self, listIndex):
+        fcNew = self.copySchema()
+        fcNew.geometries = [self.geometries[i] for i in listIndex]
+        for FieldName in self.fields:
+            listValues = self.attributes[FieldName]
+            fcNew.attributes[FieldName] = [listValues[i] for i in listIndex]
+        return fcNew
+
+    def copy(self):
+        return self.subset(range(len(self.geometries)))
+
+
+class DatasetWriter(object):
+    """Write the rows of feature classes to a dataset in batches, as a tool produces them.
+
+    The fields and geometry type are those of fcSchema; other fields of the written rows are dropped.
+    The dataset is replaced when the writer is opened. Use as "with DatasetWriter(...) as writer:".
+    """
+
+    def __init__(self, outputDataset, fcSchema, strGeometryType=None):
+
+        self.outputDataset = outputDataset
+        self.fields = OrderedDict(fcSchema.fields)
+        self.geometryType = strGeometryType or fcSchema.geometryType
+        self.count = 0
+        self.dst = None
+        self.fcMemory = None
+
+        resetData(outputDataset)
+        if is_memory_dataset(outputDataset):
+            self.fcMemory = fcSchema.copySchema()
+            dictMemoryWorkspace[memory_key(outputDataset)] = self.fcMemory
+            return
+
+        path, layer = split_dataset(outputDataset)
+        strDriver = dictDrivers.get(os.path.splitext(path)[1].lower(), "ESRI Shapefile")
+
+        self.fieldNames = OrderedDict()
+        for FieldName in self.fields:
+            self.fieldNames[FieldName] = FieldName[:10] if strDriver == "ESRI Shapefile" else FieldName
+
+        properties = OrderedDict()
+        for FieldName, (FieldType, TextLength) in self.fields.items():
+            strType = dictFieldTypes.get(FieldType, "str")
+            if strType == "str":
+                strType = "str:" + str(TextLength or 254)
+            properties[self.fieldNames[FieldName]] = strType
+
+        schema = {"geometry": self.geometryType, "properties": properties}
+        self.dst = fiona.open(path, "w", driver=strDriver, schema=schema, crs=fcSchema.crs, layer=layer,
+                              **dictCreationOptions.get(strDriver, {}))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, fc):
+        """Append the rows of a FeatureClass."""
+
+        if self.fcMemory is not None:
+            for index, geometry in enumerate(fc.geometries):
+                self.fcMemory.addRow(geometry, fc.getRow(index))
+            self.count = self.count + len(fc)
+            return
+
+        listColumns = [fc.attributes[FieldName] if FieldName in fc.fields else [None] * len(fc) for FieldName in self.fields]
+        for intStart in range(0, len(fc), intWriteBatch):
+            listRecords = []
+            for index in range(intStart, min(intStart + intWriteBatch, len(fc))):
+                geometry = fc.geometries[index]
+                listRecords.append({"geometry": mapping(promote_geometry(geometry, self.geometryType)) if geometry is not None else None,
+                                    "properties": OrderedDict((self.fieldNames[FieldName], to_python(listValues[index]))
+                                                              for FieldName, listValues in zip(self.fields, listColumns))})
+            self.dst.writerecords(listRecords)
+        self.count = self.count + len(fc)
+
+    def close(self):
+        if self.dst is not None:
+            self.dst.close()
+            self.dst = None
+        return self.outputDataset
+
+
+class WorkspaceManager(object):
+    """Scratch datasets of one tool run.
+
+    Each run has its own namespace: memory dataset names are prefixed with the run id, and datasets on
+    disk go to a Run_<id> folder in the scratch workspace (or the system temp folder for in_memory), so
+    concurrent runs do not collide. Temp datasets are staged in memory until intMemoryBytes of them are
+    held, then spill to FlatGeobuf in the run folder. With boolKeep and a folder scratch workspace all
+    temp datasets are written to the run folder and kept. Use as "with WorkspaceManager(...) as manager:"
+    to delete the temp datasets when the run completes or fails (unless boolKeep).
+    """
+
+    def __init__(self, temporaryWorkspace, outputWorkspace=None, intMemoryBytes=None, boolKeep=None):
+
+        self.runID = run_id()
+        self.outputWorkspace = outputWorkspace
+        self.tempWorkspace = temporaryWorkspace
+        self.memoryBytes = intScratchMemoryBytes if intMemoryBytes is None else intMemoryBytes
+        self.keep = boolKeepScratch if boolKeep is None else boolKeep
+        self.listTempFiles = []
+        self.listOutputFiles = []
+        self.dictMemoryBytes = {}
+        self.peakDiskBytes = 0
+
+        if not temporaryWorkspace or is_memory_dataset(temporaryWorkspace):
+            self.diskWorkspace = os.path.join(tempfile.gettempdir(), "ConfinementScratch", "Run_" + self.runID)
+            self.keep = False
+        else:
+            self.diskWorkspace = os.path.join(temporaryWorkspace, "Run_" + self.runID)
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.clearTempWorkspace()
+        return False
+
+    def outputDataset(self, filename):
+
+        outputFileName = newGISDataset(self.outputWorkspace, filename)
+        self.listOutputFiles.append(outputFileName)
+
+        return outputFileName
+
+    def tempDataset(self, filename, fc=None):
+        """Return a new temp dataset, writing fc to it if given. Staged in memory unless the memory budget is used."""
+
+        intBytes = dataset_bytes(fc) if fc is not None else 0
+        if self.keep or sum(self.dictMemoryBytes.values()) + intBytes > self.memoryBytes:
+            if not os.path.isdir(self.diskWorkspace):
+                os.makedirs(self.diskWorkspace)
+            tempFileName = newGISDataset(self.diskWorkspace, filename, intermediateExtension)
+        else:
+            tempFileName = newGISDataset("in_memory", "R" + self.runID + "_" + filename)
+            self.dictMemoryBytes[tempFileName] = intBytes
+        self.listTempFiles.append(tempFileName)
+
+        if fc is not None:
+            write_dataset(fc, tempFileName)
+        return tempFileName
+
+    def usage(self):
+        """Return the number and (estimated) bytes of the temp datasets in memory and on disk."""
+
+        intDiskBytes = cache.folder_size(self.diskWorkspace) if os.path.isdir(self.diskWorkspace) else 0
+        self.peakDiskBytes = max(self.peakDiskBytes, intDiskBytes)
+        return OrderedDict([("MemoryDatasets", len(self.dictMemoryBytes)),
+                            ("MemoryBytes", sum(self.dictMemoryBytes.values())),
+                            ("DiskDatasets", len(self.listTempFiles) - len(self.dictMemoryBytes)),
+                            ("DiskBytes", intDiskBytes),
+                            ("PeakDiskBytes", self.peakDiskBytes)])
+
+    def report(self):
+        dictUsage = self.usage()
+        AddMessage("Scratch: " + str(dictUsage["MemoryDatasets"]) + " datasets in memory (" +
+                   str(round(dictUsage["MemoryBytes"] / 1048576.0, 1)) + " MB), " + str(dictUsage["DiskDatasets"]) +
+                   " on disk (" + str(round(dictUsage["DiskBytes"] / 1048576.0, 1)) + " MB)")
+        return dictUsage
+
+    def clearTempWorkspace(self):
+        """Delete the temp datasets of the run (the run folder is kept with boolKeep)."""
+
+        self.usage()
+        for tempFile in self.dictMemoryBytes:
+            resetData(tempFile)
+        self.dictMemoryBytes = {}
+        if self.keep:
+            self.listTempFiles = [tempFile for tempFile in self.listTempFiles if not is_memory_dataset(tempFile)]
+        else:
+            shutil.rmtree(self.diskWorkspace, ignore_errors=True)
+            self.listTempFiles = []
+
+        return
+
+
+# # Functions # #
+def run_id():
+    """Return a short id unique to a run (process id and a random part)."""
+
+    return str(os.getpid()) + "_" + uuid.uuid4().hex[:6]
+
+
+def dataset_bytes(fc):
+    """Estimate the memory held by a FeatureClass (or geometry array): 16 bytes a coordinate, 8 a value."""
+
+    if isinstance(fc, FeatureClass):
+        return int(shapely.get_num_coordinates(geometry_array(fc)).sum()) * 16 + len(fc) * len(fc.fields) * 8
+    return int(shapely.get_num_coordinates(np.asarray(fc, dtype=object)).sum()) * 16
+
+
+def is_memory_dataset(inputDataset):
+    return str(inputDataset).replace("\\", "/").split("/")[0].lower() in ("in_memory", "memory")
+
+
+def memory_key(inputDataset):
+    return "in_memory/" + str(inputDataset).replace("\\", "/").split("/", 1)[-1]
+
+
+def split_dataset(inputDataset):
+    """Return (path, layer) for a dataset. Datasets inside a GeoPackage are addressed as <file>.gpkg/<layer>."""
+    parent = os.path.dirname(inputDataset)
+    if os.path.splitext(parent)[1].lower() == ".gpkg":
+        return parent, os.path.basename(inputDataset)
+    return inputDataset, None
+
+
+def exists(inputDataset):
+    if isinstance(inputDataset, FeatureClass):
+        return True
+    if is_memory_dataset(inputDataset):
+        return memory_key(inputDataset) in dictMemoryWorkspace
+    path, layer = split_dataset(inputDataset)
+    if layer:
+        return os.path.exists(path) and layer in fiona.listlayers(path)
+    return os.path.exists(path)
+
+
+def resetData(inputDataset):
+    if is_memory_dataset(inputDataset):
+        dictMemoryWorkspace.pop(memory_key(inputDataset), None)
+        return
+
+    path, layer = split_dataset(inputDataset)
+    if layer:
+        if os.path.exists(path) and layer in fiona.listlayers(path):
+            fiona.remove(path, layer=layer)
+    elif os.path.splitext(path)[1].lower() == ".shp":
+        for sidecar in glob.glob(os.path.splitext(path)[0] + ".*"):
+            os.remove(sidecar)
+    elif os.path.exists(path):
+        os.remove(path)
+
+    return
+
+
+def newGISDataset(workspace, inputDatasetName, strExtension=None):
+    """ workspace = "LAYER", "in_memory", folder or gpkg
+
+    In a folder, a name without an extension is given strExtension (default outputExtension).
+    """
+
+    if workspace in ("LAYER", "layer", "Layer") or is_memory_dataset(workspace):
+        inputDataset = "in_memory/" + inputDatasetName
+    elif os.path.splitext(workspace)[1].lower() == ".gpkg":
+        inputDataset = os.path.join(workspace, os.path.splitext(inputDatasetName)[0])
+    elif os.path.splitext(inputDatasetName)[1]:
+        inputDataset = os.path.join(workspace, inputDatasetName)
+    else:
+        inputDataset = os.path.join(workspace, inputDatasetName + (strExtension or outputExtension))
+
+    resetData(inputDataset)
+
+    return inputDataset
+
+
+def getGISDataset(workspace, inputDatasetName):
+    if workspace in ("LAYER", "layer", "Layer") or is_memory_dataset(workspace):
+        inputDataset = "in_memory/" + inputDatasetName
+    else:
+        inputDataset = os.path.join(workspace, inputDatasetName)
+    if exists(inputDataset):
+        return inputDataset
+
+
+def read_dataset(inputDataset, bbox=None):
+    """Load a dataset (path, gpkg layer, in_memory name or FeatureClass) as a FeatureClass.
+
+    With a bbox (xmin, ymin, xmax, ymax) only the features intersecting it are loaded, using the spatial
+    index of GeoPackage and FlatGeobuf datasets.
+    """
+
+    if isinstance(inputDataset, FeatureClass) or is_memory_dataset(inputDataset):
+        fc = inputDataset if isinstance(inputDataset, FeatureClass) else dictMemoryWorkspace[memory_key(inputDataset)]
+        if bbox is None:
+            return fc
+        return fc.subset(np.flatnonzero(shapely.intersects(geometry_array(fc), shapely.box(*bbox))))
+
+    path, layer = split_dataset(inputDataset)
+    with fiona.open(path, layer=layer) as src:
+        fc = FeatureClass(src.schema["geometry"], src.crs)
+        for FieldName, strType in src.schema["properties"].items():
+            strBaseType = strType.split(":")[0]
+            if strBaseType == "str":
+                fc.addField(FieldName, "TEXT", int(strType.split(":")[1]) if ":" in strType else 254)
+            elif strBaseType in ("int", "int64"):
+                fc.addField(FieldName, "LONG")
+            elif strBaseType in ("int32", "int16"):
+                fc.addField(FieldName, "SHORT")
+            elif strBaseType == "float":
+                fc.addField(FieldName, "DOUBLE")
+            else:
+                fc.addField(FieldName, "TEXT", 254)
+        for feature in (src if bbox is None else src.filter(bbox=tuple(bbox))):
+            fc.addRow(shape(feature.geometry) if feature.geometry else None, dict(feature.properties))
+
+    return fc
+
+
+def write_dataset(fc, outputDataset):
+    """Save a FeatureClass to a dataset. Existing datasets are replaced."""
+
+    if is_memory_dataset(outputDataset):
+        resetData(outputDataset)
+        dictMemoryWorkspace[memory_key(outputDataset)] = fc
+        return outputDataset
+
+    with DatasetWriter(outputDataset, fc, schema_geometry_type(fc)) as writer:
+        writer.write(fc)
+
+    return outputDataset
+
+
+def schema_geometry_type(fc):
+    """Geometry type for the output schema, promoted to Multi* if any feature is multipart."""
+    return geometry_type(fc.geometries, fc.geometryType)
+
+
+def geometry_type(listGeometries, strDefaultType=None):
+    listTypes = set(geometry.geom_type for geometry in listGeometries if geometry is not None)
+    if not listTypes:
+        return strDefaultType
+    if len(listTypes) == 1:
+        return listTypes.pop()
+    strBase = sorted(listTypes, key=len)[0].replace("Multi", "")
+    return "Multi" + strBase
+
+
+def promote_geometry(geometry, strGeometryType):
+    """Wrap a single part geometry as Multi* when the schema geometry type is Multi*."""
+    if strGeometryType.startswith("Multi") and not geometry.geom_type.startswith("Multi"):
+        return getattr(shapely, strGeometryType.lower() + "s")([geometry])
+    return geometry
+
+
+def to_python(value):
+    """Convert numpy scalars to python values for writing."""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def resetField(inTable, FieldName, FieldType, TextLength=0):
+    """clear or create new field.  FieldType = TEXT, FLOAT, DOUBLE, SHORT, LONG, etc.
+
+    :return: str field name
+    """
+
+    fc = read_dataset(inTable)
+
+    if fc.hasField(FieldName):
+        if FieldType == "TEXT":
+            fc.setValues(FieldName, [""] * len(fc))
+        else:
+            fc.setValues(FieldName, [0] * len(fc))
+    else:
+        fc.addField(FieldName, FieldType, TextLength)
+
+    if not isinstance(inTable, FeatureClass) and not is_memory_dataset(inTable):
+        write_dataset(fc, inTable)
+
+    return str(FieldName)
+
+
+def addUniqueIDField(fcInputFeatureClass, fieldName):
+
+    fc = read_dataset(fcInputFeatureClass)
+    resetField(fc, fieldName, "LONG")
+    fc.setValues(fieldName, range(1, len(fc) + 1))
+
+    if not isinstance(fcInputFeatureClass, FeatureClass) and not is_memory_dataset(fcInputFeatureClass):
+        write_dataset(fc, fcInputFeatureClass)
+
+    return fieldName
+
+
+def unique_values(table, field):
+    """returns a sorted list of unique values in a field"""
+
+    return sorted(set(read_dataset(table).getValues(field)))
+
+
+def feature_count(inputDataset):
+    """Return the number of features in a dataset, feature class, geometry array or (multi part) geometry."""
+
+    if isinstance(inputDataset, shapely.Geometry):
+        return shapely.get_num_geometries(inputDataset)
+    if isinstance(inputDataset, (FeatureClass, list, tuple, dict, np.ndarray)):
+        return len(inputDataset)
+    return len(read_dataset(inputDataset))
+
+
+def dataset_hash(inputDataset):
+    """Return a hash of the geometry, attributes and coordinate system of a dataset, for cache keys."""
+
+    fc = read_dataset(inputDataset)
+    arrayGeometries = np.empty(len(fc), dtype=object)
+    arrayGeometries[:] = fc.geometries
+
+    hashDataset = hashlib.sha1(str(fc.crs).encode("utf-8"))
+    hashDataset.update(repr(list(fc.fields.items())).encode("utf-8"))
+    for wkbGeometry in shapely.to_wkb(arrayGeometries):
+        hashDataset.update(wkbGeometry or b"")
+    for FieldName in fc.fields:
+        hashDataset.update(repr(fc.attributes[FieldName]).encode("utf-8"))
+    return hashDataset.hexdigest()
+
+
+def cached_dataset(cacheWorkspace, strStep, listDatasets, listParameters, funcBuild):
+    """Return the FeatureClass built by funcBuild, reused from the cache when its inputs are unchanged.
+
+    The cache key is the hash of listDatasets (FeatureClasses or geometries) and listParameters.
+    Without a cache workspace funcBuild is always run.
+    """
+
+    if not cacheWorkspace:
+        return funcBuild()
+
+    listInputs = []
+    for inputDataset in listDatasets:
+        if isinstance(inputDataset, shapely.Geometry):
+            listInputs.append(hashlib.sha1(shapely.to_wkb(inputDataset)).hexdigest())
+        else:
+            listInputs.append(dataset_hash(inputDataset))
+
+    cacheProducts = cache.Cache(cacheWorkspace)
+    strKey = cacheProducts.key(strStep, *(listInputs + list(listParameters) + [intermediateExtension]))
+    strEntry = cacheProducts.get(strKey)
+    if strEntry:
+        AddMessage("Using cached " + strStep)
+        return read_dataset(os.path.join(strEntry, strStep + intermediateExtension))
+
+    fc = funcBuild()
+    write_dataset(fc, os.path.join(cacheProducts.create(strKey), strStep + intermediateExtension))
+    cacheProducts.commit(strKey)
+    return fc
+
+
+def geometry_array(fc):
+    """Return the geometries of a FeatureClass as a shapely-ready array with Z values dropped."""
+    arrayGeometries = np.empty(len(fc), dtype=object)
+    arrayGeometries[:] = fc.geometries
+    return shapely.force_2d(arrayGeometries)
+
+
+def line_end_points(arrayLines):
+    """Return (first points, last points) of each line, including multipart lines."""
+    arrayCoords, arrayIndex = shapely.get_coordinates(arrayLines, return_index=True)
+    arrayFirst = np.full((len(arrayLines), 2), np.nan)
+    arrayLast = np.full((len(arrayLines), 2), np.nan)
+    arrayLast[arrayIndex] = arrayCoords
+    arrayFirst[arrayIndex[::-1]] = arrayCoords[::-1]
+    return shapely.points(arrayFirst), shapely.points(arrayLast)
+
+
+def line_segments(arrayLines):
+    """Return the two point segments of the lines as an (n, 4) array of x0, y0, x1, y1 and the index of their line."""
+
+    arrayParts, arrayPartLine = shapely.get_parts(arrayLines, return_index=True)
+    arrayCoords, arrayIndex = shapely.get_coordinates(arrayParts, return_index=True)
+    boolSegment = arrayIndex[:-1] == arrayIndex[1:]
+    arraySegments = np.hstack([arrayCoords[:-1][boolSegment], arrayCoords[1:][boolSegment]])
+    return arraySegments, arrayPartLine[arrayIndex[:-1][boolSegment]]
+
+
+if __name__ == "__main__":
+    print("gis_tools.py is not an executable python script.")
@@ -0,0 +1,122 @@
+import math
+
+import numpy as np
+
+from common_package import array_functions
+
+
+def overlap(dblLow, dblHigh, dblStart, dblEnd):
+    return max(0.0, min(dblHigh, dblEnd) - max(dblLow, dblStart))
+
+
+def point_at(listXY, dblMeasure):
+    """Walk a line vertex by vertex to the point at a measure."""
+
+    dblWalked = 0.0
+    for (x0, y0), (x1, y1) in zip(listXY[:-1], listXY[1:]):
+        dblStep = math.hypot(x1 - x0, y1 - y0)
+        if dblStep > 0.0 and dblWalked + dblStep >= dblMeasure:
+            dblRatio = (dblMeasure - dblWalked) / dblStep
+            return (x0 + dblRatio * (x1 - x0), y0 + dblRatio * (y1 - y0))
+        dblWalked = dblWalked + dblStep
+    return tuple(listXY[-1])
+
+
+def line_length(listXY):
+    return sum(math.hypot(x1 - x0, y1 - y0) for (x0, y0), (x1, y1) in zip(listXY[:-1], listXY[1:]))
+
+
+# Segments of a route, digitized in both directions and overlapping, with their 0/1 flag
+listStart = [0.0, 30.0, 25.0, 80.0, 120.0]
+listEnd = [30.0, 10.0, 60.0, 100.0, 150.0]
+listFlag = [1, 0, 1, 1, 0]
+
+
+def test_interval_coverage():
+    listValue = [2.0, 1.0, 0.5, 3.0, 1.0]
+    arrayBreaks, arrayCumulative = array_functions.interval_coverage(listStart, listEnd, listValue)
+    for dblMeasure in [0.0, 5.0, 10.0, 27.5, 45.0, 60.0, 70.0, 90.0, 110.0, 135.0, 150.0]:
+        dblExpected = sum(dblValue * overlap(min(dblStart, dblEnd), max(dblStart, dblEnd), 0.0, dblMeasure)
+                          for dblStart, dblEnd, dblValue in zip(listStart, listEnd, listValue))
+        assert np.isclose(np.interp(dblMeasure, arrayBreaks, arrayCumulative), dblExpected)
+
+
+def test_window_fractions():
+    listWindowStart = [0.0, 20.0, 55.0, 60.0, 90.0, 100.0, 140.0]
+    listWindowEnd = [20.0, 70.0, 85.0, 80.0, 130.0, 120.0, 200.0]
+    arrayFraction = array_functions.window_fractions(listStart, listEnd, listFlag, listWindowStart, listWindowEnd)
+    for dblFraction, dblWindowStart, dblWindowEnd in zip(arrayFraction, listWindowStart, listWindowEnd):
+        listCovered = [overlap(min(dblStart, dblEnd), max(dblStart, dblEnd), dblWindowStart, dblWindowEnd)
+                       for dblStart, dblEnd in zip(listStart, listEnd)]
+        dblTotal = sum(listCovered)
+        if dblTotal == 0.0:
+            assert np.isnan(dblFraction)
+        else:
+            assert np.isclose(dblFraction, sum(dblCovered for dblCovered, intFlag in zip(listCovered, listFlag) if intFlag) / dblTotal)
+
+
+def test_group_fractions():
+    listGroup = [3, 1, 3, 2, 1, 3, 4]
+    listLength = [10.0, 5.0, 20.0, 7.0, 15.0, 5.0, 0.0]
+    listGroupFlag = [1, 0, 0, 1, 1, 1, 1]
+    arrayFraction = array_functions.group_fractions(listGroup, listLength, listGroupFlag)
+    for dblFraction, valueGroup in zip(arrayFraction, listGroup):
+        dblTotal = sum(dblLength for dblLength, value in zip(listLength, listGroup) if value == valueGroup)
+        dblFlagged = sum(dblLength for dblLength, value, intFlag in zip(listLength, listGroup, listGroupFlag)
+                         if value == valueGroup and intFlag == 1)
+        if dblTotal == 0.0:
+            assert np.isnan(dblFraction)
+        else:
+            assert np.isclose(dblFraction, dblFlagged / dblTotal)
+
+
+def test_cut_line():
+    listXY = [(0.0, 0.0), (30.0, 0.0), (30.0, 40.0), (0.0, 40.0), (0.0, 95.0)]
+    dblLength = line_length(listXY)
+    arrayFrom, arrayTo, listPieces = array_functions.cut_line(listXY, 25.0)
+    assert len(listPieces) == int(math.ceil(dblLength / 25.0))
+    for i, (dblFrom, dblTo, arrayPiece) in enumerate(zip(arrayFrom, arrayTo, listPieces)):
+        assert np.isclose(dblFrom, i * 25.0)
+        assert np.isclose(dblTo, min(dblFrom + 25.0, dblLength))
+        assert np.isclose(line_length(arrayPiece.tolist()), dblTo - dblFrom)
+        assert np.allclose(arrayPiece[0], point_at(listXY, dblFrom))
+        assert np.allclose(arrayPiece[-1], point_at(listXY, dblTo))
+
+    # A remainder shorter than the tolerance joins the previous piece
+    arrayFrom, arrayTo, listPieces = array_functions.cut_line([(0.0, 0.0), (50.005, 0.0)], 25.0)
+    assert np.allclose(arrayTo, [25.0, 50.005])
+
+
+def test_line_stations():
+    listParts = [[(0.0, 0.0), (0.0, 35.0)], [(100.0, 0.0), (100.0, 20.0), (130.0, 20.0)]]
+    arrayXY, arrayPosition = array_functions.line_stations(listParts, 10.0)
+
+    # Brute force: walk the parts end to end, skipping the gap between them
+    listExpected = []
+    dblOffset = 0.0
+    for listPart in listParts:
+        dblPartLength = line_length(listPart)
+        dblMeasure = 10.0 * math.ceil(dblOffset / 10.0)
+        while dblMeasure < dblOffset + dblPartLength:
+            listExpected.append(point_at(listPart, dblMeasure - dblOffset))
+            dblMeasure = dblMeasure + 10.0
+        dblOffset = dblOffset + dblPartLength
+    listExpected.append(listParts[-1][-1])
+
+    assert np.allclose(arrayXY, listExpected)
+    assert arrayPosition.tolist() == list(range(len(listExpected)))
+
+
+def test_side_of_segments():
+    listSegments = [(0.0, 0.0, 10.0, 0.0), (0.0, 0.0, 10.0, 0.0), (0.0, 0.0, 10.0, 0.0),
+                    (5.0, 5.0, 5.0, -5.0), (5.0, 5.0, 5.0, -5.0), (0.0, 0.0, 10.0, 10.0)]
+    listPoints = [(5.0, 2.0), (5.0, -2.0), (20.0, 0.0), (8.0, 0.0), (2.0, 0.0), (2.0, 8.0)]
+    assert array_functions.side_of_segments(listSegments, listPoints).tolist() == [1, -1, 0, 1, -1, 1]
+
+
+def test_ring_start():
+    listRing = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (0.0, 10.0), (0.0, 0.0)]
+    setKeys = set(array_functions.vertex_keys([(10.0002, 0.0), (0.0, 10.0001), (50.0, 50.0)]))
+    assert array_functions.ring_start(listRing, setKeys) == 3
+    assert array_functions.ring_start(listRing, set(array_functions.vertex_keys([(10.0, 0.0)]))) == 1
+    assert array_functions.ring_start(listRing, set()) == 0
@@ -0,0 +1,56 @@
+import os
+
+from common_package import release
+from common_package import riverscapes_project
+from geos_package import BatchRealizations
+
+strSampleProject = """<?xml version="1.0" encoding="utf-8"?>
+<Project>
+  <Name>Sample</Name>
+  <ProjectType>Confinement</ProjectType>
+  <Inputs>
+    <Vector guid="1" id="StreamNetwork001">
+      <Name>Network</Name>
+      <Path>Inputs\\StreamNetworks\\StreamNetwork001\\Network.shp</Path>
+    </Vector>
+    <Vector guid="2" id="ValleyBottom001">
+      <Name>ValleyBottom</Name>
+      <Path>Inputs\\ValleyBottoms\\ValleyBottom001\\ValleyBottom.shp</Path>
+    </Vector>
+    <Vector guid="3" id="ChannelPolygon001">
+      <Name>Channel</Name>
+      <Path>Inputs\\ChannelPolygons\\ChannelPolygon001\\Channel.shp</Path>
+    </Vector>
+  </Inputs>
+  <Realizations />
+</Project>
+"""
+
+
+def test_add_realization_round_trip(tmp_path):
+    strProject = str(tmp_path / "project.rs.xml")
+    with open(strProject, "w") as fileProject:
+        fileProject.write(strSampleProject)
+
+    dictJob = {"project": strProject, "name": "Batch", "segment_id": "SegID", "segment_length": None,
+               "seed_distance": 50, "window_sizes": [100, 200]}
+    dictJob.update(BatchRealizations.project_inputs(BatchRealizations.load_project(dictJob), dictJob))
+    strOutputs = os.path.join(str(tmp_path), "Outputs", "Confinement001")
+    dictOutputs = {"realization_id": "Confinement001",
+                   "raw": os.path.join(strOutputs, "RawConfiningState.shp"),
+                   "margins": os.path.join(strOutputs, "ConfiningMargins.shp"),
+                   "segments": os.path.join(strOutputs, "Analyses", "ConfiningSegments_001", "Confinement_Segments.shp"),
+                   "seed_points": os.path.join(strOutputs, "Analyses", "ConfiningSegments_002", "MovingWindowSeedPoints.shp"),
+                   "windows": os.path.join(strOutputs, "Analyses", "ConfiningSegments_002", "MovingWindowSegments.shp")}
+    BatchRealizations.add_realization(dictJob, dictOutputs)
+
+    project = riverscapes_project.Project(strProject)
+    nodeRealization = project.Realizations["Batch"]
+    assert nodeRealization.get("id") == "Confinement001"
+    assert nodeRealization.get("productVersion") == release.ConfinementToolReleaseVersion
+    assert [node.get("ref") for node in nodeRealization.find("Inputs")] == ["StreamNetwork001", "ValleyBottom001", "ChannelPolygon001"]
+    assert dict((node.findtext("Name"), project.absolute_path(node)) for node in nodeRealization.findall("Outputs/Vector")) == \
+        {"ConfiningMargins": dictOutputs["margins"], "RawConfiningState": dictOutputs["raw"]}
+    assert [(node.tag, node.get("id")) for node in nodeRealization.find("Analyses")] == \
+        [("SegmentedNetwork", "ConfiningSegments_001"), ("MovingWindow", "ConfiningSegments_002")]
+    assert project.get_next_realization_id() == "Confinement002"
@@ -0,0 +1,80 @@
+import os
+
+import shapely
+
+from benchmarks import synthetic
+from geos_package import ConfiningMargins
+from geos_package import gis_tools
+
+
+def write_inputs(strFolder, intStreams=3):
+    fcNetwork = synthetic.network(intStreams=intStreams, dblStreamLength=2000.0)
+    fcChannel, fcValleyBottom = synthetic.channel_and_valley(fcNetwork)
+    dictInputs = {"network": os.path.join(strFolder, "Network.shp"),
+                  "valley_bottom": os.path.join(strFolder, "ValleyBottom.shp"),
+                  "channel": os.path.join(strFolder, "Channel.shp")}
+    gis_tools.write_dataset(fcNetwork, dictInputs["network"])
+    gis_tools.write_dataset(fcValleyBottom, dictInputs["valley_bottom"])
+    gis_tools.write_dataset(fcChannel, dictInputs["channel"])
+    return dictInputs
+
+
+def raw_rows(strDataset):
+    return sorted((intSegID, strLeft, strRight, round(gLine.length, 1)) for intSegID, strLeft, strRight, gLine in
+                  gis_tools.read_dataset(strDataset).rows(["SegID", "Con_LEFT", "Con_RIGHT", "SHAPE@"]))
+
+
+def margin_rows(strDataset):
+    return sorted((strBankSide, round(gLine.length, 1)) for strBankSide, gLine in
+                  gis_tools.read_dataset(strDataset).rows(["BankSide", "SHAPE@"]))
+
+
+def test_incremental_matches_full_run(tmp_path):
+    strFolder = str(tmp_path)
+    dictInputs = write_inputs(strFolder)
+    strRaw = os.path.join(strFolder, "RawConfiningState.shp")
+    strMargins = os.path.join(strFolder, "ConfiningMargins.shp")
+    strCache = os.path.join(strFolder, "cache")
+
+    def run_incremental():
+        return ConfiningMargins.incremental(dictInputs["network"], dictInputs["valley_bottom"], dictInputs["channel"],
+                                            strRaw, strMargins, "in_memory", strCache)
+
+    assert len(run_incremental()) > 0 # full run
+
+    # A valley bottom polygon far from every segment: nothing to re-run
+    fcValleyBottom = gis_tools.read_dataset(dictInputs["valley_bottom"]).copy()
+    dblMinX, dblMinY, dblMaxX, dblMaxY = shapely.total_bounds(gis_tools.geometry_array(fcValleyBottom))
+    fcValleyBottom.addRow(shapely.box(dblMaxX + 5000.0, dblMaxY + 5000.0, dblMaxX + 5100.0, dblMaxY + 5100.0))
+    gis_tools.write_dataset(fcValleyBottom, dictInputs["valley_bottom"])
+    assert len(run_incremental()) == 0
+
+    # Narrow the valley bottom near one segment
+    gValleyBottom = fcValleyBottom.geometries[0]
+    fcValleyBottom.geometries[0] = gValleyBottom.difference(gValleyBottom.boundary.interpolate(0.3, normalized=True).buffer(40.0))
+    gis_tools.write_dataset(fcValleyBottom, dictInputs["valley_bottom"])
+    intRerun = len(run_incremental())
+    assert 0 < intRerun < len(gis_tools.read_dataset(strRaw))
+
+    strFullRaw = os.path.join(strFolder, "FullRawConfiningState.shp")
+    strFullMargins = os.path.join(strFolder, "FullConfiningMargins.shp")
+    ConfiningMargins.main(dictInputs["network"], dictInputs["valley_bottom"], dictInputs["channel"],
+                          strFullRaw, strFullMargins, "in_memory")
+    assert raw_rows(strRaw) == raw_rows(strFullRaw)
+    assert margin_rows(strMargins) == margin_rows(strFullMargins)
+
+
+def test_partitioned_matches_main(tmp_path):
+    strFolder = str(tmp_path)
+    dictInputs = write_inputs(strFolder)
+    listInputs = [dictInputs["network"], dictInputs["valley_bottom"], dictInputs["channel"]]
+    dictRaw = dict((strRun, os.path.join(strFolder, strRun + "RawConfiningState.shp")) for strRun in ("Main", "Partitioned"))
+    dictMargins = dict((strRun, os.path.join(strFolder, strRun + "ConfiningMargins.shp")) for strRun in ("Main", "Partitioned"))
+
+    ConfiningMargins.main(*(listInputs + [dictRaw["Main"], dictMargins["Main"], "in_memory"]))
+    ConfiningMargins.partitioned(*(listInputs + [dictRaw["Partitioned"], dictMargins["Partitioned"], "in_memory"]),
+                                 dblTileSize=1000.0, intWorkers=1)
+
+    assert len(set(ConfiningMargins.partition_keys(gis_tools.read_dataset(dictInputs["network"]), None, 1000.0).tolist())) > 1
+    assert raw_rows(dictRaw["Partitioned"]) == raw_rows(dictRaw["Main"])
+    assert margin_rows(dictMargins["Partitioned"]) == margin_rows(dictMargins["Main"])